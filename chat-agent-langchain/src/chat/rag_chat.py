@@ -1,16 +1,24 @@
+import os
+import sys
+import time
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_community.vectorstores import Chroma
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_community.document_loaders import TextLoader
 from .memory_manager import MemoryManager
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common import usage_ledger
+from common.llm_gateway import LLM_MAX_RETRIES, http_client
+
 class RAGChat:
     def __init__(self, persist_directory="chroma_db"):
         self.persist_directory = persist_directory
-        self.embeddings = OpenAIEmbeddings()
-        self.llm = ChatOpenAI(model_name="gpt-4", temperature=0)
+        # Pooled connections, held to OPENAI_REQUESTS_PER_MINUTE (see common/llm_gateway.py)
+        self.embeddings = OpenAIEmbeddings(http_client=http_client("openai"), max_retries=LLM_MAX_RETRIES)
+        self.llm = ChatOpenAI(model_name="gpt-4", temperature=0, http_client=http_client("openai"), max_retries=LLM_MAX_RETRIES)
         self.vectorstore = None
         self.memory_manager = MemoryManager()
         
@@ -59,9 +67,26 @@ class RAGChat:
             ("human", "{question}")
         ])
         
+        def retrieve(question):
+            # The retriever embeds the question; OpenAIEmbeddings doesn't report usage, so its
+            # tokens are estimated (~4 characters per token) in a ledger entry of its own
+            start = time.perf_counter()
+            error = None
+            try:
+                return retriever.invoke(question)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                usage_ledger.record(
+                    "openai", self.embeddings.model, kind="embeddings",
+                    usage={"prompt_tokens": len(question) // 4 + 1}, latency_s=time.perf_counter() - start,
+                    error=error, agent="chat", stage="rag_retrieval", estimated=True,
+                )
+
         chain = (
             {
-                "context": retriever, 
+                "context": RunnableLambda(retrieve), 
                 "chat_history": lambda x: self.memory_manager.memory.load_memory_variables({})["chat_history"],
                 "question": RunnablePassthrough()
             }
@@ -79,7 +104,23 @@ class RAGChat:
             raise ValueError("No documents have been ingested. Please ingest documents first.")
         
         chain = self.setup_rag_chain()
-        response = chain.invoke(question)
+        start = time.perf_counter()
+        try:
+            response = chain.invoke(question)
+        except Exception as e:
+            usage_ledger.record("openai", self.llm.model_name, latency_s=time.perf_counter() - start,
+                                error=type(e).__name__, agent="chat", stage="rag_query")
+            raise
+        # The answer's tokens; the latency covers the whole query, retrieval included
+        # (the retrieval's embedding call has its own "rag_retrieval" entry)
+        usage_ledger.record(
+            "openai",
+            response.response_metadata.get("model_name", self.llm.model_name),
+            usage=response.usage_metadata,
+            latency_s=time.perf_counter() - start,
+            agent="chat",
+            stage="rag_query",
+        )
         
         self.memory_manager.save_interaction(question, response.content)
         return response.content 
\ No newline at end of file
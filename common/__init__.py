@@ -0,0 +1,8 @@
+"""Modules shared by the agents in this repository.
+
+The agents are run as scripts from their own folders, so each one puts the
+repository root on `sys.path` before importing from here:
+
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from common.email_dispatch import EmailDispatcher
+"""
@@ -0,0 +1,290 @@
+"""Batched, rate-limited email dispatch shared by the agents.
+
+Rendered emails (Resend `SendParams` dicts) are queued and sent through the
+provider's batch endpoint in groups of at most `EMAIL_BATCH_SIZE` (Resend
+accepts 100 per request). Batch requests run on a small thread pool, under a
+token bucket matching the provider's request rate limit.
+
+Only failures that mean the provider did not take the batch are retried:
+rate limits (429, honouring Retry-After) and connections that never reached
+it, both with exponential backoff. Resend's batch call takes no idempotency
+key, so re-sending after a server error or timeout could deliver every email
+in the batch twice. Those batches are not re-sent. Their recipients are
+reported as "unconfirmed" and logged, so they can be checked against the
+provider's logs. Every recipient gets a delivery result ("sent", "failed" or
+"unconfirmed"), which is returned, logged and optionally appended to a JSONL
+file:
+
+    dispatcher = EmailDispatcher()
+    for subscriber in subscribers:
+        dispatcher.queue({"from": FROM_EMAIL, "to": subscriber, "subject": ..., "html": ...})
+    results = dispatcher.flush()
+
+Set `EMAIL_TRANSPORT=local` (or pass `transport=LocalTransport()`) to send to
+an in-process stand-in for the email API instead of Resend.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from common.rate_limit import TokenBucket
+
+# --------------------------
+# Configuration
+# --------------------------
+
+RESEND_BATCH_LIMIT = 100
+
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "resend")  # "resend" or "local"
+EMAIL_BATCH_SIZE = min(int(os.getenv("EMAIL_BATCH_SIZE", str(RESEND_BATCH_LIMIT))), RESEND_BATCH_LIMIT)
+EMAIL_RATE_LIMIT = float(os.getenv("EMAIL_RATE_LIMIT", "2"))  # batch requests per second (Resend's default)
+EMAIL_MAX_WORKERS = int(os.getenv("EMAIL_MAX_WORKERS", "4"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))  # for 429s and failed connections
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1"))  # seconds, doubled per attempt
+EMAIL_DELIVERY_LOG = os.getenv("EMAIL_DELIVERY_LOG")  # optional JSONL of per-recipient results
+
+# Rejected before the provider acted on the batch: safe to send again
+RETRYABLE_STATUS = {"429"}
+VALIDATION_STATUS = {"400", "422"}
+
+# Network errors raised before a request reached the provider (anywhere in the exception chain)
+NOT_SENT_ERRORS = {"ConnectionRefusedError", "gaierror", "ConnectTimeout", "ConnectTimeoutError",
+                   "NewConnectionError", "NameResolutionError"}
+
+# --------------------------
+# Transports
+# --------------------------
+
+class ResendTransport:
+    """Sends batches with `resend.Batch.send`; uses `resend.api_key` unless `api_key` is given."""
+
+    def __init__(self, api_key: str | None = None):
+        import resend
+
+        if api_key:
+            resend.api_key = api_key
+        self._resend = resend
+
+    def send_batch(self, messages: list[dict]) -> list[str]:
+        response = self._resend.Batch.send(messages)
+        data = response.get("data", []) if isinstance(response, dict) else response
+        return [item.get("id") for item in data]
+
+
+class LocalEmailError(Exception):
+    """Mirrors the `code`/`error_type`/`headers` attributes of `resend.exceptions.ResendError`."""
+
+    def __init__(self, code: int, error_type: str, message: str, headers: dict | None = None):
+        super().__init__(message)
+        self.code = code
+        self.error_type = error_type
+        self.headers = headers or {}
+
+
+class LocalTransport:
+    """
+    In-process stand-in for the email API, for tests and load tests.
+
+    Records accepted messages in `sent`, sleeps `latency` seconds per request, rejects
+    requests beyond `rate_limit` per second with 429 and fails `failure_rate` of them with 503.
+    """
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, rate_limit: float | None = None,
+                 seed: int | None = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.sent = []
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages: list[dict]) -> list[str]:
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.failure_rate
+        time.sleep(self.latency)
+        if len(messages) > RESEND_BATCH_LIMIT:
+            raise LocalEmailError(422, "validation_error", f"At most {RESEND_BATCH_LIMIT} emails per batch")
+        for message in messages:
+            missing = [field for field in ("from", "to", "subject") if not message.get(field)]
+            if missing:
+                raise LocalEmailError(422, "missing_required_field", f"Missing {', '.join(missing)}")
+        if self.bucket and not self.bucket.try_acquire():
+            raise LocalEmailError(429, "rate_limit_exceeded", "Too many requests", {"retry-after": "1"})
+        if fail:
+            raise LocalEmailError(503, "application_error", "Service unavailable")
+        ids = [f"local-{uuid4().hex}" for _ in messages]
+        with self._lock:
+            self.sent.extend(messages)
+        return ids
+
+
+def default_transport():
+    if EMAIL_TRANSPORT == "local":
+        return LocalTransport()
+    return ResendTransport()
+
+# --------------------------
+# Dispatcher
+# --------------------------
+
+def _error_chain(error: BaseException):
+    """The error, its causes, and the reasons wrapped by requests/urllib3 errors."""
+    seen = set()
+    pending = [error]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__, getattr(current, "reason", None)])
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+
+
+def was_not_sent(error: Exception) -> bool:
+    """True if the request never reached the provider (refused, DNS failure, connect timeout)."""
+    return any(type(e).__name__ in NOT_SENT_ERRORS for e in _error_chain(error))
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits and requests that never reached the provider can be sent again. Server errors
+    and timeouts cannot: the batch may have been accepted, and a retry would deliver it twice.
+    """
+    code = getattr(error, "code", None)
+    if code is not None:
+        return str(code) in RETRYABLE_STATUS
+    return was_not_sent(error)
+
+
+def _retry_after(error: Exception) -> float | None:
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _rejected(error: Exception) -> bool:
+    """A 4xx response: the provider refused the batch, so nothing was sent."""
+    code = str(getattr(error, "code", ""))
+    return code.startswith("4")
+
+
+def _recipients(message: dict) -> list[str]:
+    to = message.get("to")
+    return [to] if isinstance(to, str) else list(to or [])
+
+
+class EmailDispatcher:
+    def __init__(
+        self,
+        transport=None,
+        batch_size: int = EMAIL_BATCH_SIZE,
+        rate_limit: float = EMAIL_RATE_LIMIT,
+        max_workers: int = EMAIL_MAX_WORKERS,
+        max_retries: int = EMAIL_MAX_RETRIES,
+        retry_backoff: float = EMAIL_RETRY_BACKOFF,
+        delivery_log: str | None = EMAIL_DELIVERY_LOG,
+    ):
+        self.transport = transport or default_transport()
+        self.batch_size = max(1, min(batch_size, RESEND_BATCH_LIMIT))
+        self.bucket = TokenBucket(rate_limit)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.delivery_log = delivery_log
+        self._queue = []
+        self._lock = threading.Lock()
+
+    def queue(self, message: dict) -> None:
+        with self._lock:
+            self._queue.append(message)
+
+    def send(self, messages: list[dict]) -> list[dict]:
+        """Queues `messages` and flushes; returns one delivery result per recipient."""
+        for message in messages:
+            self.queue(message)
+        return self.flush()
+
+    def flush(self) -> list[dict]:
+        """Sends everything queued so far; returns one delivery result per recipient."""
+        with self._lock:
+            messages, self._queue = self._queue, []
+        if not messages:
+            return []
+
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = [result for batch_results in executor.map(self._send_batch, batches) for result in batch_results]
+
+        sent = sum(result["status"] == "sent" for result in results)
+        unconfirmed = sum(result["status"] == "unconfirmed" for result in results)
+        logging.info(
+            f"Dispatched {len(messages)} email(s) in {len(batches)} batch(es) to {len(results)} recipient(s) "
+            f"in {time.perf_counter() - start:.2f}s: {sent} sent, {len(results) - sent - unconfirmed} failed, "
+            f"{unconfirmed} unconfirmed"
+        )
+        self._record(results)
+        return results
+
+    def _send_batch(self, batch: list[dict]) -> list[dict]:
+        for attempt in range(1, self.max_retries + 2):
+            self.bucket.acquire()
+            try:
+                ids = self.transport.send_batch(batch)
+                return self._results(batch, "sent", attempt, ids=ids)
+            except Exception as e:
+                if str(getattr(e, "code", "")) in VALIDATION_STATUS and len(batch) > 1:
+                    # One invalid message rejects the whole batch; split it to isolate the bad ones
+                    middle = len(batch) // 2
+                    return self._send_batch(batch[:middle]) + self._send_batch(batch[middle:])
+                if not is_retryable(e) and not _rejected(e):
+                    # The provider may have accepted it: report rather than risk sending twice
+                    recipients = [recipient for message in batch for recipient in _recipients(message)]
+                    logging.error(
+                        f"Email batch of {len(batch)} unconfirmed after {attempt} attempt(s), not re-sent ({e}); "
+                        f"check the provider's logs for: {', '.join(recipients)}"
+                    )
+                    return self._results(batch, "unconfirmed", attempt, error=str(e))
+                if attempt > self.max_retries or not is_retryable(e):
+                    logging.error(f"Email batch of {len(batch)} failed after {attempt} attempt(s): {e}")
+                    return self._results(batch, "failed", attempt, error=str(e))
+                delay = _retry_after(e) or self.retry_backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+                logging.warning(f"Email batch of {len(batch)} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _results(self, batch, status, attempts, ids=None, error=None) -> list[dict]:
+        now = time.time()
+        ids = list(ids or [])
+        return [
+            {
+                "to": recipient,
+                "subject": message.get("subject"),
+                "status": status,
+                "id": ids[index] if index < len(ids) else None,
+                "attempts": attempts,
+                "error": error,
+                "at": now,
+            }
+            for index, message in enumerate(batch)
+            for recipient in _recipients(message)
+        ]
+
+    def _record(self, results: list[dict]) -> None:
+        for result in results:
+            if result["status"] != "sent":
+                logging.error(f"Email to {result['to']} {result['status']}: {result['error']}")
+        if self.delivery_log:
+            with open(self.delivery_log, "a") as f:
+                f.writelines(json.dumps(result) + "\n" for result in results)
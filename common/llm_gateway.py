@@ -0,0 +1,516 @@
+"""One place for the agents' chat and embedding calls.
+
+    from common.llm_gateway import gateway
+
+    llm = gateway("groq")                                  # or "openai", "azure", "databricks"
+    response = llm.chat(model=MODEL, messages=messages)    # same arguments as the SDK
+    for chunk in llm.stream(model=MODEL, messages=messages): ...
+    response = await llm.achat(model=MODEL, messages=messages)
+    vectors = llm.embed(model=EMBEDDING_MODEL, input=texts)
+
+Every provider gets:
+
+* SDK clients over pooled keep-alive `httpx` connections, built once per
+  process (async clients once per event loop), with a common timeout and
+  retry count. Close a loop's async clients with `await aclose()` before the
+  loop ends.
+* A token bucket for `<PROVIDER>_REQUESTS_PER_MINUTE`. The limit is applied
+  in the HTTP transport, so it also covers the SDK's own retries and any
+  library given `http_client(provider)` (e.g. LangChain's `ChatOpenAI`).
+* Request coalescing: identical non-streaming requests that are in flight at
+  the same time share one upstream call and its response.
+* An optional response cache. This is any object with `get(key)` and
+  `set(key, response)`. `MemoryCache` is an LRU; `LLM_CACHE_SIZE` gives
+  `gateway()` one.
+* A record of every call (tokens, latency, cache status) in the usage ledger;
+  see `common.usage_ledger`.
+
+Streaming calls return the SDK's stream, wrapped only to record usage when it
+ends. They are rate limited but never coalesced or cached.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+
+import httpx
+
+from common import usage_ledger
+from common.rate_limit import TokenBucket
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "0"))  # responses kept by gateway(); 0 disables
+
+PROVIDERS = ("openai", "azure", "groq", "databricks")
+
+# Requests per minute when <PROVIDER>_REQUESTS_PER_MINUTE is unset (0: unlimited). Groq keeps
+# the News agent's earlier 30/min default, which now also applies to the Weather agent.
+DEFAULT_REQUESTS_PER_MINUTE = {"groq": 30}
+
+_lock = threading.Lock()
+_buckets = {}
+_http_clients = {}
+_gateways = {}
+
+# --------------------------
+# Transports
+# --------------------------
+
+def rate_limiter(provider):
+    """The token bucket shared by every request to `provider`, or None if it is unlimited."""
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    with _lock:
+        if provider not in _buckets:
+            rpm = float(os.getenv(f"{provider.upper()}_REQUESTS_PER_MINUTE", DEFAULT_REQUESTS_PER_MINUTE.get(provider, 0)))
+            _buckets[provider] = TokenBucket(rpm / 60) if rpm > 0 else None
+        return _buckets[provider]
+
+
+def _limits():
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS)
+
+
+class RateLimitedTransport(httpx.HTTPTransport):
+    def __init__(self, bucket, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+
+    def handle_request(self, request):
+        if self.bucket:
+            self.bucket.acquire()
+        return super().handle_request(request)
+
+
+class AsyncRateLimitedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, bucket, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+
+    async def handle_async_request(self, request):
+        if self.bucket:
+            await self.bucket.aacquire()
+        return await super().handle_async_request(request)
+
+
+def transport(provider, limits=None):
+    """A new pooled transport that waits for `provider`'s rate limit before each request."""
+    return RateLimitedTransport(rate_limiter(provider), limits=limits or _limits())
+
+
+def async_transport(provider, limits=None):
+    return AsyncRateLimitedTransport(rate_limiter(provider), limits=limits or _limits())
+
+
+def http_client(provider):
+    """The process-wide pooled, rate-limited `httpx.Client` for `provider`."""
+    bucket = rate_limiter(provider)  # takes _lock itself, so resolve it before building under the lock
+    with _lock:
+        if provider not in _http_clients:
+            _http_clients[provider] = httpx.Client(
+                transport=RateLimitedTransport(bucket, limits=_limits()), timeout=LLM_TIMEOUT
+            )
+        return _http_clients[provider]
+
+# --------------------------
+# SDK clients
+# --------------------------
+
+def _require(*var_names):
+    values = [os.getenv(var_name) for var_name in var_names]
+    missing = [name for name, value in zip(var_names, values) if not value]
+    if missing:
+        raise ValueError(f"Missing required environment variable(s): {', '.join(missing)}")
+    return values
+
+
+def _sdk(provider, asynchronous):
+    """The SDK client class and its constructor arguments for `provider`."""
+    if provider == "groq":
+        from groq import AsyncGroq, Groq
+
+        (api_key,) = _require("GROQ_API_KEY")
+        return (AsyncGroq if asynchronous else Groq), {"api_key": api_key}
+    if provider == "azure":
+        from openai import AsyncAzureOpenAI, AzureOpenAI
+
+        api_key, endpoint = _require("AZURE_OPENAI_KEY", "AZURE_OPENAI_ENDPOINT")
+        return (AsyncAzureOpenAI if asynchronous else AzureOpenAI), {
+            "api_key": api_key,
+            "azure_endpoint": endpoint,
+            "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
+        }
+
+    from openai import AsyncOpenAI, OpenAI
+
+    if provider == "databricks":
+        # Model serving endpoints speak the OpenAI chat and embeddings APIs
+        host, token = _require("DATABRICKS_HOST", "DATABRICKS_TOKEN")
+        return (AsyncOpenAI if asynchronous else OpenAI), {
+            "api_key": token,
+            "base_url": f"{host.rstrip('/')}/serving-endpoints",
+        }
+    return (AsyncOpenAI if asynchronous else OpenAI), {}  # OPENAI_API_KEY / OPENAI_BASE_URL
+
+
+def build_client(provider):
+    """A sync SDK client for `provider` over its shared pooled connection."""
+    cls, kwargs = _sdk(provider, asynchronous=False)
+    return cls(**kwargs, http_client=http_client(provider), max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT)
+
+
+def build_async_client(provider):
+    """A new async SDK client for `provider`, with its own connection pool (close it when done)."""
+    cls, kwargs = _sdk(provider, asynchronous=True)
+    http = httpx.AsyncClient(transport=async_transport(provider), timeout=LLM_TIMEOUT)
+    return cls(**kwargs, http_client=http, max_retries=LLM_MAX_RETRIES, timeout=LLM_TIMEOUT)
+
+# --------------------------
+# Caching
+# --------------------------
+
+class MemoryCache:
+    """A thread-safe in-memory LRU of responses."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def request_key(provider, kind, request):
+    """A stable key for one request: the provider, the call kind and every argument."""
+    payload = json.dumps({"provider": provider, "kind": kind, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# --------------------------
+# Usage recording
+# --------------------------
+
+def _record(provider, kind, request, response=None, start=None, cache="miss", error=None, tags=None, **extra):
+    usage_ledger.record(
+        provider,
+        getattr(response, "model", None) or request.get("model"),
+        kind=kind,
+        usage=getattr(response, "usage", None),
+        latency_s=time.perf_counter() - start if start is not None else None,
+        cache=cache,
+        error=error,
+        tags=tags,
+        **extra,
+    )
+
+
+class _StreamRecorder:
+    """Follows a chat stream's chunks and records one ledger entry when it ends or is closed."""
+
+    def __init__(self, provider, request, stream, start, on_error=None):
+        self.provider = provider
+        self.request = request
+        self.stream = stream
+        self.tags = usage_ledger.current_tags()
+        self.start = start
+        self.on_error = on_error
+        self.ttft = None
+        self.usage = None
+        self.model = None
+        self.chars = 0
+        self.done = False
+
+    def observe(self, chunk):
+        self.model = self.model or getattr(chunk, "model", None)
+        for choice in getattr(chunk, "choices", None) or []:
+            content = getattr(choice.delta, "content", None)
+            if content:
+                if self.ttft is None:
+                    self.ttft = time.perf_counter() - self.start
+                self.chars += len(content)
+        # OpenAI-style final usage chunk (stream_options), or Groq's x_groq.usage
+        usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+        if usage:
+            self.usage = usage
+
+    def finish(self, error=None):
+        if self.done:
+            return
+        self.done = True
+        if error and self.on_error:
+            self.on_error()
+        extra = {}
+        usage = self.usage
+        if usage is None:
+            # No usage reported: estimate the output at ~4 characters per token
+            usage, extra["estimated"] = {"completion_tokens": self.chars // 4}, True
+        usage_ledger.record(
+            self.provider, self.model or self.request.get("model"), kind="stream", usage=usage,
+            latency_s=time.perf_counter() - self.start, error=error, tags=self.tags,
+            ttft_s=round(self.ttft, 4) if self.ttft is not None else None, **extra,
+        )
+
+
+class RecordedStream(_StreamRecorder):
+    def __iter__(self):
+        try:
+            for chunk in self.stream:
+                self.observe(chunk)
+                yield chunk
+        except Exception as e:
+            self.finish(type(e).__name__)
+            raise
+        self.finish()
+
+    def close(self):
+        self.stream.close()
+        self.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class AsyncRecordedStream(_StreamRecorder):
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                self.observe(chunk)
+                yield chunk
+        except Exception as e:
+            self.finish(type(e).__name__)
+            raise
+        self.finish()
+
+    async def close(self):
+        await self.stream.close()
+        self.finish()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+# --------------------------
+# Gateway
+# --------------------------
+
+class LLMGateway:
+    def __init__(self, provider, client_factory=None, async_client_factory=None, cache=None, coalesce=True):
+        """
+        `client_factory` / `async_client_factory` return the SDK client to call. They are
+        invoked per request (so an agent can keep its own client registry and stand-ins).
+        By default they are clients built by this module: one sync client per gateway,
+        and one async client per event loop (close it with `aclose()`).
+        """
+        self.provider = provider
+        self.cache = cache
+        self.coalesce = coalesce
+        self.stats = Counter()  # upstream requests, errors, cache hits, coalesced waits
+        self._client_factory = client_factory
+        self._async_client_factory = async_client_factory
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> client
+        self._inflight = {}
+        self._async_inflight = weakref.WeakKeyDictionary()  # event loop -> {key: task}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client_factory:
+            return self._client_factory()
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = build_client(self.provider)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client_factory:
+            return self._async_client_factory()
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = build_async_client(self.provider)
+        return self._async_clients[loop]
+
+    async def aclose(self):
+        """Closes the async client (and its connection pool) built for the running event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _cached(self, kind, request, key):
+        if self.cache is None:
+            return None
+        response = self.cache.get(key)
+        if response is not None:
+            self._count("cache_hits")
+            _record(self.provider, kind, request, response, cache="hit")
+        return response
+
+    def _call(self, kind, request, send):
+        key = request_key(self.provider, kind, request)
+        if (cached := self._cached(kind, request, key)) is not None:
+            return cached
+        if not self.coalesce:
+            return self._send(key, kind, request, send)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            start = time.perf_counter()
+            response = future.result()
+            _record(self.provider, kind, request, response, start, cache="coalesced")
+            return response
+        try:
+            response = self._send(key, kind, request, send)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _send(self, key, kind, request, send):
+        self._count("requests")
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception as e:
+            self._count("errors")
+            _record(self.provider, kind, request, start=start, error=type(e).__name__)
+            raise
+        _record(self.provider, kind, request, response, start)
+        if self.cache is not None:
+            self.cache.set(key, response)
+        return response
+
+    async def _acall(self, kind, request, send):
+        key = request_key(self.provider, kind, request)
+        if (cached := self._cached(kind, request, key)) is not None:
+            return cached
+        if not self.coalesce:
+            return await self._asend(key, kind, request, send)
+
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.ensure_future(self._asend(key, kind, request, send))
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+            # One waiter giving up must not cancel the request for the others
+            return await asyncio.shield(task)
+        self._count("coalesced")
+        start = time.perf_counter()
+        response = await asyncio.shield(task)
+        _record(self.provider, kind, request, response, start, cache="coalesced")
+        return response
+
+    async def _asend(self, key, kind, request, send):
+        self._count("requests")
+        start = time.perf_counter()
+        try:
+            response = await send()
+        except Exception as e:
+            self._count("errors")
+            _record(self.provider, kind, request, start=start, error=type(e).__name__)
+            raise
+        _record(self.provider, kind, request, response, start)
+        if self.cache is not None:
+            self.cache.set(key, response)
+        return response
+
+    def chat(self, **request):
+        """`chat.completions.create(**request)`, coalesced and cached."""
+        return self._call("chat", request, lambda: self.client.chat.completions.create(**request))
+
+    def stream(self, **request):
+        """`chat.completions.create(**request, stream=True)`; returns the SDK stream."""
+        self._count("requests")
+        start = time.perf_counter()
+        try:
+            stream = self.client.chat.completions.create(**request, stream=True)
+        except Exception as e:
+            self._count("errors")
+            _record(self.provider, "stream", request, start=start, error=type(e).__name__)
+            raise
+        return RecordedStream(self.provider, request, stream, start, on_error=lambda: self._count("errors"))
+
+    def embed(self, **request):
+        """`embeddings.create(**request)`, coalesced and cached."""
+        return self._call("embeddings", request, lambda: self.client.embeddings.create(**request))
+
+    async def achat(self, **request):
+        return await self._acall("chat", request, lambda: self.async_client.chat.completions.create(**request))
+
+    async def astream(self, **request):
+        self._count("requests")
+        start = time.perf_counter()
+        try:
+            stream = await self.async_client.chat.completions.create(**request, stream=True)
+        except Exception as e:
+            self._count("errors")
+            _record(self.provider, "stream", request, start=start, error=type(e).__name__)
+            raise
+        return AsyncRecordedStream(self.provider, request, stream, start, on_error=lambda: self._count("errors"))
+
+    async def aembed(self, **request):
+        return await self._acall("embeddings", request, lambda: self.async_client.embeddings.create(**request))
+
+
+def gateway(provider):
+    """The shared gateway for `provider`, built on first use."""
+    with _lock:
+        if provider not in _gateways:
+            if provider not in PROVIDERS:
+                raise ValueError(f"Unknown LLM provider: {provider}")
+            _gateways[provider] = LLMGateway(provider, cache=MemoryCache(LLM_CACHE_SIZE) if LLM_CACHE_SIZE > 0 else None)
+        return _gateways[provider]
+
+
+async def aclose():
+    """Closes the async clients every shared gateway built for the running event loop."""
+    with _lock:
+        gateways = list(_gateways.values())
+    for llm in gateways:
+        await llm.aclose()
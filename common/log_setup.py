@@ -0,0 +1,72 @@
+"""Logging that keeps disk and console I/O off the calling thread.
+
+    from common.log_setup import setup_logging
+    setup_logging("ai_news.log")
+
+Records are put on an in-memory queue by a `QueueHandler`. A background
+`QueueListener` writes them to the console and to a size-rotated log file
+(LOG_MAX_BYTES per file, LOG_BACKUP_COUNT old files kept). DEBUG records are
+sampled at LOG_DEBUG_SAMPLE_RATE before they are queued, so verbose library
+logging costs little. Everything still queued is written at interpreter exit.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL")  # overrides the level an agent passes to setup_logging
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))  # 1 keeps every DEBUG record
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class DebugSampler(logging.Filter):
+    """Passes every record above DEBUG and a `rate` fraction of DEBUG records."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def setup_logging(log_file, level=logging.INFO, console=True, debug_sample_rate=LOG_DEBUG_SAMPLE_RATE):
+    """
+    Routes the root logger through a queue to a background writer; replaces any handlers it had.
+    Returns the running `QueueListener`.
+    """
+    level = LOG_LEVEL or level
+    if isinstance(level, str):
+        if level.upper() not in LOG_LEVELS:
+            raise ValueError(f"LOG_LEVEL must be one of {', '.join(LOG_LEVELS)} (got {level!r})")
+        level = level.upper()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(debug_sample_rate))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
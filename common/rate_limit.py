@@ -0,0 +1,48 @@
+"""Token-bucket rate limiting for calls to third-party APIs.
+
+    bucket = TokenBucket(rate=2, capacity=2)   # 2 requests/second, bursts of 2
+    bucket.acquire()                           # blocks until a token is free
+    await bucket.aacquire()                    # same, without blocking the event loop
+
+One bucket can be shared by threads and coroutines alike.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        """`rate` tokens are added per second, up to `capacity` (default: one second's worth)."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take `tokens` now if available; otherwise returns the seconds to wait before retrying."""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        return self._reserve(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1) -> None:
+        while (wait := self._reserve(tokens)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1) -> None:
+        while (wait := self._reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,96 @@
+"""One structured record per scheduled run: stage durations, item counts, API calls, failures.
+
+    run_metrics = RunMetrics("weather")
+
+    with run_metrics:                          # one run; the record is emitted on exit
+        with run_metrics.stage("fetch"):
+            ...
+        run_metrics.count("forecast_api_calls")
+        run_metrics.set("llm", dict(llm.stats))
+
+Each record is appended as a JSON line to RUN_METRICS_FILE and logged, so run
+time trends can be tracked without parsing logs:
+
+    {"agent": "weather", "started_at": "...", "duration_s": 4.2, "status": "ok", "error": null,
+     "stages": {"fetch": 3.1, "email": 0.9}, "counts": {"forecast_api_calls": 3}, ...}
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+RUN_METRICS_FILE = os.getenv("RUN_METRICS_FILE", "run_metrics.jsonl")  # empty: log the record only
+
+
+class RunMetrics:
+    def __init__(self, agent, path=RUN_METRICS_FILE):
+        self.agent = agent
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.counts = Counter()
+        self.values = {}
+
+    def count(self, name, n=1):
+        """Adds `n` to a counter; safe to call from worker threads."""
+        with self._lock:
+            self.counts[name] += n
+
+    def set(self, name, value):
+        """Stores a JSON-serializable value (e.g. a stats dict) under `name`."""
+        with self._lock:
+            self.values[name] = value
+
+    @contextmanager
+    def stage(self, name):
+        """Times the block; repeated stages of the same name add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = round(self.stages.get(name, 0.0) + time.perf_counter() - start, 3)
+
+    def __enter__(self):
+        self._reset()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.emit(error=f"{exc_type.__name__}: {exc}" if exc_type else None)
+        return False
+
+    def record(self, error=None):
+        with self._lock:
+            return {
+                "agent": self.agent,
+                "started_at": self.started_at.isoformat(),
+                "duration_s": round(time.perf_counter() - self._start, 3),
+                "status": "failed" if error else "ok",
+                "error": error,
+                "stages": dict(self.stages),
+                "counts": dict(self.counts),
+                **self.values,
+            }
+
+    def emit(self, error=None):
+        """Appends the run's record to `path` and logs it; returns the record."""
+        record = self.record(error)
+        line = json.dumps(record, default=str)
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logging.error(f"Could not write run metrics to {self.path}: {e}")
+        logging.info(f"Run metrics: {line}")
+        return record
@@ -0,0 +1,240 @@
+"""Append-only ledger of LLM calls: who made them, what they cost and how long they took.
+
+Every call through `common.llm_gateway` is recorded automatically. Each record
+holds the provider, model, prompt and completion tokens, latency (and time to
+first token for streams) and cache status. Agents label their calls:
+
+    usage_ledger.set_agent("news")              # process default (else LLM_AGENT or the script name)
+    with usage_ledger.tag(stage="section"):     # applies to calls made inside the block
+        llm.chat(...)
+
+`record()` only puts the record on a queue. A background thread appends
+batches as JSON lines to LLM_USAGE_LOG, which all agents share by default.
+Set LLM_USAGE_LOG to an empty value to turn recording off.
+
+    python -m common.usage_ledger                      # totals and latency percentiles per agent and stage
+    python -m common.usage_ledger --by model --since 24h --prices prices.json
+"""
+
+import argparse
+import atexit
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+LLM_USAGE_LOG = os.getenv(
+    "LLM_USAGE_LOG", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "llm_usage.jsonl")
+)
+FLUSH_INTERVAL = 1.0  # seconds between writes; records are batched in between
+
+_agent = os.getenv("LLM_AGENT") or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+_tags = contextvars.ContextVar("usage_ledger_tags", default={})
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+
+# --------------------------
+# Tagging
+# --------------------------
+
+def set_agent(name):
+    """The agent name recorded for calls made outside any `tag(agent=...)` block."""
+    global _agent
+    _agent = name
+
+
+@contextmanager
+def tag(**tags):
+    """Adds `agent`, `stage` (or any other field) to the records of calls made in this block."""
+    token = _tags.set({**_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def current_tags():
+    return {"agent": _agent, **_tags.get()}
+
+# --------------------------
+# Recording
+# --------------------------
+
+def _usage_value(usage, *names):
+    for name in names:
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if value is not None:
+            return value
+    return None
+
+
+def record(provider, model, kind="chat", usage=None, latency_s=None, cache="miss", error=None, tags=None, **extra):
+    """
+    Queues one ledger record. `usage` is the API's usage object or dict (OpenAI-style
+    `prompt_tokens`/`completion_tokens`, or LangChain-style `input_tokens`/`output_tokens`).
+    `tags` defaults to the current agent and `tag()` block.
+    """
+    if not LLM_USAGE_LOG:
+        return
+    _queue.put({
+        "ts": round(time.time(), 3),
+        **(tags if tags is not None else current_tags()),
+        "provider": provider,
+        "model": model,
+        "kind": kind,
+        "prompt_tokens": _usage_value(usage, "prompt_tokens", "input_tokens") if usage else None,
+        "completion_tokens": _usage_value(usage, "completion_tokens", "output_tokens") if usage else None,
+        "latency_s": round(latency_s, 4) if latency_s is not None else None,
+        "cache": cache,
+        "error": error,
+        **extra,
+    })
+    _ensure_writer()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_write_loop, name="usage-ledger", daemon=True)
+                _writer.start()
+                atexit.register(flush)
+
+
+def _drain():
+    records = []
+    while True:
+        try:
+            records.append(_queue.get_nowait())
+        except queue.Empty:
+            return records
+
+
+def _append(records):
+    if not records:
+        return
+    try:
+        # One write per batch keeps lines from concurrent agents intact
+        with open(LLM_USAGE_LOG, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+    except OSError as e:
+        print(f"usage ledger: could not write {len(records)} records to {LLM_USAGE_LOG}: {e}", file=sys.stderr)
+
+
+def _write_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        with _writer_lock:
+            _append(_drain())
+
+
+def flush():
+    """Writes every queued record now (also runs at interpreter exit)."""
+    with _writer_lock:
+        _append(_drain())
+
+# --------------------------
+# Summary
+# --------------------------
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_since(text):
+    """'90m', '24h', '7d' -> a Unix timestamp that long ago."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    return time.time() - float(text[:-1]) * units[text[-1]] if text[-1] in units else time.time() - float(text)
+
+
+def read_records(paths, since=None):
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by a crash
+                if since is None or record.get("ts", 0) >= since:
+                    yield record
+
+
+def cost(record, prices):
+    """Dollars for one record, from per-million-token prices: {model: {"input": x, "output": y}}."""
+    price = prices.get(record.get("model"))
+    if not price:
+        return 0.0
+    return ((record.get("prompt_tokens") or 0) * price.get("input", 0)
+            + (record.get("completion_tokens") or 0) * price.get("output", 0)) / 1_000_000
+
+
+def summarize(records, by=("agent", "stage"), prices=None):
+    """Per-group call counts, cache hits, errors, token totals, cost and latency percentiles."""
+    groups = defaultdict(lambda: {"calls": 0, "cached": 0, "errors": 0, "prompt_tokens": 0,
+                                  "completion_tokens": 0, "cost": 0.0, "latencies": [], "ttfts": []})
+    for record in records:
+        group = groups[tuple(str(record.get(field) or "-") for field in by)]
+        group["calls"] += 1
+        group["cached"] += record.get("cache") != "miss"
+        group["errors"] += bool(record.get("error"))
+        # Tokens, cost and latency describe upstream calls; cache hits and shared responses are free
+        if record.get("cache") != "miss":
+            continue
+        group["prompt_tokens"] += record.get("prompt_tokens") or 0
+        group["completion_tokens"] += record.get("completion_tokens") or 0
+        group["cost"] += cost(record, prices or {})
+        if record.get("latency_s") is not None and not record.get("error"):
+            group["latencies"].append(record["latency_s"])
+        if record.get("ttft_s") is not None:
+            group["ttfts"].append(record["ttft_s"])
+    return dict(sorted(groups.items()))
+
+
+def print_summary(groups, by, show_cost):
+    def ms(value):
+        return f"{value * 1000:.0f}" if value is not None else "-"
+
+    width = max([len(" / ".join(by))] + [len(" / ".join(key)) for key in groups])
+    header = (f"{' / '.join(by):<{width}} {'calls':>7} {'cached':>7} {'errors':>7} {'prompt tok':>11} "
+              f"{'compl tok':>10} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'ttft p50':>8}")
+    print(header + (f" {'cost $':>9}" if show_cost else ""))
+    for key, group in groups.items():
+        latencies = group["latencies"]
+        line = (f"{' / '.join(key):<{width}} {group['calls']:>7} {group['cached']:>7} {group['errors']:>7} "
+                f"{group['prompt_tokens']:>11} {group['completion_tokens']:>10} {ms(percentile(latencies, 50)):>7} "
+                f"{ms(percentile(latencies, 95)):>7} {ms(percentile(latencies, 99)):>7} "
+                f"{ms(percentile(group['ttfts'], 50)):>8}")
+        print(line + (f" {group['cost']:>9.4f}" if show_cost else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the LLM usage ledger.")
+    parser.add_argument("paths", nargs="*", default=[LLM_USAGE_LOG], help="Ledger files (default: LLM_USAGE_LOG)")
+    parser.add_argument("--by", default="agent,stage", help="Comma-separated fields to group by (e.g. agent,model)")
+    parser.add_argument("--since", help="Only records newer than this: 90m, 24h, 7d")
+    parser.add_argument("--prices", help='JSON file of $ per million tokens: {"model": {"input": 0.5, "output": 1.5}}')
+    args = parser.parse_args()
+
+    prices = None
+    if args.prices:
+        with open(args.prices) as f:
+            prices = json.load(f)
+    by = tuple(field.strip() for field in args.by.split(","))
+    records = read_records(args.paths, parse_since(args.since) if args.since else None)
+    print_summary(summarize(records, by, prices), by, show_cost=prices is not None)
+
+
+if __name__ == "__main__":
+    main()
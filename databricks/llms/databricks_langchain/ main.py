@@ -1,6 +1,15 @@
+import argparse
+import asyncio
+import json
 import os
+import random
+import sys
+import time
 from dotenv import load_dotenv
-from databricks_langchain import ChatDatabricks
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common import usage_ledger
+from common.llm_gateway import gateway
 
 # Load credentials from .env file or environment variables
 load_dotenv()
@@ -13,25 +22,262 @@ if not host or not token:
         "Please set DATABRICKS_HOST and DATABRICKS_TOKEN as environment variables or in a .env file."
     )
 
-# Set up the Foundation Model (replace with your actual endpoint/model name)
-chat_model = ChatDatabricks(
-    model="databricks-meta-llama-3-3-70b-instruct",  # Change to your foundation model if needed
-    host=host,
-    api_key=token,
-    temperature=0.1,
-    max_tokens=256
-)
+# Endpoint and reply length (replace with your actual endpoint/model name)
+MODEL = os.getenv("DATABRICKS_MODEL", "databricks-meta-llama-3-3-70b-instruct")
+MAX_TOKENS = int(os.getenv("DATABRICKS_MAX_TOKENS", "1024"))
+
+# Tokens of earlier conversation sent with each question; the oldest turns are dropped first
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+
+SYSTEM_PROMPT = os.getenv("SYSTEM_PROMPT", "You are a helpful assistant.")
+
+# Batch mode: requests in flight at once, and retries per prompt (with exponential backoff)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "4"))
+BATCH_RETRY_BACKOFF = float(os.getenv("BATCH_RETRY_BACKOFF", "1"))
+
+# The serving endpoint speaks the OpenAI chat API; the shared gateway pools its connections,
+# applies DATABRICKS_REQUESTS_PER_MINUTE and lets identical batch prompts share one call
+llm = gateway("databricks")
+usage_ledger.set_agent("databricks")
+GENERATION = {"model": MODEL, "temperature": 0.1, "max_tokens": MAX_TOKENS}
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) used for history budgeting."""
+    return len(text) // 4 + 1
+
+
+def trim_history(history, budget=HISTORY_TOKEN_BUDGET):
+    """Keeps the most recent whole turns (question + answer) that fit in `budget` tokens."""
+    kept, used = [], 0
+    for i in range(len(history) - 2, -1, -2):
+        turn = history[i:i + 2]
+        cost = sum(estimate_tokens(message["content"]) for message in turn)
+        if used + cost > budget:
+            break
+        kept[:0] = turn
+        used += cost
+    return kept
+
+
+def stream_reply(messages):
+    """
+    Streams the model's reply to stdout as it arrives.
+
+    Returns the full reply text and per-turn metrics: time to first token, output tokens and tokens/sec.
+    """
+    start = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    with usage_ledger.tag(stage="chat"):
+        stream = llm.stream(messages=messages, stream_options={"include_usage": True}, **GENERATION)
+    try:
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(text)
+                print(text, end="", flush=True)
+            if chunk.usage:
+                usage = chunk.usage
+    finally:
+        stream.close()
+    end = time.perf_counter()
+    print()
+
+    reply = "".join(parts)
+    output_tokens = (usage.completion_tokens if usage else None) or estimate_tokens(reply)
+    generation_time = end - (first_token_at or start)
+    return reply, {
+        "ttft_s": (first_token_at or end) - start,
+        "total_s": end - start,
+        "output_tokens": output_tokens,
+        "tokens_per_s": output_tokens / generation_time if generation_time > 0 else 0.0,
+    }
+
+
+def chat_loop():
+    print("Welcome to your Databricks LLM chat! Type 'exit' or 'quit' to leave, 'reset' to clear the history.")
+    history = []
 
-print("Welcome to your Databricks LLM chat! Type 'exit' or 'quit' to leave.")
+    while True:
+        user_input = input("You: ")
+        if user_input.strip().lower() in {"exit", "quit"}:
+            print("Goodbye!")
+            break
+        if user_input.strip().lower() == "reset":
+            history = []
+            print("History cleared.")
+            continue
 
-while True:
-    user_input = input("You: ")
-    if user_input.strip().lower() in {"exit", "quit"}:
-        print("Goodbye!")
-        break
+        history = trim_history(history)
+        messages = [message("system", SYSTEM_PROMPT), *history, message("user", user_input)]
+        try:
+            print("Assistant: ", end="", flush=True)
+            reply, metrics = stream_reply(messages)
+            history += [message("user", user_input), message("assistant", reply)]
+            print(
+                f"[first token {metrics['ttft_s']:.2f}s, {metrics['output_tokens']} tokens "
+                f"at {metrics['tokens_per_s']:.1f} tok/s, {(len(messages) - 2) // 2} earlier turns sent]"
+            )
+        except Exception as e:
+            print(f"\nError: {e}")
 
+
+def completed_indices(output_path):
+    """Indices already answered successfully in an earlier (possibly interrupted) run."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interruption
+            if record.get("error") is None:
+                done.add(record["index"])
+    return done
+
+
+def read_prompts(input_path, prompt_field, skip):
+    """
+    Yields (index, record, prompt, error) for every input line not in `skip`. A line that is not
+    JSON or has no prompt is yielded with an `error` instead of stopping the batch.
+    """
+    with open(input_path) as f:
+        for index, line in enumerate(f):
+            if not line.strip() or index in skip:
+                continue
+            try:
+                record = json.loads(line)
+                prompt = record if isinstance(record, str) else record[prompt_field]
+            except json.JSONDecodeError as e:
+                yield index, None, None, f"invalid input: not JSON ({e})"
+                continue
+            except (KeyError, TypeError):
+                yield index, None, None, f"invalid input: no '{prompt_field}' field"
+                continue
+            yield index, record, prompt, None
+
+
+async def answer(index, record, prompt, max_retries):
+    """Runs one prompt with retry/backoff; returns the output record."""
+    start = time.perf_counter()
+    record_id = record.get("request_id", record.get("id")) if isinstance(record, dict) else None
+    for attempt in range(1, max_retries + 2):
+        try:
+            with usage_ledger.tag(stage="batch"):
+                response = await llm.achat(
+                    messages=[message("system", SYSTEM_PROMPT), message("user", prompt)], **GENERATION
+                )
+            output = response.choices[0].message.content
+            usage = response.usage
+            return {
+                "index": index,
+                "id": record_id,
+                "output": output,
+                "input_tokens": usage.prompt_tokens if usage else None,
+                "output_tokens": (usage.completion_tokens if usage else None) or estimate_tokens(output or ""),
+                "latency_s": round(time.perf_counter() - start, 3),
+                "attempts": attempt,
+                "error": None,
+            }
+        except Exception as e:
+            if attempt > max_retries:
+                return {"index": index, "id": record_id, "output": None,
+                        "latency_s": round(time.perf_counter() - start, 3),
+                        "attempts": attempt, "error": f"{type(e).__name__}: {e}"}
+            await asyncio.sleep(BATCH_RETRY_BACKOFF * 2 ** (attempt - 1) * (1 + random.random() / 2))
+
+
+async def run_batch(input_path, output_path, prompt_field="prompt", concurrency=BATCH_CONCURRENCY,
+                    max_retries=BATCH_MAX_RETRIES):
+    """
+    Answers every prompt in `input_path` (JSONL) with at most `concurrency` requests in flight.
+
+    Results are appended to `output_path` in completion order, one JSON line per prompt, carrying the
+    input line's index. Prompts already answered in `output_path` are skipped, so an interrupted run
+    can simply be started again.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    skip = completed_indices(output_path)
+    if skip:
+        print(f"Resuming: {len(skip)} prompts already answered in {output_path}")
+
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"ok": 0, "failed": 0, "output_tokens": 0}
+
+    async def worker(out):
+        while (item := await queue.get()) is not None:
+            index, record, prompt, error = item
+            if error:
+                result = {"index": index, "id": None, "output": None, "attempts": 0, "error": error}
+            else:
+                result = await answer(index, record, prompt, max_retries=max_retries)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result["error"] is None:
+                stats["ok"] += 1
+                stats["output_tokens"] += result["output_tokens"]
+            else:
+                stats["failed"] += 1
+                print(f"Prompt {result['index']} failed: {result['error']}")
+
+    start = time.perf_counter()
     try:
-        response = chat_model.invoke(user_input)
-        print("Assistant:", response.content)
-    except Exception as e:
-        print(f"Error: {e}")
+        with open(output_path, "a") as out:
+            workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+            try:
+                for item in read_prompts(input_path, prompt_field, skip):
+                    await queue.put(item)
+            finally:
+                # Prompts already queued are answered and written even if reading the input failed
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+    finally:
+        await llm.aclose()  # the async client's connection pool belongs to this event loop
+    elapsed = time.perf_counter() - start
+
+    total = stats["ok"] + stats["failed"]
+    print(
+        f"Answered {stats['ok']} of {total} prompts ({stats['failed']} failed) in {elapsed:.1f}s: "
+        f"{total / elapsed if elapsed else 0:.2f} requests/s, "
+        f"{stats['output_tokens'] / elapsed if elapsed else 0:.1f} output tokens/s"
+    )
+    return stats
+
+
+def count_arg(minimum):
+    """argparse type for an integer of at least `minimum`."""
+    def parse(text):
+        value = int(text)
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}")
+        return value
+    return parse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat with a Databricks foundation model, or run a batch of prompts.")
+    parser.add_argument("--batch", metavar="INPUT_JSONL", help="Answer every prompt in this JSONL file instead of chatting")
+    parser.add_argument("--output", help="Output JSONL (default: <input>.out.jsonl); re-running resumes it")
+    parser.add_argument("--prompt-field", default="prompt", help="Field of each input line holding the prompt")
+    parser.add_argument("--concurrency", type=count_arg(1), default=BATCH_CONCURRENCY)
+    parser.add_argument("--max-retries", type=count_arg(0), default=BATCH_MAX_RETRIES)
+    args = parser.parse_args()
+
+    if args.batch:
+        output = args.output or f"{os.path.splitext(args.batch)[0]}.out.jsonl"
+        asyncio.run(run_batch(args.batch, output, args.prompt_field, args.concurrency, args.max_retries))
+    else:
+        chat_loop()
@@ -0,0 +1,175 @@
+"""Versioned answer cache for `finance.chat_with_documents`.
+
+Answers are keyed by the normalised question, the search scope, the chat
+deployment and an index-version stamp. `finance.process_chunks` and
+`finance.create_vector_search_index` bump the stamp whenever the indexed
+content changes, so an answer can never outlive the documents it came from.
+The stamp lives in a small file so every process on the host (Streamlit app,
+HTTP service, scripts) sees the same version. Processes on other hosts only see
+a bump if INDEX_VERSION_FILE is on storage they all mount; otherwise they keep
+serving cached answers until ANSWER_CACHE_TTL expires, so run the service on a
+single host or point INDEX_VERSION_FILE at a shared volume.
+
+Entries are held in an in-memory LRU with a TTL, optionally backed by a
+SQLite file that survives restarts. `stats()` reports hit rates.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+# --------------------------
+# Configuration
+# --------------------------
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))  # 0 disables the cache
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+ANSWER_CACHE_DB = os.getenv("ANSWER_CACHE_DB")  # optional on-disk tier
+ANSWER_CACHE_DB_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_DB_MAX_ENTRIES", "10000"))
+# Must be shared by every host that serves cached answers (see the module docstring)
+INDEX_VERSION_FILE = os.getenv(
+    "INDEX_VERSION_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_version")
+)
+
+# --------------------------
+# Index version stamp
+# --------------------------
+
+def current_index_version() -> str:
+    """The current index-version stamp ("0" before anything has been uploaded)."""
+    try:
+        with open(INDEX_VERSION_FILE) as f:
+            return f.read().strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_index_version() -> str:
+    """Record that the indexed content changed, invalidating every cached answer."""
+    version = f"{time.time_ns()}-{uuid4().hex[:8]}"
+    temp_path = f"{INDEX_VERSION_FILE}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(version)
+    os.replace(temp_path, INDEX_VERSION_FILE)
+    return version
+
+# --------------------------
+# Cache
+# --------------------------
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+def cache_key(query: str, scope: dict | None, model: str, version: str) -> str:
+    payload = json.dumps(
+        {"q": normalize_query(query), "scope": scope or {}, "model": model, "version": version},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL,
+        db_path: str | None = ANSWER_CACHE_DB,
+        db_max_entries: int = ANSWER_CACHE_DB_MAX_ENTRIES,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._entries = OrderedDict()  # key -> (answer, stored_at)
+        self._lock = threading.Lock()
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if db_path:
+            with self._connect() as db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS answers "
+                    "(key TEXT PRIMARY KEY, answer TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        if self.db_path:
+            with self._connect() as db:
+                row = db.execute(
+                    "SELECT answer, stored_at FROM answers WHERE key = ? AND stored_at >= ?",
+                    (key, now - self.ttl),
+                ).fetchone()
+            if row:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self._counts["disk_hits"] += 1
+                return row[0]
+
+        with self._lock:
+            self._counts["misses"] += 1
+        return None
+
+    def set(self, key: str, answer: str) -> None:
+        if not self.enabled or not answer:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer, now)
+            self._counts["stores"] += 1
+        if self.db_path:
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?)", (key, answer, now))
+                # Expired rows and the oldest rows beyond the size cap go first
+                db.execute("DELETE FROM answers WHERE stored_at < ?", (now - self.ttl,))
+                db.execute(
+                    "DELETE FROM answers WHERE key NOT IN "
+                    "(SELECT key FROM answers ORDER BY stored_at DESC LIMIT ?)",
+                    (self.db_max_entries,),
+                )
+
+    def _remember(self, key: str, answer: str, stored_at: float) -> None:
+        self._entries[key] = (answer, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._connect() as db:
+                db.execute("DELETE FROM answers")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            counts["entries"] = len(self._entries)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        counts["hit_rate"] = (counts["memory_hits"] + counts["disk_hits"]) / lookups if lookups else 0.0
+        return counts
@@ -1,5 +1,5 @@
 import streamlit as st
-from finance import chat_with_documents, extract_text_from_pdf, chunk_text, process_chunks, create_vector_search_index, index_exists
+from finance import stream_chat_with_documents, extract_pages_from_pdf, chunk_pages, process_chunks, create_vector_search_index, index_is_current, document_hash, document_indexed
 import os
 
 st.set_page_config(page_title="Document Chat", page_icon="📚")
@@ -10,39 +10,48 @@ st.title("💬 Chat with Your Documents")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Hash of the currently uploaded document; chat only searches its chunks
+if "source_hash" not in st.session_state:
+    st.session_state.source_hash = None
+
 # File uploader
 uploaded_file = st.file_uploader("Upload a PDF document", type="pdf")
 
 if uploaded_file:
-    # Save the uploaded file temporarily
-    temp_path = f"temp_{uploaded_file.name}"
-    with open(temp_path, "wb") as f:
-        f.write(uploaded_file.getvalue())
+    file_bytes = uploaded_file.getvalue()
+    source_hash = document_hash(file_bytes)
+
+    # Streamlit reruns the script on every interaction; only process a new document once
+    if source_hash != st.session_state.source_hash:
+        # Save the uploaded file temporarily
+        temp_path = f"temp_{uploaded_file.name}"
+        with open(temp_path, "wb") as f:
+            f.write(file_bytes)
     
-    try:
-        # Extract and process the document
-        with st.spinner("Processing document..."):
-            # Extract text from PDF
-            pdf_text = extract_text_from_pdf(temp_path)
-            
-            # Create chunks
-            chunks = chunk_text(pdf_text)
-            
-            # Create index if it doesn't exist
-            if not index_exists():
-                create_vector_search_index()
-            
-            # Process and upload chunks
-            process_chunks(chunks)
+        try:
+            # Extract and process the document
+            with st.spinner("Processing document..."):
+                # Create index if it doesn't exist (or predates the metadata fields)
+                if not index_is_current():
+                    create_vector_search_index()
+
+                # Skip extraction and upload if this exact document was indexed before
+                if not document_indexed(source_hash):
+                    # Extract text from PDF and create per-page chunks
+                    chunks = chunk_pages(extract_pages_from_pdf(temp_path))
+                
+                    # Process and upload chunks
+                    process_chunks(chunks, file_name=uploaded_file.name, source_hash=source_hash)
             
-            st.success("Document processed successfully!")
+                st.session_state.source_hash = source_hash
+                st.success("Document processed successfully!")
     
-    except Exception as e:
-        st.error(f"Error processing document: {str(e)}")
-    finally:
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        except Exception as e:
+            st.error(f"Error processing document: {str(e)}")
+        finally:
+            # Clean up temporary file
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
 
 # Display chat messages
 for message in st.session_state.messages:
@@ -59,11 +68,18 @@ if prompt := st.chat_input("Ask a question about your documents"):
     st.session_state.messages.append({"role": "user", "content": prompt})
     
     try:
-        # Get assistant response
+        # Stream the assistant response as it is generated
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = chat_with_documents(prompt)
-                st.markdown(response)
+            scope = {"source_hash": st.session_state.source_hash} if st.session_state.source_hash else None
+            metrics = {}
+            response = st.write_stream(stream_chat_with_documents(prompt, scope=scope, metrics=metrics))
+            if metrics.get("cached"):
+                st.caption("Answered from cache")
+            else:
+                st.caption(
+                    f"First token after {metrics.get('ttft_s', 0):.2f}s "
+                    f"(retrieval {metrics['retrieval_s']:.2f}s), done in {metrics['total_s']:.2f}s"
+                )
         
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": response})
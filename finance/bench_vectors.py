@@ -0,0 +1,224 @@
+"""Benchmark reduced-dimension and quantized vector storage for the finance index.
+
+Compares every combination of `--dimensions` and `--compression` against the
+current configuration (1536-d float32, no compression). Ground truth is an
+exact local kNN over the full-precision vectors, so recall@k measures what a
+configuration loses relative to today's index.
+
+By default everything runs locally: quantization, oversampled candidate
+search and full-precision rescoring are simulated with numpy. Pass `--live`
+to create one throwaway Azure AI Search index per configuration and measure
+real upload time, index size and query latency instead.
+
+Synthetic vectors spread information evenly across dimensions, so they
+understate how well `text-embedding-3-*` embeddings survive shortening; use
+`--corpus` with real embeddings when comparing `--dimensions`.
+
+    python bench_vectors.py --docs 20000 --queries 200
+    python bench_vectors.py --corpus embeddings.npz --live
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from vector_eval import (
+    exact_knn,
+    load_corpus,
+    percentile,
+    recall_at_k,
+    shorten,
+    synthetic_corpus,
+    timed,
+)
+
+NATIVE_DIMENSIONS = 1536
+UPLOAD_BATCH_SIZE = 500
+
+# --------------------------
+# Local simulation
+# --------------------------
+
+def quantize_scalar(vectors: np.ndarray):
+    """int8 scalar quantization with a per-dimension min/max range."""
+    low = vectors.min(axis=0)
+    scale = (vectors.max(axis=0) - low) / 255.0
+    scale[scale == 0] = 1.0
+    codes = np.round((vectors - low) / scale - 128).astype(np.int8)
+    return codes, scale, low
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """1-bit quantization: the sign of each dimension, packed into bytes."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+class LocalIndex:
+    """In-memory stand-in for a (possibly compressed) vector index."""
+
+    def __init__(self, vectors: np.ndarray, compression: str, oversampling: float):
+        self.vectors = vectors
+        self.compression = compression
+        self.oversampling = oversampling
+        if compression == "scalar":
+            self.codes, self.scale, self.low = quantize_scalar(vectors)
+        elif compression == "binary":
+            self.codes = quantize_binary(vectors)
+
+    @property
+    def index_bytes(self) -> int:
+        """Bytes held in the searchable (in-memory) vector index."""
+        if self.compression == "none":
+            return self.vectors.nbytes
+        return self.codes.nbytes
+
+    def _candidate_scores(self, query: np.ndarray) -> np.ndarray:
+        if self.compression == "scalar":
+            # q . (codes * scale + low + 128 * scale), without dequantizing the matrix
+            weighted = query * self.scale
+            return self.codes @ weighted + float(query @ (self.low + 128 * self.scale))
+        # Binary: fewer differing sign bits = more similar
+        packed = np.packbits(query > 0)
+        distances = np.unpackbits(self.codes ^ packed, axis=1).sum(axis=1)
+        return -distances.astype(np.float32)
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        if self.compression == "none":
+            return exact_knn(self.vectors, query[None, :], k)[0]
+        candidates = min(len(self.vectors), int(k * self.oversampling))
+        scores = self._candidate_scores(query)
+        shortlist = np.argpartition(-scores, kth=candidates - 1)[:candidates]
+        # Rescore the shortlist with the preserved full-precision vectors
+        exact = self.vectors[shortlist] @ query
+        return shortlist[np.argsort(-exact)[:k]]
+
+
+def run_local(docs, queries, truth, dimensions, compression, k, oversampling):
+    doc_vectors = shorten(docs, dimensions) if dimensions < docs.shape[1] else docs
+    query_vectors = shorten(queries, dimensions) if dimensions < queries.shape[1] else queries
+
+    index, build_s = timed(LocalIndex, doc_vectors, compression, oversampling)
+    # Vectors are always uploaded as float32 JSON; quantization happens server-side.
+    payload, encode_s = timed(
+        lambda: json.dumps([{"id": str(i), "content_vector": v} for i, v in enumerate(doc_vectors.tolist())])
+    )
+
+    latencies, found = [], []
+    for query in query_vectors:
+        result, elapsed = timed(index.search, query, k)
+        latencies.append(elapsed * 1000)
+        found.append(result)
+
+    return {
+        "index_mb": index.index_bytes / 1e6,
+        "payload_mb": len(payload) / 1e6,
+        "upload_s": encode_s + build_s,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "recall": recall_at_k(found, truth, k),
+    }
+
+# --------------------------
+# Live Azure AI Search
+# --------------------------
+
+def run_live(docs, queries, truth, dimensions, compression, k, oversampling, keep=False):
+    import clients
+    import finance
+    from azure.search.documents.models import VectorizedQuery
+
+    index_name = f"{finance.INDEX_NAME}-bench-{dimensions}-{compression}"
+    finance.create_vector_search_index(
+        index_name,
+        dimensions=dimensions,
+        compression=compression,
+        oversampling=oversampling,
+    )
+    search_client = clients.search_client_for(index_name)
+    index_client = clients.get("search_index_client")
+
+    doc_vectors = shorten(docs, dimensions) if dimensions < docs.shape[1] else docs
+    query_vectors = shorten(queries, dimensions) if dimensions < queries.shape[1] else queries
+    documents = [
+        {"id": str(i), "content": "", "content_vector": vector}
+        for i, vector in enumerate(doc_vectors.tolist())
+    ]
+
+    try:
+        start = time.perf_counter()
+        for offset in range(0, len(documents), UPLOAD_BATCH_SIZE):
+            search_client.upload_documents(documents[offset:offset + UPLOAD_BATCH_SIZE])
+        upload_s = time.perf_counter() - start
+        payload_mb = len(json.dumps(documents)) / 1e6
+
+        # Statistics lag behind indexing; wait until every document is counted.
+        deadline = time.time() + 300
+        stats = index_client.get_index_statistics(index_name)
+        while stats["document_count"] < len(documents) and time.time() < deadline:
+            time.sleep(5)
+            stats = index_client.get_index_statistics(index_name)
+
+        latencies, found = [], []
+        for query in query_vectors.tolist():
+            vector_query = VectorizedQuery(vector=query, k_nearest_neighbors=k, fields="content_vector")
+            start = time.perf_counter()
+            results = list(search_client.search(search_text=None, vector_queries=[vector_query], select=["id"], top=k))
+            latencies.append((time.perf_counter() - start) * 1000)
+            found.append([int(doc["id"]) for doc in results])
+
+        return {
+            "index_mb": stats["vector_index_size"] / 1e6,
+            "payload_mb": payload_mb,
+            "upload_s": upload_s,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "recall": recall_at_k(found, truth, k),
+        }
+    finally:
+        search_client.close()
+        if not keep:
+            index_client.delete_index(index_name)
+
+# --------------------------
+# Entry point
+# --------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help=".npz file with 'docs' and 'queries' embedding arrays (default: synthetic)")
+    parser.add_argument("--docs", type=int, default=10000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=100, help="Synthetic query count")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[1536, 1024, 512, 256])
+    parser.add_argument("--compression", nargs="+", default=["none", "scalar", "binary"], choices=["none", "scalar", "binary"])
+    parser.add_argument("--oversampling", type=float, default=4.0)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="Benchmark against Azure AI Search instead of locally")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark indexes after a live run")
+    args = parser.parse_args()
+
+    if args.corpus:
+        docs, queries = load_corpus(args.corpus)
+    else:
+        docs, queries = synthetic_corpus(args.docs, args.queries, NATIVE_DIMENSIONS)
+    truth = exact_knn(docs, queries, args.k)
+
+    print(f"{len(docs)} docs, {len(queries)} queries, recall@{args.k} vs exact full-precision kNN"
+          f" ({'live' if args.live else 'local'})\n")
+    header = f"{'dims':>5} {'compression':<11} {'index MB':>9} {'payload MB':>11} {'upload s':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}"
+    print(header)
+    print("-" * len(header))
+
+    for dimensions in args.dimensions:
+        for compression in args.compression:
+            if args.live:
+                row = run_live(docs, queries, truth, dimensions, compression, args.k, args.oversampling, args.keep)
+            else:
+                row = run_local(docs, queries, truth, dimensions, compression, args.k, args.oversampling)
+            print(f"{dimensions:>5} {compression:<11} {row['index_mb']:>9.1f} {row['payload_mb']:>11.1f} "
+                  f"{row['upload_s']:>9.2f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['recall']:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Lazily constructed Azure / OpenAI clients for the finance agent.
+
+Nothing here touches the network or reads credentials at import time. Each
+client is built the first time it is requested and then reused, so importing
+`finance` stays cheap and works offline. The Azure SDK clients share a single
+pooled `requests` session; the OpenAI client gets its own pooled `httpx`
+client (the two SDKs use different HTTP stacks), whose transport comes from
+`common.llm_gateway` so Azure OpenAI calls honour AZURE_REQUESTS_PER_MINUTE.
+
+Async clients (`get_async`) are cached per event loop, because aiohttp and
+httpx async connection pools cannot be shared between loops.
+
+Tests and benchmarks can swap in local stand-ins:
+
+    with clients.override(search_client=FakeSearchClient()):
+        finance.search_documents("revenue")
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import llm_gateway
+
+load_dotenv()
+
+# --------------------------
+# Configuration
+# --------------------------
+
+INDEX_NAME = os.getenv("AZURE_SEARCH_INDEX", "vector-search-demo")
+OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01")
+
+# Connection pool tuning shared by every client
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+# --------------------------
+# Registry
+# --------------------------
+
+_lock = threading.RLock()
+_clients = {}
+_factories = {}
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {name: client}
+_async_factories = {}
+
+
+def _factory(name, registry=_factories):
+    """Register a zero-argument function that builds the client called `name`."""
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+def _async_factory(name):
+    return _factory(name, _async_factories)
+
+
+def _require(*var_names: str) -> list[str]:
+    """Read required environment variables, raising if any are missing."""
+    values = [os.getenv(var_name) for var_name in var_names]
+    missing = [name for name, value in zip(var_names, values) if not value]
+    if missing:
+        raise ValueError(
+            f"Missing required environment variable(s): {', '.join(missing)}. "
+            "Please set them in the .env file."
+        )
+    return values
+
+
+def get(name: str):
+    """Return the client registered as `name`, building it on first use."""
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            if name not in _factories:
+                raise KeyError(f"Unknown client: {name}")
+            client = _factories[name]()
+            _clients[name] = client
+    return client
+
+
+def get_async(name: str):
+    """Return the async client `name` for the running event loop, building it on first use.
+
+    Stand-ins installed with `set_client`/`override` take precedence.
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+    loop = asyncio.get_running_loop()
+    with _lock:
+        per_loop = _async_clients.setdefault(loop, {})
+        client = per_loop.get(name)
+        if client is None:
+            if name not in _async_factories:
+                raise KeyError(f"Unknown async client: {name}")
+            client = _async_factories[name]()
+            per_loop[name] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the async clients built for the running event loop."""
+    with _lock:
+        per_loop = _async_clients.pop(asyncio.get_running_loop(), {})
+    # Close the service clients before the transports they share
+    for name in ("async_openai_client", "async_search_client", "async_httpx_client", "aiohttp_session"):
+        client = per_loop.get(name)
+        if client is None:
+            continue
+        close = getattr(client, "aclose", None) or client.close
+        await close()
+
+
+def set_client(name: str, client) -> None:
+    """Install `client` under `name`, replacing any previously built one."""
+    with _lock:
+        _clients[name] = client
+
+
+def reset(*names: str) -> None:
+    """Forget built clients so the next `get` rebuilds them (all if no names)."""
+    with _lock:
+        for name in names or list(_clients):
+            _clients.pop(name, None)
+
+
+@contextmanager
+def override(**stand_ins):
+    """Temporarily replace clients with local stand-ins."""
+    with _lock:
+        previous = {name: _clients.get(name) for name in stand_ins}
+        _clients.update(stand_ins)
+    try:
+        yield
+    finally:
+        with _lock:
+            for name, client in previous.items():
+                if client is None:
+                    _clients.pop(name, None)
+                else:
+                    _clients[name] = client
+
+# --------------------------
+# Shared transports
+# --------------------------
+
+@_factory("requests_session")
+def _build_requests_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _httpx_limits():
+    import httpx
+
+    return httpx.Limits(max_connections=HTTP_POOL_MAXSIZE, max_keepalive_connections=HTTP_POOL_CONNECTIONS)
+
+
+@_factory("httpx_client")
+def _build_httpx_client():
+    import httpx
+
+    return httpx.Client(
+        transport=llm_gateway.transport("azure", limits=_httpx_limits()),
+        timeout=HTTP_TIMEOUT,
+    )
+
+
+def _azure_transport():
+    """An azure-core transport over the shared, pooled requests session."""
+    from azure.core.pipeline.transport import RequestsTransport
+
+    return RequestsTransport(session=get("requests_session"), session_owner=False)
+
+# --------------------------
+# Service clients
+# --------------------------
+
+@_factory("document_analysis_client")
+def _build_document_analysis_client():
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+    from azure.core.credentials import AzureKeyCredential
+
+    endpoint, key = _require("AZURE_FORM_RECOGNIZER_ENDPOINT", "AZURE_FORM_RECOGNIZER_KEY")
+    return DocumentAnalysisClient(endpoint, AzureKeyCredential(key), transport=_azure_transport())
+
+
+@_factory("search_index_client")
+def _build_search_index_client():
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents.indexes import SearchIndexClient
+
+    endpoint, key = _require("AZURE_SEARCH_ENDPOINT", "AZURE_SEARCH_KEY")
+    return SearchIndexClient(
+        endpoint=endpoint,
+        credential=AzureKeyCredential(key),
+        transport=_azure_transport(),
+    )
+
+
+@_factory("search_client")
+def _build_search_client(index_name: str = INDEX_NAME):
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    endpoint, key = _require("AZURE_SEARCH_ENDPOINT", "AZURE_SEARCH_KEY")
+    return SearchClient(
+        endpoint=endpoint,
+        index_name=index_name,
+        credential=AzureKeyCredential(key),
+        transport=_azure_transport(),
+    )
+
+
+def search_client_for(index_name: str):
+    """A new (uncached) `SearchClient` for another index over the shared transport."""
+    return _build_search_client(index_name)
+
+
+@_factory("openai_client")
+def _build_openai_client():
+    from openai import AzureOpenAI
+
+    api_key, endpoint = _require("AZURE_OPENAI_KEY", "AZURE_OPENAI_ENDPOINT")
+    return AzureOpenAI(
+        api_key=api_key,
+        api_version=OPENAI_API_VERSION,
+        azure_endpoint=endpoint,
+        http_client=get("httpx_client"),
+    )
+
+# --------------------------
+# Async clients
+# --------------------------
+
+@_async_factory("aiohttp_session")
+def _build_aiohttp_session():
+    import aiohttp
+
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=HTTP_POOL_MAXSIZE, limit_per_host=HTTP_POOL_MAXSIZE),
+    )
+
+
+@_async_factory("async_httpx_client")
+def _build_async_httpx_client():
+    import httpx
+
+    return httpx.AsyncClient(
+        transport=llm_gateway.async_transport("azure", limits=_httpx_limits()),
+        timeout=HTTP_TIMEOUT,
+    )
+
+
+@_async_factory("async_search_client")
+def _build_async_search_client():
+    from azure.core.credentials import AzureKeyCredential
+    from azure.core.pipeline.transport import AioHttpTransport
+    from azure.search.documents.aio import SearchClient
+
+    endpoint, key = _require("AZURE_SEARCH_ENDPOINT", "AZURE_SEARCH_KEY")
+    return SearchClient(
+        endpoint=endpoint,
+        index_name=INDEX_NAME,
+        credential=AzureKeyCredential(key),
+        transport=AioHttpTransport(session=get_async("aiohttp_session"), session_owner=False),
+    )
+
+
+@_async_factory("async_openai_client")
+def _build_async_openai_client():
+    from openai import AsyncAzureOpenAI
+
+    api_key, endpoint = _require("AZURE_OPENAI_KEY", "AZURE_OPENAI_ENDPOINT")
+    return AsyncAzureOpenAI(
+        api_key=api_key,
+        api_version=OPENAI_API_VERSION,
+        azure_endpoint=endpoint,
+        http_client=get_async("async_httpx_client"),
+    )
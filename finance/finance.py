@@ -1,71 +1,65 @@
+import asyncio
+import hashlib
 import os
-from dotenv import load_dotenv
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.indexes import SearchIndexClient
-from azure.search.documents.indexes.models import (
-    SearchIndex,
-    SearchField,
-    SearchFieldDataType,
-    VectorSearch,
-    HnswAlgorithmConfiguration,
-    VectorSearchProfile
-)
-from azure.search.documents import SearchClient
-from openai import AzureOpenAI
+import threading
+import time
+from datetime import datetime, timezone
 from uuid import uuid4
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Get environment variables
-endpoint = os.environ.get("AZURE_FORM_RECOGNIZER_ENDPOINT")
-key = os.environ.get("AZURE_FORM_RECOGNIZER_KEY")
-
-if not endpoint or not key:
-    raise ValueError(
-        "Please set AZURE_FORM_RECOGNIZER_ENDPOINT and AZURE_FORM_RECOGNIZER_KEY environment variables in .env file"
-    )
-
-document_analysis_client = DocumentAnalysisClient(endpoint, AzureKeyCredential(key))
+import answer_cache
+import clients
+from clients import INDEX_NAME
+from common import usage_ledger
+from common.llm_gateway import LLMGateway
 
-# Move configuration variables before they're used
-SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
-SEARCH_API_KEY = os.getenv("AZURE_SEARCH_KEY")
-OPENAI_API_KEY = os.getenv("AZURE_OPENAI_KEY")
-OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+# Azure SDK and OpenAI clients are built lazily by `clients` on first use, so
+# importing this module needs neither network access nor credentials.
 EMBEDDING_DEPLOYMENT = os.getenv("EMBEDDING_DEPLOYMENT")
-INDEX_NAME = "vector-search-demo"
-
-# Validate environment variables
-required_vars = {
-    "AZURE_SEARCH_ENDPOINT": SEARCH_ENDPOINT,
-    "AZURE_SEARCH_KEY": SEARCH_API_KEY,
-    "AZURE_OPENAI_KEY": OPENAI_API_KEY,
-    "AZURE_OPENAI_ENDPOINT": OPENAI_ENDPOINT,
-    "EMBEDDING_DEPLOYMENT": EMBEDDING_DEPLOYMENT
-}
-
-for var_name, var_value in required_vars.items():
-    if not var_value:
-        raise ValueError(f"Missing required environment variable: {var_name}")
-
-# Set up clients
-search_index_client = SearchIndexClient(
-    endpoint=SEARCH_ENDPOINT, 
-    credential=AzureKeyCredential(SEARCH_API_KEY)
+CHAT_DEPLOYMENT = os.getenv("CHAT_DEPLOYMENT", "gpt-4o")
+
+# Vector storage. EMBEDDING_DIMENSIONS asks `text-embedding-3-*` deployments for
+# shortened embeddings (leave unset for ada-002, which only produces 1536).
+# VECTOR_COMPRESSION stores vectors quantized ("scalar" = int8, "binary" = 1 bit)
+# and rescores the top `VECTOR_OVERSAMPLING` x k candidates at full precision.
+NATIVE_EMBEDDING_DIMENSIONS = 1536
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none").lower()
+VECTOR_OVERSAMPLING = float(os.getenv("VECTOR_OVERSAMPLING", "4"))
+VECTOR_COMPRESSION_KINDS = ("none", "scalar", "binary")
+
+# HNSW graph parameters; run tune_hnsw.py to measure and pick these.
+HNSW_M = int(os.getenv("HNSW_M", "4"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "400"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "500"))
+
+# Metadata fields stamped on every chunk; any of them can be used in a search scope.
+FILTERABLE_FIELDS = ("source_hash", "file_name", "page", "uploaded_at")
+
+_CLIENT_ATTRIBUTES = (
+    "document_analysis_client",
+    "search_index_client",
+    "search_client",
+    "openai_client",
 )
-search_client = SearchClient(
-    endpoint=SEARCH_ENDPOINT, 
-    index_name=INDEX_NAME, 
-    credential=AzureKeyCredential(SEARCH_API_KEY)
-)
-openai_client = AzureOpenAI(
-    api_key=OPENAI_API_KEY,
-    api_version="2024-02-01",
-    azure_endpoint=OPENAI_ENDPOINT
+
+# Answers keyed by question + scope + index version; see answer_cache.py
+answers = answer_cache.AnswerCache()
+
+# Chat and embedding calls go through the shared gateway, so identical requests in
+# flight at once (e.g. the same question from several users) make one upstream call.
+# The SDK clients still come from `clients`, so stand-ins keep working.
+llm = LLMGateway(
+    "azure",
+    client_factory=lambda: clients.get("openai_client"),
+    async_client_factory=lambda: clients.get_async("async_openai_client"),
 )
+usage_ledger.set_agent("finance")
+
+def __getattr__(name):
+    """Keep `finance.search_client` etc. working as lazily built attributes."""
+    if name in _CLIENT_ATTRIBUTES:
+        return clients.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def chunk_text(text: str, chunk_size: int = 500) -> list[str]:
     """Split text into smaller chunks of roughly `chunk_size` characters."""
@@ -84,148 +78,320 @@ def chunk_text(text: str, chunk_size: int = 500) -> list[str]:
         chunks.append(" ".join(current_chunk))
     return chunks
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from a local PDF using Azure Document Intelligence (Form Recognizer)."""
+def chunk_pages(pages: list[tuple[int, str]], chunk_size: int = 500) -> list[dict]:
+    """Chunk each page separately so every chunk keeps its page number."""
+    return [
+        {"content": chunk, "page": page_number}
+        for page_number, text in pages
+        for chunk in chunk_text(text, chunk_size)
+    ]
+
+def document_hash(data: bytes) -> str:
+    """Stable identifier for a source document, used to scope searches to it."""
+    return hashlib.sha256(data).hexdigest()
+
+def extract_pages_from_pdf(pdf_path: str) -> list[tuple[int, str]]:
+    """Extract `(page_number, text)` pairs from a local PDF using Azure Document Intelligence."""
     # Verify file exists
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         
     with open(pdf_path, "rb") as f:
-        poller = document_analysis_client.begin_analyze_document(
+        poller = clients.get("document_analysis_client").begin_analyze_document(
             "prebuilt-document",
             document=f,
         )
 
     result = poller.result()
 
-    extracted_text = []
-    for page in result.pages:
-        for line in page.lines:
-            extracted_text.append(line.content)
-    return "\n".join(extracted_text)
+    return [
+        (page.page_number, "\n".join(line.content for line in page.lines))
+        for page in result.pages
+    ]
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """Extract text from a local PDF using Azure Document Intelligence (Form Recognizer)."""
+    return "\n".join(text for _, text in extract_pages_from_pdf(pdf_path))
 
 def index_exists() -> bool:
     try:
-        search_index_client.get_index(INDEX_NAME)
+        clients.get("search_index_client").get_index(INDEX_NAME)
         return True
     except Exception:
         return False
 
-# Move create_vector_search_index function before it's used
-def create_vector_search_index():
+def index_is_current() -> bool:
+    """True if the index exists and has every field this module writes."""
+    try:
+        index = clients.get("search_index_client").get_index(INDEX_NAME)
+    except Exception:
+        return False
+    field_names = {field.name for field in index.fields}
+    return {"id", "content", "content_vector", *FILTERABLE_FIELDS} <= field_names
+
+def build_index_definition(
+    index_name: str = INDEX_NAME,
+    dimensions: int | None = None,
+    compression: str | None = None,
+    oversampling: float | None = None,
+    hnsw_parameters: dict | None = None,
+):
+    """Build the `SearchIndex` definition for the vector index.
+
+    Arguments default to the module configuration; the benchmark passes them
+    explicitly to build one index per candidate configuration.
+    """
+    from azure.search.documents.indexes.models import (
+        SearchIndex,
+        SearchField,
+        SearchFieldDataType,
+        VectorSearch,
+        HnswAlgorithmConfiguration,
+        HnswParameters,
+        VectorSearchProfile,
+        RescoringOptions,
+        ScalarQuantizationCompression,
+        ScalarQuantizationParameters,
+        BinaryQuantizationCompression,
+    )
+
+    dimensions = dimensions or EMBEDDING_DIMENSIONS or NATIVE_EMBEDDING_DIMENSIONS
+    compression = (compression or VECTOR_COMPRESSION).lower()
+    oversampling = oversampling or VECTOR_OVERSAMPLING
+    hnsw = {"m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION, "ef_search": HNSW_EF_SEARCH}
+    hnsw.update(hnsw_parameters or {})
+    if compression not in VECTOR_COMPRESSION_KINDS:
+        raise ValueError(
+            f"Unknown VECTOR_COMPRESSION '{compression}', expected one of {VECTOR_COMPRESSION_KINDS}"
+        )
+
     fields = [
         SearchField(name="id", type=SearchFieldDataType.String, key=True),
         SearchField(name="content", type=SearchFieldDataType.String, searchable=True),
+        SearchField(name="source_hash", type=SearchFieldDataType.String, filterable=True),
+        SearchField(name="file_name", type=SearchFieldDataType.String, filterable=True),
+        SearchField(name="page", type=SearchFieldDataType.Int32, filterable=True, sortable=True),
+        SearchField(name="uploaded_at", type=SearchFieldDataType.DateTimeOffset, filterable=True, sortable=True),
         SearchField(
             name="content_vector",
             type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
             searchable=True,
-            vector_search_dimensions=1536,
+            vector_search_dimensions=dimensions,
             vector_search_profile_name="vector-profile"
         )
     ]
-    
+
+    compressions = []
+    if compression != "none":
+        # Keep the original vectors so the top candidates found in the
+        # quantized graph are rescored at full precision.
+        rescoring = RescoringOptions(
+            enable_rescoring=True,
+            default_oversampling=oversampling,
+            rescore_storage_method="preserveOriginals",
+        )
+        if compression == "scalar":
+            compressions.append(ScalarQuantizationCompression(
+                compression_name="vector-compression",
+                rescoring_options=rescoring,
+                parameters=ScalarQuantizationParameters(quantized_data_type="int8"),
+            ))
+        else:
+            compressions.append(BinaryQuantizationCompression(
+                compression_name="vector-compression",
+                rescoring_options=rescoring,
+            ))
+
     vector_search = VectorSearch(
         algorithms=[
             HnswAlgorithmConfiguration(
                 name="vector-config",
-                kind="hnsw",
-                parameters={
-                    "m": 4,
-                    "efConstruction": 400,
-                    "efSearch": 500,
-                    "metric": "cosine"
-                }
+                parameters=HnswParameters(metric="cosine", **hnsw),
             )
         ],
+        compressions=compressions,
         profiles=[
             VectorSearchProfile(
                 name="vector-profile",
                 algorithm_configuration_name="vector-config",
+                compression_name="vector-compression" if compressions else None,
             )
         ]
     )
-    
+
+    return SearchIndex(
+        name=index_name,
+        fields=fields,
+        vector_search=vector_search
+    )
+
+def create_vector_search_index(index_name: str = INDEX_NAME, **options):
+    """(Re)create the vector index; `options` are passed to `build_index_definition`."""
+    search_index_client = clients.get("search_index_client")
+    index = build_index_definition(index_name, **options)
+
     try:
         # Delete existing index if it exists
-        if index_exists():
-            search_index_client.delete_index(INDEX_NAME)
-            print(f"Deleted existing index '{INDEX_NAME}'")
-        
-        # Create new index
-        index = SearchIndex(
-            name=INDEX_NAME,
-            fields=fields,
-            vector_search=vector_search
-        )
-        
+        if index_name in search_index_client.list_index_names():
+            search_index_client.delete_index(index_name)
+            print(f"Deleted existing index '{index_name}'")
+
         result = search_index_client.create_or_update_index(index)
-        print(f"Index '{INDEX_NAME}' created successfully.")
+        if index_name == INDEX_NAME:
+            answer_cache.bump_index_version()
+        print(f"Index '{index_name}' created successfully.")
         return result
         
     except Exception as e:
         print(f"Error creating index: {str(e)}")
         raise
 
+def _embedding_request(text: str) -> dict:
+    if not EMBEDDING_DEPLOYMENT:
+        raise ValueError("Missing required environment variable: EMBEDDING_DEPLOYMENT")
+    request = {"input": text, "model": EMBEDDING_DEPLOYMENT}
+    # Only send `dimensions` when configured: ada-002 rejects the parameter.
+    if EMBEDDING_DIMENSIONS:
+        request["dimensions"] = EMBEDDING_DIMENSIONS
+    return request
+
 def get_openai_embedding(text: str) -> list[float]:
     """Generate embeddings for the given text using Azure OpenAI."""
-    response = openai_client.embeddings.create(
-        input=text,
-        model=EMBEDDING_DEPLOYMENT
-    )
+    with usage_ledger.tag(stage="embedding"):
+        response = llm.embed(**_embedding_request(text))
+    return response.data[0].embedding
+
+async def aget_openai_embedding(text: str) -> list[float]:
+    """Async variant of `get_openai_embedding`."""
+    with usage_ledger.tag(stage="embedding"):
+        response = await llm.aembed(**_embedding_request(text))
     return response.data[0].embedding
 
-def upload_documents(documents: list[dict]):
-    """Upload documents to the Azure Cognitive Search index."""
+class IngestCancelled(Exception):
+    """Raised when an ingestion is cancelled before any chunk reached the index."""
+
+def upload_documents(documents: list[dict], cancel: threading.Event | None = None):
+    """Upload documents to the Azure Cognitive Search index.
+
+    `cancel` is checked before each embedding; once set, nothing is uploaded.
+    """
     # Generate embeddings for each document
     for doc in documents:
+        if cancel is not None and cancel.is_set():
+            raise IngestCancelled(f"Cancelled before upload ({len(documents)} chunks not indexed)")
         doc['content_vector'] = get_openai_embedding(doc['content'])
         if 'id' not in doc:
             doc['id'] = str(uuid4())
     
-    results = search_client.upload_documents(documents)
+    results = clients.get("search_client").upload_documents(documents)
     for result in results:
         if result.succeeded:
             print(f"Uploaded document ID: {result.key}")
         else:
             print(f"Failed to upload document ID: {result.key}")
 
-# Example usage for chunks
-def process_chunks(chunks: list[str]):
+def process_chunks(chunks: list, file_name: str | None = None, source_hash: str | None = None,
+                   cancel: threading.Event | None = None):
+    """Upload chunks (strings, or dicts from `chunk_pages`) tagged with their source document."""
+    uploaded_at = datetime.now(timezone.utc).isoformat()
     documents = []
     for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = {"content": chunk}
         doc = {
             'id': str(uuid4()),
-            'content': chunk,
+            'content': chunk['content'],
+            'page': chunk.get('page'),
+            'file_name': file_name,
+            'source_hash': source_hash,
+            'uploaded_at': uploaded_at,
         }
         documents.append(doc)
     
-    upload_documents(documents)
+    try:
+        upload_documents(documents, cancel=cancel)
+    except IngestCancelled:
+        raise  # nothing reached the index
+    except BaseException:
+        # Even a partial upload changes what questions retrieve
+        answer_cache.bump_index_version()
+        raise
+    answer_cache.bump_index_version()
+
+def _odata_literal(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def build_filter(scope: dict | None) -> str | None:
+    """Turn a scope such as `{"source_hash": h}` into an OData filter expression.
+
+    Values may be a single value or a list/tuple/set of alternatives.
+    """
+    if not scope:
+        return None
+    clauses = []
+    for field, value in scope.items():
+        if field not in FILTERABLE_FIELDS:
+            raise ValueError(f"Cannot scope search by '{field}', expected one of {FILTERABLE_FIELDS}")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        if not values:
+            raise ValueError(f"Empty scope for '{field}'")
+        clauses.append(
+            "(" + " or ".join(f"{field} eq {_odata_literal(v)}" for v in values) + ")"
+        )
+    return " and ".join(clauses)
 
-from azure.search.documents.models import VectorizedQuery
+def document_indexed(source_hash: str) -> bool:
+    """True if chunks from the document with this hash are already in the index."""
+    results = clients.get("search_client").search(
+        search_text="*",
+        filter=build_filter({"source_hash": source_hash}),
+        top=1,
+        select=["id"],
+    )
+    return any(True for _ in results)
+
+def _search_request(query: str, query_vector: list[float], top_k: int, scope: dict | None) -> dict:
+    from azure.search.documents.models import VectorizedQuery
 
-def search_documents(query: str, top_k: int = 3):
-    query_vector = get_openai_embedding(query)
-    
     vector_query = VectorizedQuery(
         vector=query_vector,
         k_nearest_neighbors=top_k,
         fields="content_vector"
     )
     
-    results = search_client.search(
-        search_text="*",
-        vector_queries=[vector_query],
-        select=["content"]
+    # Filtering before the vector search keeps k neighbours inside the scope.
+    return {
+        "search_text": query,
+        "vector_queries": [vector_query],
+        "filter": build_filter(scope),
+        "vector_filter_mode": "preFilter",
+        "select": ["content", "file_name", "page"],
+        "top": top_k,
+    }
+
+def _search_result(doc) -> dict:
+    return {"content": doc["content"], "file_name": doc.get("file_name"), "page": doc.get("page")}
+
+def search_documents(query: str, top_k: int = 3, scope: dict | None = None):
+    """Hybrid (keyword + vector) search, optionally restricted to `scope`."""
+    query_vector = get_openai_embedding(query)
+    results = clients.get("search_client").search(**_search_request(query, query_vector, top_k, scope))
+    return [_search_result(doc) for doc in results]
+
+async def asearch_documents(query: str, top_k: int = 3, scope: dict | None = None, query_vector: list[float] | None = None):
+    """Async variant of `search_documents`; pass `query_vector` if it is already known."""
+    if query_vector is None:
+        query_vector = await aget_openai_embedding(query)
+    results = await clients.get_async("async_search_client").search(
+        **_search_request(query, query_vector, top_k, scope)
     )
-    
-    return [{"content": doc["content"]} for doc in results]
+    return [_search_result(doc) async for doc in results]
 
-def chat_with_documents(user_query: str) -> str:
-    """Chat with the documents using RAG (Retrieval-Augmented Generation)."""
-    # Search for relevant documents
-    relevant_docs = search_documents(user_query)
-    
+def _chat_request(user_query: str, relevant_docs: list[dict]) -> dict:
     # Construct the system message with context
     context = "\n".join([doc["content"] for doc in relevant_docs])
     system_message = f"""You are a helpful assistant. Use the following context to answer questions.
@@ -234,38 +400,174 @@ def chat_with_documents(user_query: str) -> str:
     Context:
     {context}"""
     
-    # Generate response using Azure OpenAI
-    response = openai_client.chat.completions.create(
-        model="gpt-4o",  # Replace with your deployment name
-        messages=[
+    return {
+        "model": CHAT_DEPLOYMENT,
+        "messages": [
             {"role": "system", "content": system_message},
             {"role": "user", "content": user_query}
         ],
-        temperature=0.7,
-    )
+        "temperature": 0.7,
+    }
+
+def _delta_text(chunk) -> str | None:
+    # Azure sends a leading chunk with prompt filter results and no choices
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+def _record_cached_answer() -> None:
+    usage_ledger.record("azure", CHAT_DEPLOYMENT, cache="answer_cache", stage="answer")
+
+def _answer_key(user_query: str, scope: dict | None) -> str:
+    return answer_cache.cache_key(user_query, scope, CHAT_DEPLOYMENT, answer_cache.current_index_version())
+
+def chat_with_documents(user_query: str, scope: dict | None = None) -> str:
+    """Chat with the documents using RAG (Retrieval-Augmented Generation)."""
+    key = _answer_key(user_query, scope)
+    cached = answers.get(key)
+    if cached is not None:
+        _record_cached_answer()
+        return cached
+
+    # Search for relevant documents
+    relevant_docs = search_documents(user_query, scope=scope)
+    
+    # Generate response using Azure OpenAI
+    with usage_ledger.tag(stage="answer"):
+        response = llm.chat(**_chat_request(user_query, relevant_docs))
     
-    return response.choices[0].message.content
+    answer = response.choices[0].message.content
+    answers.set(key, answer)
+    return answer
+
+def stream_chat_with_documents(user_query: str, scope: dict | None = None, metrics: dict | None = None):
+    """Like `chat_with_documents`, but yield the answer text as it is generated.
+
+    If `metrics` is given it is filled with `retrieval_s`, `ttft_s` (time to
+    first token, measured from the call), `total_s` and `cached`. Closing the
+    generator early (e.g. the Streamlit session stops or the client
+    disconnects) closes the upstream response instead of letting it run to
+    completion. A cached answer is yielded in one piece.
+    """
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    key = _answer_key(user_query, scope)
+    cached = answers.get(key)
+    metrics["cached"] = cached is not None
+    if cached is not None:
+        metrics.update(retrieval_s=0.0, ttft_s=time.perf_counter() - start, total_s=time.perf_counter() - start)
+        _record_cached_answer()
+        yield cached
+        return
+
+    relevant_docs = search_documents(user_query, scope=scope)
+    metrics["retrieval_s"] = time.perf_counter() - start
+
+    with usage_ledger.tag(stage="answer"):
+        stream = llm.stream(**_chat_request(user_query, relevant_docs))
+    parts = []
+    try:
+        for chunk in stream:
+            text = _delta_text(chunk)
+            if text:
+                metrics.setdefault("ttft_s", time.perf_counter() - start)
+                parts.append(text)
+                yield text
+        # Only complete answers are cached
+        answers.set(key, "".join(parts))
+    finally:
+        stream.close()
+        metrics["total_s"] = time.perf_counter() - start
+
+async def _acached_answer(key: str) -> str | None:
+    # The disk tier is SQLite; keep its I/O off the event loop
+    if answers.db_path:
+        return await asyncio.to_thread(answers.get, key)
+    return answers.get(key)
+
+async def _astore_answer(key: str, answer: str) -> None:
+    if answers.db_path:
+        await asyncio.to_thread(answers.set, key, answer)
+    else:
+        answers.set(key, answer)
+
+async def achat_with_documents(user_query: str, scope: dict | None = None) -> str:
+    """Async variant of `chat_with_documents`."""
+    key = _answer_key(user_query, scope)
+    cached = await _acached_answer(key)
+    if cached is not None:
+        _record_cached_answer()
+        return cached
+
+    relevant_docs = await asearch_documents(user_query, scope=scope)
+    with usage_ledger.tag(stage="answer"):
+        response = await llm.achat(**_chat_request(user_query, relevant_docs))
+    answer = response.choices[0].message.content
+    await _astore_answer(key, answer)
+    return answer
+
+async def astream_chat_with_documents(user_query: str, scope: dict | None = None, metrics: dict | None = None):
+    """Async generator variant of `stream_chat_with_documents`.
+
+    Cancelling the consuming task (as aiohttp does when a client disconnects)
+    closes the upstream completion stream.
+    """
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    key = _answer_key(user_query, scope)
+    cached = await _acached_answer(key)
+    metrics["cached"] = cached is not None
+    if cached is not None:
+        metrics.update(retrieval_s=0.0, ttft_s=time.perf_counter() - start, total_s=time.perf_counter() - start)
+        _record_cached_answer()
+        yield cached
+        return
+
+    relevant_docs = await asearch_documents(user_query, scope=scope)
+    metrics["retrieval_s"] = time.perf_counter() - start
+
+    with usage_ledger.tag(stage="answer"):
+        stream = await llm.astream(**_chat_request(user_query, relevant_docs))
+    parts = []
+    try:
+        async for chunk in stream:
+            text = _delta_text(chunk)
+            if text:
+                metrics.setdefault("ttft_s", time.perf_counter() - start)
+                parts.append(text)
+                yield text
+        await _astore_answer(key, "".join(parts))
+    finally:
+        await stream.close()
+        metrics["total_s"] = time.perf_counter() - start
 
 if __name__ == "__main__":
     # Use an absolute path or relative path to your actual PDF file
     pdf_path = os.path.join(os.path.dirname(__file__), "docs", "sample.pdf")
+    source_hash = None
     try:
-        # Extract text from PDF
-        pdf_text = extract_text_from_pdf(pdf_path)
-        print("Extracted PDF text:", pdf_text[:300])
+        with open(pdf_path, "rb") as f:
+            source_hash = document_hash(f.read())
 
-        # Create chunks from the extracted text
-        chunks = chunk_text(pdf_text)
-        print(f"Created {len(chunks)} chunks")
-
-        # Create the vector search index if it doesn't exist
-        if not index_exists():
+        # Create the vector search index if it doesn't exist (or predates the metadata fields)
+        if not index_is_current():
             create_vector_search_index()
             print("Created vector search index")
 
-        # Process and upload chunks
-        process_chunks(chunks)
-        print("Successfully processed and uploaded chunks to Azure Search")
+        if document_indexed(source_hash):
+            print("Document already indexed, skipping upload")
+        else:
+            # Extract text from PDF, page by page
+            pages = extract_pages_from_pdf(pdf_path)
+            print("Extracted PDF text:", "\n".join(text for _, text in pages)[:300])
+
+            # Create chunks from the extracted text
+            chunks = chunk_pages(pages)
+            print(f"Created {len(chunks)} chunks")
+
+            # Process and upload chunks
+            process_chunks(chunks, file_name=os.path.basename(pdf_path), source_hash=source_hash)
+            print("Successfully processed and uploaded chunks to Azure Search")
 
     except FileNotFoundError as e:
         print(f"Error: {e}")
@@ -275,7 +577,8 @@ if __name__ == "__main__":
     # Add chat example
     try:
         query = "What are the main points discussed in the document?"
-        response = chat_with_documents(query)
+        scope = {"source_hash": source_hash} if source_hash else None
+        response = chat_with_documents(query, scope=scope)
         print("\nQ:", query)
         print("A:", response)
     except Exception as e:
@@ -0,0 +1,148 @@
+"""Load generator for `service.py`.
+
+Ingests a synthetic document, waits for the job to finish, then drives
+`/search` and streaming `/chat` with `--concurrency` simulated users for
+`--duration` seconds and reports throughput, latency percentiles,
+time-to-first-token and errors per endpoint. Only `--repeat-ratio` of the
+chats ask one of a few fixed questions; the rest are unique, and answers
+served from the answer cache are reported apart from the ones generated.
+
+    python service.py --stub &
+    python loadtest.py --url http://localhost:8080 --concurrency 50 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+
+import aiohttp
+
+from vector_eval import percentile
+
+QUESTIONS = [
+    "What was total revenue for the year?",
+    "How did operating expenses change?",
+    "What are the main risks discussed?",
+    "Summarize the cash flow position.",
+    "What guidance was given for next quarter?",
+]
+
+SAMPLE_DOCUMENT = "\f".join(
+    "\n".join(
+        f"Page {page} line {line}: revenue grew {page + line}% while operating expenses, risks, "
+        f"cash flow and guidance were discussed in section {line}."
+        for line in range(40)
+    )
+    for page in range(1, 11)
+).encode()
+
+
+async def ingest(session: aiohttp.ClientSession, url: str) -> str:
+    async with session.post(f"{url}/ingest", data=SAMPLE_DOCUMENT, params={"file_name": "loadtest.pdf"}) as response:
+        job = await response.json()
+    while job["status"] in ("queued", "running"):
+        await asyncio.sleep(0.2)
+        async with session.get(f"{url}/jobs/{job['id']}") as response:
+            job = await response.json()
+    if job["status"] == "failed":
+        raise RuntimeError(f"Ingestion failed: {job['error']}")
+    return job["source_hash"]
+
+
+async def search(session, url, scope, stats):
+    start = time.perf_counter()
+    async with session.post(f"{url}/search", json={"query": random.choice(QUESTIONS), "scope": scope}) as response:
+        await response.read()
+        stats["search"]["latency"].append(time.perf_counter() - start)
+        stats["search"]["status"][response.status] += 1
+
+
+def chat_question(repeat_ratio: float) -> str:
+    """One of the fixed questions (cacheable), or a unique variant of one."""
+    question = random.choice(QUESTIONS)
+    if random.random() < repeat_ratio:
+        return question
+    return f"{question.rstrip('?')} in section {random.randrange(10**9)}?"
+
+
+async def chat(session, url, scope, stats, repeat_ratio):
+    start = time.perf_counter()
+    first_token = None
+    event, cached = None, False
+    query = chat_question(repeat_ratio)
+    async with session.post(f"{url}/chat", json={"query": query, "scope": scope, "stream": True}) as response:
+        async for line in response.content:
+            if line.startswith(b"event: "):
+                event = line[7:].strip()
+            elif line.startswith(b"data: "):
+                if first_token is None and b'"token"' in line:
+                    first_token = time.perf_counter() - start
+                if event == b"done":
+                    cached = bool(json.loads(line[6:]).get("cached"))
+        # Cache hits skip retrieval and the LLM, so they get their own row
+        name = "chat hit" if cached else "chat"
+        stats[name]["latency"].append(time.perf_counter() - start)
+        stats[name]["status"][response.status] += 1
+        if first_token is not None:
+            stats[name]["ttft"].append(first_token)
+
+
+async def user(session, url, scope, deadline, chat_ratio, repeat_ratio, stats):
+    while time.perf_counter() < deadline:
+        name = "chat" if random.random() < chat_ratio else "search"
+        try:
+            if name == "chat":
+                await chat(session, url, scope, stats, repeat_ratio)
+            else:
+                await search(session, url, scope, stats)
+        except Exception as e:
+            stats[name]["errors"][type(e).__name__] += 1
+
+
+def report(stats, elapsed):
+    print(f"\n{'endpoint':<8} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50':>9} {'ttft p95':>9}  status / errors")
+    for name, data in stats.items():
+        latencies = [value * 1000 for value in data["latency"]]
+        ttft = [value * 1000 for value in data["ttft"]]
+        outcomes = dict(data["status"]) | dict(data["errors"])
+        print(f"{name:<8} {len(latencies):>8} {len(latencies) / elapsed:>7.1f} {percentile(latencies, 50):>8.1f} "
+              f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} "
+              f"{percentile(ttft, 50) if ttft else float('nan'):>9.1f} {percentile(ttft, 95) if ttft else float('nan'):>9.1f}  "
+              f"{json.dumps(outcomes)}")
+
+
+async def run(args):
+    stats = defaultdict(lambda: {"latency": [], "ttft": [], "status": defaultdict(int), "errors": defaultdict(int)})
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        source_hash = await ingest(session, args.url)
+        scope = {"source_hash": source_hash}
+        print(f"Ingested sample document {source_hash[:12]}; running {args.concurrency} users for {args.duration}s")
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            user(session, args.url, scope, deadline, args.chat_ratio, args.repeat_ratio, stats)
+            for _ in range(args.concurrency)
+        ))
+        report(stats, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--chat-ratio", type=float, default=0.5, help="Fraction of requests that are /chat")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2,
+                        help="Fraction of chats that repeat a fixed question (and may be cache hits)")
+    parser.add_argument("--request-timeout", type=float, default=180.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
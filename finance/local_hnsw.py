@@ -0,0 +1,140 @@
+"""A small, dependency-free HNSW index used as an offline stand-in for Azure AI Search.
+
+Implements the graph construction and search from Malkov & Yashunin,
+"Efficient and robust approximate nearest neighbor search using Hierarchical
+Navigable Small World graphs", with the same knobs Azure exposes (`m`,
+`efConstruction`, `efSearch`) and cosine distance. It is written for clarity
+rather than speed; use it to compare configurations against each other, not
+to predict absolute Azure latencies. `distance_count` gives a
+hardware-independent measure of search effort.
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+
+class HNSWIndex:
+    def __init__(self, dimensions: int, capacity: int, m: int = 4, ef_construction: int = 400, seed: int = 0):
+        self.m = m
+        self.max_neighbors_layer0 = 2 * m
+        self.ef_construction = ef_construction
+        self.level_multiplier = 1 / math.log(max(m, 2))
+        self.data = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.count = 0
+        self.layers: list[dict[int, list[int]]] = []
+        self.entry_point = None
+        self.distance_count = 0
+        self._rng = np.random.default_rng(seed)
+
+    # --------------------------
+    # Construction
+    # --------------------------
+
+    def add_items(self, vectors: np.ndarray) -> None:
+        """Insert unit-normalised vectors; their ids are their insertion order."""
+        for vector in vectors:
+            self._insert(vector)
+
+    def _insert(self, vector: np.ndarray) -> None:
+        node = self.count
+        self.data[node] = vector
+        self.count += 1
+        level = int(-math.log(1.0 - self._rng.random()) * self.level_multiplier)
+        top_level = len(self.layers) - 1
+
+        while len(self.layers) <= level:
+            self.layers.append({})
+        for layer in range(level + 1):
+            self.layers[layer][node] = []
+
+        if self.entry_point is None:
+            self.entry_point = node
+            return
+
+        entry = [(self._distance(vector, self.entry_point), self.entry_point)]
+        for layer in range(top_level, level, -1):
+            entry = self._search_layer(vector, entry, 1, layer)
+
+        for layer in range(min(level, top_level), -1, -1):
+            candidates = self._search_layer(vector, entry, self.ef_construction, layer)
+            limit = self.max_neighbors_layer0 if layer == 0 else self.m
+            neighbors = self._select_neighbors(candidates, self.m)
+            self.layers[layer][node] = neighbors
+            for neighbor in neighbors:
+                links = self.layers[layer][neighbor]
+                links.append(node)
+                if len(links) > limit:
+                    self._shrink(neighbor, layer, limit)
+            entry = candidates
+
+        if level > top_level:
+            self.entry_point = node
+
+    def _shrink(self, node: int, layer: int, limit: int) -> None:
+        links = self.layers[layer][node]
+        distances = 1.0 - self.data[links] @ self.data[node]
+        self.distance_count += len(links)
+        ranked = sorted(zip(distances.tolist(), links))
+        self.layers[layer][node] = self._select_neighbors(ranked, limit)
+
+    def _select_neighbors(self, candidates: list[tuple[float, int]], limit: int) -> list[int]:
+        """The paper's heuristic: skip candidates closer to a chosen neighbour than to the base."""
+        selected = []
+        for distance, candidate in candidates:
+            if len(selected) >= limit:
+                break
+            if selected:
+                to_selected = 1.0 - self.data[selected] @ self.data[candidate]
+                self.distance_count += len(selected)
+                if to_selected.min() < distance:
+                    continue
+            selected.append(candidate)
+        return selected
+
+    # --------------------------
+    # Search
+    # --------------------------
+
+    def _distance(self, vector: np.ndarray, node: int) -> float:
+        self.distance_count += 1
+        return float(1.0 - self.data[node] @ vector)
+
+    def _search_layer(self, query: np.ndarray, entry: list[tuple[float, int]], ef: int, layer: int):
+        """Greedy beam search; returns up to `ef` `(distance, node)` pairs, closest first."""
+        graph = self.layers[layer]
+        visited = {node for _, node in entry}
+        candidates = list(entry)
+        heapq.heapify(candidates)
+        results = [(-distance, node) for distance, node in entry]
+        heapq.heapify(results)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -results[0][0] and len(results) >= ef:
+                break
+            unvisited = [n for n in graph[node] if n not in visited]
+            if not unvisited:
+                continue
+            visited.update(unvisited)
+            distances = 1.0 - self.data[unvisited] @ query
+            self.distance_count += len(unvisited)
+            for neighbor_distance, neighbor in zip(distances.tolist(), unvisited):
+                if len(results) < ef or neighbor_distance < -results[0][0]:
+                    heapq.heappush(candidates, (neighbor_distance, neighbor))
+                    heapq.heappush(results, (-neighbor_distance, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-distance, node) for distance, node in results)
+
+    def search(self, query: np.ndarray, k: int, ef_search: int) -> list[int]:
+        """Ids of the (approximate) `k` nearest neighbours of a unit-normalised query."""
+        if self.entry_point is None:
+            return []
+        entry = [(self._distance(query, self.entry_point), self.entry_point)]
+        for layer in range(len(self.layers) - 1, 0, -1):
+            entry = self._search_layer(query, entry, 1, layer)
+        results = self._search_layer(query, entry, max(ef_search, k), 0)
+        return [node for _, node in results[:k]]
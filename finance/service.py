@@ -0,0 +1,358 @@
+"""Headless asyncio HTTP service for the finance document-chat pipeline.
+
+Exposes the functions in `finance` over HTTP so the pipeline can run behind
+a load balancer and be called by other systems (replicas on several hosts
+need a shared INDEX_VERSION_FILE; see answer_cache.py):
+
+    POST /ingest          PDF as the request body (or multipart field "file");
+                          returns 202 with a job id. ?file_name=... names it.
+    GET  /jobs/{job_id}   Ingestion job status. A job still running when its
+                          timeout expires is "timed_out" until it stops.
+    POST /search          {"query": ..., "top_k": 3, "scope": {...}}
+    POST /chat            {"query": ..., "scope": {...}, "stream": true}
+                          Streams server-sent events when "stream" is true.
+    GET  /health
+
+Each endpoint has its own concurrency limit and timeout (see the SERVICE_*
+settings below). Requests wait for a free slot until their timeout expires.
+A streamed chat gets the timeout for its first token and again for each gap
+between tokens; once streaming has started, failures arrive as an `error`
+event instead of an HTTP status.
+Clients come from the pooled `clients` registry; `--stub` swaps in the
+local stand-ins from `stubs` so the service can be load-tested offline
+with `loadtest.py`.
+
+    python service.py --stub --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import aclosing
+from uuid import uuid4
+
+from aiohttp import web
+
+import clients
+import finance
+
+# --------------------------
+# Configuration
+# --------------------------
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8080"))
+
+# Concurrent requests per endpoint; ingestion is CPU/quota heavy, searches are cheap
+CONCURRENCY_LIMITS = {
+    "ingest": int(os.getenv("SERVICE_INGEST_CONCURRENCY", "2")),
+    "search": int(os.getenv("SERVICE_SEARCH_CONCURRENCY", "32")),
+    "chat": int(os.getenv("SERVICE_CHAT_CONCURRENCY", "16")),
+}
+
+# Seconds, including time spent waiting for a concurrency slot (see the module docstring for streams)
+TIMEOUTS = {
+    "ingest": float(os.getenv("SERVICE_INGEST_TIMEOUT", "600")),
+    "search": float(os.getenv("SERVICE_SEARCH_TIMEOUT", "15")),
+    "chat": float(os.getenv("SERVICE_CHAT_TIMEOUT", "120")),
+}
+
+MAX_UPLOAD_BYTES = int(os.getenv("SERVICE_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+MAX_FINISHED_JOBS = 1000
+
+# --------------------------
+# Ingestion jobs
+# --------------------------
+
+class JobStore:
+    """In-memory ingestion job registry; the oldest finished jobs are dropped first."""
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self.jobs = {}
+        self.max_finished = max_finished
+
+    def create(self, file_name: str, source_hash: str) -> dict:
+        job = {
+            "id": str(uuid4()),
+            "status": "queued",
+            "file_name": file_name,
+            "source_hash": source_hash,
+            "chunks": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self.jobs[job["id"]] = job
+        self._evict()
+        return job
+
+    def finish(self, job: dict, status: str, **fields) -> None:
+        job.update(status=status, finished_at=time.time(), **fields)
+
+    def _evict(self) -> None:
+        finished = [job for job in self.jobs.values() if job["finished_at"] is not None]
+        for job in sorted(finished, key=lambda j: j["finished_at"])[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job["id"]]
+
+    def active(self, source_hash: str) -> dict | None:
+        """The unfinished job for this document, if any."""
+        for job in self.jobs.values():
+            if job["source_hash"] == source_hash and job["finished_at"] is None:
+                return job
+        return None
+
+
+def _ingest_document(data: bytes, file_name: str, source_hash: str, cancel: threading.Event) -> int | None:
+    """Blocking ingestion (extract, chunk, embed, upload); returns chunks uploaded or None if already indexed."""
+    if finance.document_indexed(source_hash):
+        return None
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        temp_path = f.name
+    try:
+        chunks = finance.chunk_pages(finance.extract_pages_from_pdf(temp_path))
+    finally:
+        os.remove(temp_path)
+    finance.process_chunks(chunks, file_name=file_name, source_hash=source_hash, cancel=cancel)
+    return len(chunks)
+
+
+async def _run_ingest_job(app: web.Application, job: dict, data: bytes) -> None:
+    # A worker thread cannot be interrupted: on timeout the job asks it to stop
+    # before uploading and keeps its concurrency slot until it has actually stopped.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TIMEOUTS["ingest"]
+    cancel = threading.Event()
+    limit = app["limits"]["ingest"]
+    try:
+        try:
+            async with asyncio.timeout_at(deadline):
+                await limit.acquire()
+        except TimeoutError:
+            app["jobs"].finish(job, "failed", error="Timed out waiting for an ingestion slot")
+            return
+        try:
+            job["status"] = "running"
+            async with app["index_lock"]:
+                if not app["index_ready"]:
+                    if not await asyncio.to_thread(finance.index_is_current):
+                        await asyncio.to_thread(finance.create_vector_search_index)
+                    app["index_ready"] = True
+            work = asyncio.ensure_future(
+                asyncio.to_thread(_ingest_document, data, job["file_name"], job["source_hash"], cancel)
+            )
+            try:
+                chunks = await asyncio.wait_for(asyncio.shield(work), max(0.0, deadline - loop.time()))
+            except TimeoutError:
+                cancel.set()
+                job.update(status="timed_out", error="Ingestion timed out; still running until it can stop")
+                chunks = await work
+        finally:
+            limit.release()
+        if chunks is None:
+            app["jobs"].finish(job, "skipped", chunks=0, error=None)
+        else:
+            app["jobs"].finish(job, "succeeded", chunks=chunks, error=None)
+    except finance.IngestCancelled:
+        app["jobs"].finish(job, "failed", error="Ingestion timed out; stopped before uploading")
+    except Exception as e:
+        app["jobs"].finish(job, "failed", error=str(e))
+
+# --------------------------
+# Request handling
+# --------------------------
+
+def limited(endpoint: str):
+    """Apply the endpoint's concurrency limit and timeout to a handler."""
+    def decorator(handler):
+        async def wrapper(request: web.Request, *args):
+            try:
+                async with asyncio.timeout(TIMEOUTS[endpoint]):
+                    async with request.app["limits"][endpoint]:
+                        return await handler(request, *args)
+            except TimeoutError:
+                raise web.HTTPGatewayTimeout(text=f"{endpoint} timed out after {TIMEOUTS[endpoint]}s")
+        return wrapper
+    return decorator
+
+
+async def _json_body(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+    if not isinstance(body, dict) or not str(body.get("query", "")).strip():
+        raise web.HTTPBadRequest(text="'query' is required")
+    if body.get("scope") is not None and not isinstance(body["scope"], dict):
+        raise web.HTTPBadRequest(text="'scope' must be an object of field: value(s)")
+    return body
+
+
+async def handle_ingest(request: web.Request) -> web.Response:
+    if request.content_type.startswith("multipart/"):
+        form = await request.post()
+        upload = form.get("file")
+        if upload is None or not hasattr(upload, "file"):
+            raise web.HTTPBadRequest(text="Multipart uploads need a 'file' field")
+        data = await asyncio.to_thread(upload.file.read)
+        file_name = upload.filename
+    else:
+        data = await request.read()
+        file_name = request.query.get("file_name", "upload.pdf")
+    if not data:
+        raise web.HTTPBadRequest(text="Empty document")
+
+    source_hash = finance.document_hash(data)
+    # A retry while the first upload of the same document is still going would race it
+    job = request.app["jobs"].active(source_hash)
+    if job is not None:
+        return web.json_response(job, status=202)
+    job = request.app["jobs"].create(file_name, source_hash)
+    task = asyncio.create_task(_run_ingest_job(request.app, job, data))
+    request.app["tasks"].add(task)
+    task.add_done_callback(request.app["tasks"].discard)
+    return web.json_response(job, status=202)
+
+
+async def handle_job(request: web.Request) -> web.Response:
+    job = request.app["jobs"].jobs.get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text="Unknown job")
+    return web.json_response(job)
+
+
+@limited("search")
+async def handle_search(request: web.Request) -> web.Response:
+    body = await _json_body(request)
+    try:
+        top_k = int(body.get("top_k", 3))
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(text="'top_k' must be an integer")
+    try:
+        results = await finance.asearch_documents(body["query"], top_k=top_k, scope=body.get("scope"))
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    return web.json_response({"results": results})
+
+
+async def handle_chat(request: web.Request) -> web.StreamResponse:
+    body = await _json_body(request)
+    try:
+        finance.build_filter(body.get("scope"))
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    if not body.get("stream", True):
+        return await _answer(request, body)
+    return await _stream_answer(request, body)
+
+
+@limited("chat")
+async def _answer(request: web.Request, body: dict) -> web.Response:
+    answer = await finance.achat_with_documents(body["query"], scope=body.get("scope"))
+    return web.json_response({"answer": answer})
+
+
+async def _send_event(response: web.StreamResponse, data: dict, event: str | None = None) -> None:
+    await response.write(((f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n").encode())
+
+
+async def _stream_answer(request: web.Request, body: dict) -> web.StreamResponse:
+    timeout = TIMEOUTS["chat"]
+    limit = request.app["limits"]["chat"]
+    try:
+        async with asyncio.timeout(timeout):
+            await limit.acquire()
+    except TimeoutError:
+        raise web.HTTPGatewayTimeout(text=f"chat timed out after {timeout}s waiting for a slot")
+    try:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        metrics = {}
+        # aclosing() closes the upstream completion if the client goes away mid-stream
+        async with aclosing(finance.astream_chat_with_documents(body["query"], scope=body.get("scope"), metrics=metrics)) as tokens:
+            # Headers are sent with the first token, so until then a timeout is still a plain 504
+            try:
+                async with asyncio.timeout(timeout):
+                    token = await anext(tokens, None)
+            except TimeoutError:
+                raise web.HTTPGatewayTimeout(text=f"chat timed out after {timeout}s waiting for the first token")
+            await response.prepare(request)
+            try:
+                while token is not None:
+                    await _send_event(response, {"token": token})
+                    async with asyncio.timeout(timeout):
+                        token = await anext(tokens, None)
+            except TimeoutError:
+                await _send_event(response, {"error": f"No token for {timeout}s"}, event="error")
+            except Exception as e:
+                await _send_event(response, {"error": str(e)}, event="error")
+            else:
+                await _send_event(response, metrics, event="done")
+        await response.write_eof()
+        return response
+    finally:
+        limit.release()
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({
+        "status": "ok",
+        "jobs": len(request.app["jobs"].jobs),
+        "answer_cache": finance.answers.stats(),
+    })
+
+# --------------------------
+# Application
+# --------------------------
+
+async def _on_startup(app: web.Application) -> None:
+    app["limits"] = {name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY_LIMITS.items()}
+    app["index_lock"] = asyncio.Lock()
+
+
+async def _on_cleanup(app: web.Application) -> None:
+    for task in list(app["tasks"]):
+        task.cancel()
+    await clients.aclose()
+
+
+def create_app() -> web.Application:
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    app["jobs"] = JobStore()
+    app["tasks"] = set()
+    app["index_ready"] = False
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    app.add_routes([
+        web.post("/ingest", handle_ingest),
+        web.get("/jobs/{job_id}", handle_job),
+        web.post("/search", handle_search),
+        web.post("/chat", handle_chat),
+        web.get("/health", handle_health),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finance document-chat HTTP service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--stub", action="store_true", help="Use local stand-ins instead of Azure (for load tests)")
+    parser.add_argument("--stub-latency", type=float, default=0.05, help="Seconds per stubbed backend call")
+    parser.add_argument("--stub-token-latency", type=float, default=0.01, help="Seconds per stubbed streamed token")
+    args = parser.parse_args()
+
+    if args.stub:
+        import stubs
+        stubs.install(latency=args.stub_latency, token_latency=args.stub_token_latency)
+        print("Using stubbed Azure backends")
+
+    # handler_cancellation: stop work (and upstream streams) when a client disconnects
+    web.run_app(create_app(), host=args.host, port=args.port, handler_cancellation=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Local stand-ins for the Azure clients, for offline tests, benchmarks and load tests.
+
+`install()` registers in-memory fakes for every client in `clients`, sync and
+async, sharing one document store:
+
+    import stubs
+    stubs.install(latency=0.05)
+    finance.process_chunks(["Revenue grew 12%"], source_hash="abc")
+    finance.chat_with_documents("How much did revenue grow?")
+
+Embeddings are deterministic (hashed bag of words), search scores documents by
+keyword overlap plus cosine similarity and understands the filters produced by
+`finance.build_filter`, and chat completions echo the start of the retrieved
+context back token by token. Each call sleeps for `latency` seconds (and
+each streamed token for `token_latency`) to imitate network time.
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+import types
+
+import numpy as np
+
+import clients
+
+EMBEDDING_DIMENSIONS = 1536
+
+# --------------------------
+# Helpers
+# --------------------------
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> list[float]:
+    """Deterministic unit vector: similar word sets give similar vectors."""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return (vector / norm).tolist()
+
+
+def _parse_literal(literal: str):
+    if literal.startswith("'"):
+        return literal[1:-1].replace("''", "'")
+    try:
+        return int(literal)
+    except ValueError:
+        return literal
+
+
+def _matches(doc: dict, filter_expression: str | None) -> bool:
+    """Evaluate the `(a eq x or a eq y) and (...)` filters built by `finance.build_filter`."""
+    if not filter_expression:
+        return True
+    for clause in filter_expression.split(") and ("):
+        alternatives = clause.strip("()").split(" or ")
+        if not any(
+            doc.get(field) == _parse_literal(literal)
+            for field, _, literal in (alt.split(" ", 2) for alt in alternatives)
+        ):
+            return False
+    return True
+
+
+def _ns(**kwargs):
+    return types.SimpleNamespace(**kwargs)
+
+# --------------------------
+# Azure AI Search
+# --------------------------
+
+class FakeSearchIndex:
+    """Thread-safe in-memory document store shared by the sync and async search clients."""
+
+    def __init__(self):
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def upload(self, documents: list[dict]):
+        with self.lock:
+            for doc in documents:
+                stored = dict(doc)
+                stored["_vector"] = np.asarray(doc["content_vector"], dtype=np.float32)
+                stored["_words"] = frozenset(re.findall(r"\w+", doc.get("content", "").lower()))
+                self.documents[doc["id"]] = stored
+        return [_ns(key=doc["id"], succeeded=True) for doc in documents]
+
+    def search(self, search_text=None, vector_queries=None, filter=None, select=None, top=None, **_):
+        with self.lock:
+            candidates = [doc for doc in self.documents.values() if _matches(doc, filter)]
+        if not candidates:
+            return []
+        terms = set(re.findall(r"\w+", (search_text or "").lower())) - {"*"}
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        if terms:
+            scores += [
+                len(terms & doc["_words"]) / len(terms) for doc in candidates
+            ]
+        if vector_queries:
+            vector = np.asarray(vector_queries[0].vector, dtype=np.float32)
+            scores += np.stack([doc["_vector"] for doc in candidates]) @ vector
+
+        ranked = [candidates[i] for i in np.argsort(-scores)[: top or 50]]
+        return [
+            {name: doc.get(name) for name in select} if select
+            else {name: value for name, value in doc.items() if not name.startswith("_")}
+            for doc in ranked
+        ]
+
+
+class FakeSearchClient:
+    def __init__(self, index: FakeSearchIndex, latency: float = 0.0):
+        self.index = index
+        self.latency = latency
+
+    def upload_documents(self, documents):
+        time.sleep(self.latency)
+        return self.index.upload(documents)
+
+    def search(self, **kwargs):
+        time.sleep(self.latency)
+        return self.index.search(**kwargs)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncSearchClient:
+    def __init__(self, index: FakeSearchIndex, latency: float = 0.0):
+        self.index = index
+        self.latency = latency
+
+    async def upload_documents(self, documents):
+        await asyncio.sleep(self.latency)
+        return self.index.upload(documents)
+
+    async def search(self, **kwargs):
+        await asyncio.sleep(self.latency)
+        # Score off the event loop so the stub doesn't throttle the service under load
+        results = await asyncio.to_thread(self.index.search, **kwargs)
+
+        async def iterate():
+            for doc in results:
+                yield doc
+        return iterate()
+
+    async def close(self):
+        pass
+
+
+class FakeSearchIndexClient:
+    def __init__(self):
+        self.indexes = {}
+
+    def get_index(self, name):
+        if name not in self.indexes:
+            raise LookupError(f"Index '{name}' not found")
+        return self.indexes[name]
+
+    def list_index_names(self):
+        return list(self.indexes)
+
+    def create_or_update_index(self, index):
+        self.indexes[index.name] = index
+        return index
+
+    def delete_index(self, name):
+        self.indexes.pop(name, None)
+
+# --------------------------
+# Document Intelligence
+# --------------------------
+
+class FakeDocumentAnalysisClient:
+    """Treats the uploaded bytes as UTF-8 text, one page per form feed (or 3000 characters)."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def begin_analyze_document(self, model_id, document):
+        time.sleep(self.latency)
+        data = document.read() if hasattr(document, "read") else document
+        text = data.decode("utf-8", errors="ignore")
+        raw_pages = text.split("\f") if "\f" in text else [text[i:i + 3000] for i in range(0, len(text), 3000)]
+        pages = [
+            _ns(page_number=number, lines=[_ns(content=line) for line in page.splitlines() if line.strip()])
+            for number, page in enumerate(raw_pages or [""], start=1)
+        ]
+        return _ns(result=lambda: _ns(pages=pages))
+
+# --------------------------
+# Azure OpenAI
+# --------------------------
+
+def _answer_tokens(messages: list[dict]) -> list[str]:
+    context = messages[0]["content"].split("Context:", 1)[-1].split()
+    return [word + " " for word in (context[:40] or ["I", "don't", "know."])]
+
+
+def _completion(tokens):
+    return _ns(choices=[_ns(message=_ns(content="".join(tokens).strip()))])
+
+
+def _chunk(text):
+    return _ns(choices=[_ns(delta=_ns(content=text))])
+
+
+class _FakeStream:
+    def __init__(self, tokens, token_latency):
+        self.tokens = tokens
+        self.token_latency = token_latency
+        self.closed = False
+
+    def __iter__(self):
+        for token in self.tokens:
+            if self.closed:
+                return
+            time.sleep(self.token_latency)
+            yield _chunk(token)
+
+    def close(self):
+        self.closed = True
+
+
+class _FakeAsyncStream(_FakeStream):
+    async def __aiter__(self):
+        for token in self.tokens:
+            if self.closed:
+                return
+            await asyncio.sleep(self.token_latency)
+            yield _chunk(token)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeOpenAI:
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.embeddings = _ns(create=self._embed)
+        self.chat = _ns(completions=_ns(create=self._complete))
+
+    def _embed(self, input, model, dimensions=EMBEDDING_DIMENSIONS, **_):
+        time.sleep(self.latency)
+        inputs = [input] if isinstance(input, str) else input
+        return _ns(data=[_ns(embedding=fake_embedding(text, dimensions)) for text in inputs])
+
+    def _complete(self, messages, stream=False, **_):
+        time.sleep(self.latency)
+        tokens = _answer_tokens(messages)
+        if stream:
+            return _FakeStream(tokens, self.token_latency)
+        time.sleep(self.token_latency * len(tokens))
+        return _completion(tokens)
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    async def _embed(self, input, model, dimensions=EMBEDDING_DIMENSIONS, **_):
+        await asyncio.sleep(self.latency)
+        inputs = [input] if isinstance(input, str) else input
+        return _ns(data=[_ns(embedding=fake_embedding(text, dimensions)) for text in inputs])
+
+    async def _complete(self, messages, stream=False, **_):
+        await asyncio.sleep(self.latency)
+        tokens = _answer_tokens(messages)
+        if stream:
+            return _FakeAsyncStream(tokens, self.token_latency)
+        await asyncio.sleep(self.token_latency * len(tokens))
+        return _completion(tokens)
+
+# --------------------------
+# Installation
+# --------------------------
+
+def install(latency: float = 0.0, token_latency: float = 0.0) -> FakeSearchIndex:
+    """Replace every client in `clients` with a local stand-in; returns the shared store."""
+    import finance
+
+    index = FakeSearchIndex()
+    stand_ins = {
+        "document_analysis_client": FakeDocumentAnalysisClient(latency),
+        "search_index_client": FakeSearchIndexClient(),
+        "search_client": FakeSearchClient(index, latency),
+        "async_search_client": FakeAsyncSearchClient(index, latency),
+        "openai_client": FakeOpenAI(latency, token_latency),
+        "async_openai_client": FakeAsyncOpenAI(latency, token_latency),
+    }
+    for name, client in stand_ins.items():
+        clients.set_client(name, client)
+    finance.EMBEDDING_DEPLOYMENT = finance.EMBEDDING_DEPLOYMENT or "stub-embedding"
+    return index
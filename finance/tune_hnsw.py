@@ -0,0 +1,155 @@
+"""Tune the HNSW parameters used by `finance.create_vector_search_index`.
+
+Builds a local HNSW index (`local_hnsw.HNSWIndex`) for every combination of
+`m` and `efConstruction`, queries it with every `efSearch`, and compares the
+results against exact brute-force neighbours. Prints recall@k, query latency
+and search effort for each configuration, marks the Pareto-optimal ones
+(no other configuration is both at least as accurate and at least as fast),
+and recommends the fastest Pareto configuration that meets `--target-recall`.
+
+The default grid stays inside the ranges Azure AI Search accepts
+(m 4-10, efConstruction/efSearch 100-1000) and always includes the
+current setting. The recommendation is applied through the HNSW_M,
+HNSW_EF_CONSTRUCTION and HNSW_EF_SEARCH environment variables, which
+`--write-env` can update in a .env file for you.
+
+    python tune_hnsw.py --docs 3000 --queries 100
+    python tune_hnsw.py --corpus embeddings.npz --target-recall 0.98 --write-env .env
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+from local_hnsw import HNSWIndex
+from vector_eval import exact_knn, load_corpus, percentile, recall_at_k, synthetic_corpus
+
+CURRENT = {"m": 4, "ef_construction": 400, "ef_search": 500}
+ENV_NAMES = {"m": "HNSW_M", "ef_construction": "HNSW_EF_CONSTRUCTION", "ef_search": "HNSW_EF_SEARCH"}
+
+
+def evaluate(docs, queries, truth, k, m, ef_construction, ef_searches):
+    """Build one index and measure it at every `ef_search`."""
+    index = HNSWIndex(docs.shape[1], len(docs), m=m, ef_construction=ef_construction)
+    start = time.perf_counter()
+    index.add_items(docs)
+    build_s = time.perf_counter() - start
+
+    rows = []
+    for ef_search in ef_searches:
+        index.distance_count = 0
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            found.append(index.search(query, k, ef_search))
+            latencies.append((time.perf_counter() - start) * 1000)
+        rows.append({
+            "m": m,
+            "ef_construction": ef_construction,
+            "ef_search": ef_search,
+            "build_s": build_s,
+            "recall": recall_at_k(found, truth, k),
+            "mean_ms": sum(latencies) / len(latencies),
+            "p95_ms": percentile(latencies, 95),
+            "distances": index.distance_count / len(queries),
+        })
+    return rows
+
+
+def pareto_front(rows: list[dict]) -> list[dict]:
+    """Rows not dominated on (higher recall, lower mean latency)."""
+    front = []
+    for row in rows:
+        dominated = any(
+            other["recall"] >= row["recall"]
+            and other["mean_ms"] <= row["mean_ms"]
+            and (other["recall"] > row["recall"] or other["mean_ms"] < row["mean_ms"])
+            for other in rows
+        )
+        if not dominated:
+            front.append(row)
+    return front
+
+
+def recommend(front: list[dict], target_recall: float) -> dict:
+    """Fastest Pareto configuration meeting the target, else the most accurate one."""
+    meeting = [row for row in front if row["recall"] >= target_recall]
+    if meeting:
+        return min(meeting, key=lambda row: row["mean_ms"])
+    return max(front, key=lambda row: row["recall"])
+
+
+def write_env(path: str, settings: dict) -> None:
+    """Set the HNSW_* variables in a .env file, keeping every other line."""
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+    values = {ENV_NAMES[name]: str(value) for name, value in settings.items()}
+    kept = [line for line in lines if line.split("=", 1)[0].strip() not in values]
+    kept += [f"{name}={value}" for name, value in values.items()]
+    with open(path, "w") as f:
+        f.write("\n".join(kept) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help=".npz file with 'docs' and 'queries' embedding arrays (default: synthetic)")
+    parser.add_argument("--docs", type=int, default=2000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=100, help="Synthetic query count")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Synthetic embedding size")
+    parser.add_argument("-k", type=int, default=3, help="Neighbours per query (finance.search_documents uses 3)")
+    parser.add_argument("--m", type=int, nargs="+", default=[4, 6, 8, 10])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[100, 200, 500])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--write-env", metavar="PATH", help="Write the recommended HNSW_* settings to this .env file")
+    args = parser.parse_args()
+
+    if args.corpus:
+        docs, queries = load_corpus(args.corpus)
+    else:
+        docs, queries = synthetic_corpus(args.docs, args.queries, args.dimensions)
+    truth = exact_knn(docs, queries, args.k)
+
+    grid = set(itertools.product(args.m, args.ef_construction))
+    grid.add((CURRENT["m"], CURRENT["ef_construction"]))
+    ef_searches = sorted(set(args.ef_search) | {CURRENT["ef_search"]})
+
+    rows = []
+    for m, ef_construction in sorted(grid):
+        print(f"Building m={m} efConstruction={ef_construction} ...", flush=True)
+        rows += evaluate(docs, queries, truth, args.k, m, ef_construction, ef_searches)
+
+    front = pareto_front(rows)
+    best = recommend(front, args.target_recall)
+
+    print(f"\n{len(docs)} docs, {len(queries)} queries, recall@{args.k} vs exact kNN\n")
+    header = f"{'m':>3} {'efC':>5} {'efS':>5} {'build s':>8} {'recall':>7} {'mean ms':>8} {'p95 ms':>8} {'dists/q':>8}"
+    print(header + "  ")
+    print("-" * (len(header) + 12))
+    for row in rows:
+        marks = []
+        if row in front:
+            marks.append("pareto")
+        if all(row[name] == value for name, value in CURRENT.items()):
+            marks.append("current")
+        print(f"{row['m']:>3} {row['ef_construction']:>5} {row['ef_search']:>5} {row['build_s']:>8.1f} "
+              f"{row['recall']:>7.3f} {row['mean_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['distances']:>8.0f}  "
+              f"{' '.join(marks)}")
+
+    settings = {name: best[name] for name in ENV_NAMES}
+    print(f"\nRecommended (target recall {args.target_recall}): "
+          f"m={best['m']} efConstruction={best['ef_construction']} efSearch={best['ef_search']} "
+          f"-> recall {best['recall']:.3f}, {best['mean_ms']:.2f} ms/query")
+    for name, value in settings.items():
+        print(f"{ENV_NAMES[name]}={value}")
+
+    if args.write_env:
+        write_env(args.write_env, settings)
+        print(f"Updated {args.write_env}; recreate the index to apply.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Offline helpers for evaluating vector index configurations.
+
+Shared by the benchmark and tuning scripts in this directory. Everything here
+runs locally on numpy arrays; no Azure calls are made.
+"""
+
+import time
+
+import numpy as np
+
+
+def synthetic_corpus(
+    num_docs: int,
+    num_queries: int,
+    dimensions: int = 1536,
+    num_clusters: int = 64,
+    seed: int = 7,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Generate clustered, unit-normalised document and query embeddings.
+
+    Real text embeddings are strongly clustered, so uniform random vectors
+    would make every index configuration look equally good (or bad).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dimensions)).astype(np.float32)
+
+    def sample(count):
+        assignments = rng.integers(0, num_clusters, size=count)
+        noise = rng.standard_normal((count, dimensions)).astype(np.float32)
+        return normalize(centers[assignments] + 0.6 * noise)
+
+    return sample(num_docs), sample(num_queries)
+
+
+def load_corpus(path: str) -> tuple[np.ndarray, np.ndarray]:
+    """Load `docs` and `queries` arrays from an .npz file of saved embeddings."""
+    data = np.load(path)
+    return normalize(data["docs"].astype(np.float32)), normalize(data["queries"].astype(np.float32))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot product equals cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def shorten(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Truncate and re-normalise, as `text-embedding-3-*` does for `dimensions=`."""
+    return normalize(vectors[:, :dimensions])
+
+
+def exact_knn(docs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k document indices for every query."""
+    scores = queries @ docs.T
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: np.ndarray | list, truth: np.ndarray, k: int) -> float:
+    """Mean fraction of the true top-k neighbours present in each result list."""
+    hits = 0
+    for result, expected in zip(found, truth):
+        hits += len(set(list(result)[:k]) & set(expected[:k].tolist()))
+    return hits / (len(truth) * k)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """The `pct`-th percentile of `values` (0 for an empty list)."""
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def timed(func, *args, **kwargs):
+    """Call `func` and return `(result, elapsed_seconds)`."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,260 @@
+"""Local mock of the OpenAI-compatible LLM APIs used by the agents.
+
+Speaks the chat-completions (plain and streamed as server-sent events) and
+embeddings wire formats on every path the agents' SDKs call:
+
+    POST /v1/chat/completions                          OpenAI (RAGChat)
+    POST /openai/v1/chat/completions                   Groq (news, weather agents)
+    POST /openai/deployments/{name}/chat/completions   Azure OpenAI (finance agent)
+    POST /serving-endpoints/chat/completions           Databricks model serving
+    POST /v1/embeddings, /openai/deployments/{name}/embeddings
+    GET  /stats                                        request and injected-error counts
+
+Each response waits for a sampled latency (fixed, uniform, exponential or
+lognormal around `--latency-ms`) and then produces tokens at `--tokens-per-sec`.
+`--error-rate` injects 500s, `--throttle-rate` injects 429s, and `--rpm` enforces
+a real requests-per-minute limit with 429 + Retry-After. Completions and
+embeddings are deterministic functions of the request, and every response
+reports usage token counts.
+
+    python loadtest/mock_llm_server.py --port 8000 --latency-ms 300 --tokens-per-sec 80
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from uuid import uuid4
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.rate_limit import TokenBucket
+
+WORDS = (
+    "the model suggests a brief summary of key points including growth risk revenue outlook weather "
+    "activity hiking cycling picnic museum market update launch funding research team product users "
+    "data cloud security quarter results context answer"
+).split()
+
+# --------------------------
+# Deterministic content
+# --------------------------
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def embedding(text: str, dimensions: int) -> list[float]:
+    """Hashed bag of words, normalised: similar texts give similar vectors."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def completion_tokens(messages: list[dict], count: int) -> list[str]:
+    """`count` pseudo-words chosen deterministically from the conversation."""
+    seed = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).digest()
+    rng = random.Random(seed)
+    return [rng.choice(WORDS) + " " for _ in range(count)]
+
+
+def _message_text(messages: list[dict]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):  # content parts
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+# --------------------------
+# Behaviour
+# --------------------------
+
+class MockBehaviour:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.bucket = TokenBucket(args.rpm / 60, capacity=max(1, args.rpm / 60)) if args.rpm else None
+        self.counts = Counter()
+
+    def latency(self) -> float:
+        mean = self.args.latency_ms / 1000
+        dist = self.args.latency_dist
+        if dist == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if dist == "uniform":
+            return self.rng.uniform(0, 2 * mean)
+        if dist == "exponential":
+            return self.rng.expovariate(1 / mean)
+        # lognormal with median `mean`: a realistic long tail
+        return self.rng.lognormvariate(math.log(mean), self.args.latency_sigma)
+
+    def injected_error(self):
+        """An error response to return instead of a result, or None."""
+        if self.bucket and not self.bucket.try_acquire():
+            self.counts["rate_limited"] += 1
+            return _error(429, "rate_limit_exceeded", "Rate limit reached (rpm)", retry_after=1)
+        roll = self.rng.random()
+        if roll < self.args.throttle_rate:
+            self.counts["throttled"] += 1
+            return _error(429, "rate_limit_exceeded", "Injected rate limit", retry_after=1)
+        if roll < self.args.throttle_rate + self.args.error_rate:
+            self.counts["errors"] += 1
+            return _error(500, "server_error", "Injected server error")
+        return None
+
+
+def _error(status: int, code: str, message: str, retry_after: int | None = None) -> web.Response:
+    headers = {"retry-after": str(retry_after)} if retry_after else None
+    return web.json_response({"error": {"message": message, "type": code, "code": code}}, status=status, headers=headers)
+
+# --------------------------
+# Handlers
+# --------------------------
+
+async def handle_chat(request: web.Request) -> web.StreamResponse:
+    behaviour: MockBehaviour = request.app["behaviour"]
+    body = await request.json()
+    behaviour.counts["chat"] += 1
+    await asyncio.sleep(behaviour.latency())
+    if (error := behaviour.injected_error()) is not None:
+        return error
+
+    messages = body.get("messages", [])
+    model = body.get("model") or request.match_info.get("deployment", "mock-model")
+    limit = body.get("max_tokens") or body.get("max_completion_tokens") or behaviour.args.output_tokens
+    tokens = completion_tokens(messages, min(limit, behaviour.args.output_tokens))
+    usage = {
+        "prompt_tokens": estimate_tokens(_message_text(messages)),
+        "completion_tokens": len(tokens),
+        "total_tokens": estimate_tokens(_message_text(messages)) + len(tokens),
+    }
+    completion_id = f"chatcmpl-{uuid4().hex[:24]}"
+    created = int(time.time())
+    per_token = 1 / behaviour.args.tokens_per_sec if behaviour.args.tokens_per_sec > 0 else 0.0
+
+    if not body.get("stream"):
+        await asyncio.sleep(per_token * len(tokens))
+        return web.json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+    await response.prepare(request)
+
+    async def send(delta, finish_reason=None, **extra):
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+
+    await send({"role": "assistant", "content": ""})
+    for token in tokens:
+        await asyncio.sleep(per_token)
+        await send({"content": token})
+    await send({}, finish_reason="stop")
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                 "model": model, "choices": [], "usage": usage}
+        await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await response.write(b"data: [DONE]\n\n")
+    await response.write_eof()
+    return response
+
+
+async def handle_embeddings(request: web.Request) -> web.Response:
+    behaviour: MockBehaviour = request.app["behaviour"]
+    body = await request.json()
+    behaviour.counts["embeddings"] += 1
+    await asyncio.sleep(behaviour.latency())
+    if (error := behaviour.injected_error()) is not None:
+        return error
+
+    inputs = body.get("input", [])
+    inputs = [inputs] if isinstance(inputs, str) else inputs
+    inputs = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]  # token arrays
+    dimensions = body.get("dimensions") or behaviour.args.dimensions
+    prompt_tokens = sum(estimate_tokens(text) for text in inputs)
+    return web.json_response({
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": embedding(text, dimensions)}
+            for index, text in enumerate(inputs)
+        ],
+        "model": body.get("model") or request.match_info.get("deployment", "mock-embedding"),
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    })
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    return web.json_response(dict(request.app["behaviour"].counts))
+
+
+def create_app(args) -> web.Application:
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app["behaviour"] = MockBehaviour(args)
+    app.add_routes([
+        web.post("/v1/chat/completions", handle_chat),
+        web.post("/openai/v1/chat/completions", handle_chat),
+        web.post("/openai/deployments/{deployment}/chat/completions", handle_chat),
+        web.post("/serving-endpoints/chat/completions", handle_chat),
+        web.post("/v1/embeddings", handle_embeddings),
+        web.post("/openai/v1/embeddings", handle_embeddings),
+        web.post("/openai/deployments/{deployment}/embeddings", handle_embeddings),
+        web.post("/serving-endpoints/embeddings", handle_embeddings),
+        web.get("/stats", handle_stats),
+    ])
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Mean (median for lognormal) time to first token")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal shape; larger means a longer tail")
+    parser.add_argument("--tokens-per-sec", type=float, default=100, help="Generation speed (0 for instant)")
+    parser.add_argument("--output-tokens", type=int, default=120, help="Completion length (capped by max_tokens)")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding size when the request doesn't set one")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests failing with 429")
+    parser.add_argument("--rpm", type=float, default=0.0, help="Requests per minute before returning 429 (0: unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    print(f"Mock LLM server on http://{args.host}:{args.port}")
+    web.run_app(create_app(args), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
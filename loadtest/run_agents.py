@@ -0,0 +1,249 @@
+"""Load generator that drives the agents' LLM call paths through the mock server.
+
+Each agent is imported from its folder with its SDK pointed at the mock (via
+the standard base-URL environment variables) and its own caches disabled, then
+called from `--concurrency` threads for `--requests` calls:
+
+    news     ai-news.summarize_text              (Groq SDK)
+    weather  Weather-Agent.get_activity_suggestions (Groq SDK)
+    finance  finance.chat_with_documents         (Azure OpenAI SDK; search uses finance/stubs.py)
+    rag      RAGChat.query                       (LangChain ChatOpenAI; needs the chat agent's deps)
+
+Reports throughput, latency percentiles, calls the agent handled as errors
+(fallback answers), exceptions that escaped, and what the mock saw upstream
+(requests, injected 500s and 429s).
+
+    python loadtest/run_agents.py --start-server --server-args "--error-rate 0.05 --rpm 600"
+    python loadtest/run_agents.py --url http://127.0.0.1:8000 --agents news,weather --concurrency 32
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = (
+    "startup raises funding round to expand cloud security platform while regulators review data "
+    "privacy rules and analysts expect revenue growth next quarter as new product launches reach users"
+).split()
+
+# --------------------------
+# Agent setup
+# --------------------------
+
+def load_module(name, path):
+    """Import a script-style agent from its own folder (so its sibling imports resolve)."""
+    folder = os.path.dirname(path)
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def point_at_mock(url):
+    """Route every SDK to the mock and turn off the agents' own response caches."""
+    os.environ.update({
+        "OPENAI_API_KEY": "mock", "OPENAI_BASE_URL": f"{url}/v1", "OPENAI_API_BASE": f"{url}/v1",
+        "GROQ_API_KEY": "mock", "GROQ_BASE_URL": url,
+        "AZURE_OPENAI_KEY": "mock", "AZURE_OPENAI_ENDPOINT": url,
+        "EMBEDDING_DEPLOYMENT": "mock-embedding",
+        "SUMMARY_CACHE_MAX_MB": "0", "SUGGESTION_CACHE_MAX_ENTRIES": "0", "ANSWER_CACHE_SIZE": "0",
+    })
+    # Agents validate these at import time; the load test never sends email or calls WeatherAPI
+    for name, value in [("RESEND_API_KEY", "mock"), ("FROM_EMAIL", "loadtest@example.com"),
+                        ("TO_EMAIL", "loadtest@example.com"), ("RAPIDAPI_KEY", "mock"),
+                        ("GROQ_REQUESTS_PER_MINUTE", "1000000")]:
+        os.environ.setdefault(name, value)
+
+
+def random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def setup_news(rng):
+    news = load_module("ai_news", os.path.join(ROOT, "tc-news-agent", "ai-news.py"))
+
+    def call(i):
+        # Mostly short articles; every tenth one is long enough for the map-reduce path
+        words = rng.randint(8000, 20000) if i % 10 == 0 else rng.randint(200, 1500)
+        return news.summarize_text(random_text(random.Random(i), words)) is not None
+    return call
+
+
+def setup_weather(rng):
+    weather = load_module("weather_agent", os.path.join(ROOT, "weather", "Weather-Agent.py"))
+    fallback = "Unable to provide activity suggestions at this time."
+
+    def call(i):
+        local = random.Random(i)
+        temp_c = local.uniform(-5, 35)
+        info = {
+            "date": "2030-01-01", "condition": local.choice(["Sunny", "Partly cloudy", "Light rain", "Overcast"]),
+            "avg_temp_c": round(temp_c, 1), "avg_temp_f": round(temp_c * 9 / 5 + 32, 1),
+            "max_wind_kph": round(local.uniform(0, 50), 1), "humidity": local.randint(20, 100),
+        }
+        return weather.get_activity_suggestions(info, local.choice(["London", "Paris", "Houston, Texas"])) != fallback
+    return call
+
+
+def setup_finance(rng):
+    sys.path.insert(0, os.path.join(ROOT, "finance"))
+    import clients
+    import finance
+    import stubs
+
+    # Azure AI Search and Document Intelligence stay local; OpenAI calls go to the mock
+    stubs.install()
+    clients.reset("openai_client", "async_openai_client")
+    with contextlib.redirect_stdout(io.StringIO()):  # one line per uploaded chunk
+        finance.process_chunks(
+            [random_text(random.Random(n), 200) for n in range(50)], file_name="loadtest.pdf", source_hash="loadtest"
+        )
+    questions = ["What was revenue growth?", "Summarize the security risks.", "What is the outlook?"]
+
+    def call(i):
+        return bool(finance.chat_with_documents(f"{questions[i % len(questions)]} ({i})", scope={"source_hash": "loadtest"}))
+    return call
+
+
+def setup_rag(rng):
+    sys.path.insert(0, os.path.join(ROOT, "chat-agent-langchain"))
+    from src.chat.rag_chat import RAGChat
+
+    shared = RAGChat(persist_directory=os.path.join(os.getcwd(), "chroma_db"))
+    shared.ingest_documents(os.path.join(ROOT, "chat-agent-langchain", "data", "data.txt"))
+    local = threading.local()
+    questions = ["What is ISRO?", "When was it founded?", "Name a recent mission.", "Who leads it?"]
+
+    def call(i):
+        # One conversation memory per worker thread, sharing the vector store
+        if not hasattr(local, "chat"):
+            local.chat = RAGChat(persist_directory=shared.persist_directory)
+            local.chat.vectorstore = shared.vectorstore
+        local.chat.memory_manager.clear()
+        return bool(local.chat.query(questions[i % len(questions)]))
+    return call
+
+
+AGENTS = {"news": setup_news, "weather": setup_weather, "finance": setup_finance, "rag": setup_rag}
+
+# --------------------------
+# Driving and reporting
+# --------------------------
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def mock_stats(url):
+    try:
+        with urllib.request.urlopen(f"{url}/stats", timeout=5) as response:
+            return json.load(response)
+    except Exception:
+        return {}
+
+
+def drive(call, requests, concurrency):
+    latencies, outcomes, lock = [], {"ok": 0, "handled": 0, "exceptions": {}}, threading.Lock()
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            ok = call(i)
+            error = None
+        except Exception as e:
+            ok, error = False, type(e).__name__
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if error:
+                outcomes["exceptions"][error] = outcomes["exceptions"].get(error, 0) + 1
+            else:
+                outcomes["ok" if ok else "handled"] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    return latencies, outcomes, time.perf_counter() - start
+
+
+def report(name, latencies, outcomes, elapsed, upstream):
+    ms = [value * 1000 for value in latencies]
+    print(
+        f"{name:<8} {len(ms):>6} {len(ms) / elapsed:>7.1f} {percentile(ms, 50):>8.0f} {percentile(ms, 95):>8.0f} "
+        f"{percentile(ms, 99):>8.0f} {outcomes['ok']:>6} {outcomes['handled']:>8} "
+        f"{json.dumps(outcomes['exceptions']):<20} {json.dumps(upstream)}"
+    )
+
+
+def start_server(url, server_args):
+    host, port = url.rsplit("//", 1)[-1].split(":")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_llm_server.py"),
+         "--host", host, "--port", port, *shlex.split(server_args)],
+    )
+    for _ in range(100):
+        if mock_stats(url) or process.poll() is not None:
+            break
+        time.sleep(0.1)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Mock server base URL")
+    parser.add_argument("--agents", default="news,weather,finance", help=f"Comma-separated: {', '.join(AGENTS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Calls per agent")
+    parser.add_argument("--start-server", action="store_true", help="Run the mock server for the duration of the test")
+    parser.add_argument("--server-args", default="", help="Extra arguments for mock_llm_server.py")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)  # keep the agents' per-call logging quiet
+    server = start_server(args.url, args.server_args) if args.start_server else None
+    workdir = tempfile.mkdtemp(prefix="agent-loadtest-")
+    os.chdir(workdir)  # agents' log files and local databases go here
+    point_at_mock(args.url)
+    rng = random.Random(0)
+
+    try:
+        print(f"{'agent':<8} {'calls':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ok':>6} "
+              f"{'handled':>8} {'exceptions':<20} upstream")
+        for name in args.agents.split(","):
+            try:
+                call = AGENTS[name.strip()](rng)
+            except Exception as e:
+                print(f"{name:<8} skipped: {type(e).__name__}: {e}")
+                continue
+            before = mock_stats(args.url)
+            latencies, outcomes, elapsed = drive(call, args.requests, args.concurrency)
+            after = mock_stats(args.url)
+            upstream = {key: after[key] - before.get(key, 0) for key in after if after[key] - before.get(key, 0)}
+            report(name, latencies, outcomes, elapsed, upstream)
+    finally:
+        if server:
+            server.terminate()
+    print(f"Agent logs and databases: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
 # ai_news.py
 
+import argparse
 import feedparser
+import requests
 from newspaper import Article
 import json
 from datetime import datetime
 import os
+import sys
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from groq import Groq
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import resend
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.email_dispatch import EmailDispatcher
+from common import usage_ledger
+from common.llm_gateway import gateway
+from common.log_setup import setup_logging
+from common.run_metrics import RunMetrics
+from article_store import ArticleStore
+from fingerprints import normalized_words, shingles, simhash
+from summary_cache import SummaryCache, prompt_version
+from pipeline import Pipeline, PerHostLimiter, Stage
+
 # --------------------------
 # Load Environment Variables
 # --------------------------
@@ -34,175 +47,469 @@ if not RESEND_API_KEY:
 # Configuration Parameters
 # --------------------------
 
-# RSS feed URL for TechCrunch
+# RSS feed URL for TechCrunch, used when no feeds file exists
 RSS_FEED_URL = 'https://techcrunch.com/feed/'
 
-# Maximum number of articles to process daily
-MAX_ARTICLES = 5
+# Feeds to fetch: {"feeds": [{"name": ..., "url": ..., "max_articles": ...}]}
+FEEDS_FILE = os.getenv('FEEDS_FILE', 'feeds.json')
+
+# Maximum number of articles to process daily from a feed without its own "max_articles"
+MAX_ARTICLES_PER_FEED = int(os.getenv('MAX_ARTICLES_PER_FEED', '5'))
+
+# ETag/Last-Modified per feed, so unchanged feeds cost a 304 on the next run
+FEED_STATE_FILE = os.getenv('FEED_STATE_FILE', 'feed_state.json')
 
-# Output JSON file to store articles
+# Feeds fetched in parallel, and seconds to wait for each
+MAX_FEED_WORKERS = int(os.getenv('MAX_FEED_WORKERS', '8'))
+FEED_TIMEOUT = float(os.getenv('FEED_TIMEOUT', '20'))
+
+# Legacy JSON file of stored articles, imported into the article store on first run
 OUTPUT_FILE = 'techcrunch_articles.json'
 
-# Number of threads for parallel processing
-MAX_WORKERS = 5
+# Workers per pipeline stage: downloads are network-bound, extraction is CPU-bound
+# and summaries are bounded by the Groq rate limit
+MAX_DOWNLOAD_WORKERS = int(os.getenv('MAX_DOWNLOAD_WORKERS', '8'))
+MAX_DOWNLOADS_PER_HOST = int(os.getenv('MAX_DOWNLOADS_PER_HOST', '2'))
+MAX_EXTRACT_WORKERS = int(os.getenv('MAX_EXTRACT_WORKERS', '2'))
+MAX_SUMMARY_WORKERS = int(os.getenv('MAX_SUMMARY_WORKERS', '4'))
+
+# SimHash bits that may differ for an article to count as a near-duplicate of a stored one.
+# Texts with fewer shingles (paywall stubs, cookie banners) are never matched, and matches
+# at least NEAR_DUPLICATE_VERIFY_DISTANCE bits apart must also share the title or the exact text.
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv('NEAR_DUPLICATE_MAX_DISTANCE', '3'))
+NEAR_DUPLICATE_MIN_SHINGLES = int(os.getenv('NEAR_DUPLICATE_MIN_SHINGLES', '50'))
+NEAR_DUPLICATE_VERIFY_DISTANCE = int(os.getenv('NEAR_DUPLICATE_VERIFY_DISTANCE', '2'))
+
+# Model used for summaries and the token budget of its 8k context. Longer articles are
+# summarized section by section (map) and the section summaries combined (reduce).
+#
+# Token counts are estimated from characters (CHARS_PER_TOKEN), not with the model's tokenizer.
+# LLaMA averages about 4 characters per token on English news, so the estimate usually overstates.
+# Text heavy in numbers, URLs or non-Latin script can get down to about 3, which puts 6000
+# estimated tokens at about 7000 real ones. The rest of the 8192 window covers the prompt and
+# the summary. Lower SUMMARY_MAX_INPUT_TOKENS if Groq reports context-length errors.
+SUMMARY_MODEL = os.getenv('SUMMARY_MODEL', 'llama3-8b-8192')  # Changed from llama-3.3-70b-versatile
+SUMMARY_MAX_INPUT_TOKENS = int(os.getenv('SUMMARY_MAX_INPUT_TOKENS', '6000'))
+SUMMARY_SECTION_TOKENS = int(os.getenv('SUMMARY_SECTION_TOKENS', '2500'))
+CHARS_PER_TOKEN = 3.5
+
+# Rounds of combining section summaries that are still too long for one call. After the last
+# round the summaries are cut to the input budget before the final combine.
+SUMMARY_MAX_REDUCE_DEPTH = int(os.getenv('SUMMARY_MAX_REDUCE_DEPTH', '2'))
+
+SUMMARY_PROMPT = "Please provide a concise summary of the following text:\n\n{content}\n\nKeep the summary brief and focused on the key points."
+SECTION_PROMPT = "Please summarize the key points of this section of a longer article:\n\n{content}\n\nKeep it brief."
+COMBINE_PROMPT = (
+    "The following are summaries of consecutive sections of one article. Combine them into a single "
+    "concise summary of the whole article:\n\n{content}\n\nKeep the summary brief and focused on the key points."
+)
+
+# Changes whenever a prompt or the chunking limits change, invalidating cached summaries
+SUMMARY_PROMPT_VERSION = prompt_version(
+    SUMMARY_PROMPT, SECTION_PROMPT, COMBINE_PROMPT, SUMMARY_MAX_INPUT_TOKENS, SUMMARY_SECTION_TOKENS
+)
+
+# Stored articles whose summarization failed this many times are left out of the backlog
+SUMMARY_MAX_ATTEMPTS = int(os.getenv('SUMMARY_MAX_ATTEMPTS', '3'))
+
+# Sender and comma-separated recipients of the daily summary email
+NEWS_FROM_EMAIL = os.getenv('NEWS_FROM_EMAIL', 'AI News <onboarding@resend.dev>')
+NEWS_TO_EMAILS = [
+    email.strip()
+    for email in os.getenv('NEWS_TO_EMAILS', 'vinoddevopscloud99@gmail.com').split(',')
+    if email.strip()
+]
 
 # --------------------------
 # Logging Configuration
 # --------------------------
 
-logging.basicConfig(
-    level=logging.INFO,  # Change to DEBUG for detailed logs
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("ai_news.log"),
-        logging.StreamHandler()
-    ]
-)
+# Written by a background thread to a size-rotated file (LOG_LEVEL=DEBUG for detailed, sampled logs)
+setup_logging("ai_news.log")
+
+# Stage durations and counts of this run, emitted as one record when it ends
+run_metrics = RunMetrics("news")
 
 # --------------------------
 # Initialize Groq Client
 # --------------------------
 
-client = Groq(api_key=GROQ_API_KEY)
+# Pooled and held to GROQ_REQUESTS_PER_MINUTE across every summary worker (and the Weather agent's
+# calls in the same process); see common/llm_gateway.py
+llm = gateway("groq")
+usage_ledger.set_agent("news")
 
 # Initialize Resend client
 resend.api_key = RESEND_API_KEY
 
+download_limiter = PerHostLimiter(MAX_DOWNLOADS_PER_HOST)
+
+# Summaries by (model, prompt version, content hash), so unchanged text is never re-summarized
+summary_cache = SummaryCache()
+
 # --------------------------
 # Function Definitions
 # --------------------------
 
-def fetch_techcrunch_articles(feed_url=RSS_FEED_URL, max_articles=MAX_ARTICLES):
+def load_feeds(filename=FEEDS_FILE):
+    """
+    Loads the list of feeds to fetch.
+
+    Args:
+        filename (str): JSON file of the form {"feeds": [{"name": ..., "url": ..., "max_articles": ...}]}.
+
+    Returns:
+        list: Feed dictionaries with name, url and max_articles. Falls back to the TechCrunch
+        feed when the file does not exist.
+    """
+    if not os.path.exists(filename):
+        return [{'name': 'TechCrunch', 'url': RSS_FEED_URL, 'max_articles': MAX_ARTICLES_PER_FEED}]
+    with open(filename, 'r') as f:
+        feeds = json.load(f).get('feeds', [])
+    return [
+        {
+            'name': feed.get('name') or feed['url'],
+            'url': feed['url'],
+            'max_articles': int(feed.get('max_articles', MAX_ARTICLES_PER_FEED))
+        }
+        for feed in feeds if feed.get('url')
+    ]
+
+def load_feed_state(filename=FEED_STATE_FILE):
+    """
+    Loads the ETag/Last-Modified validators saved by the previous run, keyed by feed URL.
+    """
+    if not os.path.exists(filename):
+        return {}
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable feed state {filename}: {e}")
+        return {}
+
+def save_feed_state(state, filename=FEED_STATE_FILE):
+    """
+    Saves the feed validators atomically.
+    """
+    temp_path = f"{filename}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=4)
+    os.replace(temp_path, filename)
+
+http_session = requests.Session()
+http_session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=MAX_FEED_WORKERS))
+
+def fetch_feed_articles(feed, validators=None):
     """
-    Fetches the latest articles from TechCrunch RSS feed.
+    Fetches the latest articles from one RSS feed with a conditional request.
 
     Args:
-        feed_url (str): The RSS feed URL.
-        max_articles (int): Maximum number of articles to fetch.
+        feed (dict): Feed with name, url and max_articles.
+        validators (dict): The feed's "etag" and "modified" values from the previous run.
 
     Returns:
-        list: A list of dictionaries containing article details.
+        tuple: (articles, validators). Articles is empty when the feed is unchanged (HTTP 304);
+        validators are the values to store for the next run.
     """
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('modified'):
+        headers['If-Modified-Since'] = validators['modified']
+
     try:
-        feed = feedparser.parse(feed_url)
+        response = http_session.get(feed['url'], headers=headers, timeout=FEED_TIMEOUT)
+        if response.status_code == 304:
+            logging.info(f"{feed['name']} feed unchanged since the last run.")
+            run_metrics.count("feeds_unchanged")
+            return [], validators
+        response.raise_for_status()
+
+        parsed = feedparser.parse(response.content)
         articles = []
-        for entry in feed.entries[:max_articles]:
+        for entry in parsed.entries[:feed['max_articles']]:
             articles.append({
                 'title': entry.title,
                 'url': entry.link,
-                'published_at': entry.published
+                'published_at': entry.get('published', ''),
+                'source': feed['name']
             })
-        logging.info(f"Fetched {len(articles)} articles from TechCrunch.")
-        return articles
+        logging.info(f"Fetched {len(articles)} articles from {feed['name']}.")
+        return articles, {
+            'etag': response.headers.get('ETag'),
+            'modified': response.headers.get('Last-Modified')
+        }
     except Exception as e:
-        logging.error(f"Failed to fetch articles from RSS feed: {e}")
-        return []
+        logging.error(f"Failed to fetch articles from {feed['name']} ({feed['url']}): {e}")
+        run_metrics.count("feed_failures")
+        return [], validators
 
-def extract_article_content(url):
+def fetch_articles(feeds, feed_state):
     """
-    Extracts and returns the full text of the article from the given URL.
+    Fetches all feeds concurrently.
 
     Args:
-        url (str): The URL of the article.
+        feeds (list): Feed dictionaries from load_feeds.
+        feed_state (dict): Validators from the previous run, keyed by feed URL.
 
     Returns:
-        str or None: The extracted article text, or None if extraction fails.
+        tuple: (articles, feed_state). Articles from all feeds, de-duplicated by URL, and the
+        updated validators to save once the articles have been stored.
     """
-    try:
-        article = Article(url)
-        article.download()
-        article.parse()
-        if not article.text:
-            logging.warning(f"No content found for URL: {url}")
-            return None
-        return article.text
-    except Exception as e:
-        logging.error(f"Error extracting content from {url}: {e}")
-        return None
-
-def summarize_text(content, stream=False):
+    with ThreadPoolExecutor(max_workers=MAX_FEED_WORKERS) as executor:
+        results = list(executor.map(
+            lambda feed: fetch_feed_articles(feed, feed_state.get(feed['url'])), feeds
+        ))
+
+    articles = {}
+    new_state = dict(feed_state)
+    for feed, (feed_articles, validators) in zip(feeds, results):
+        new_state[feed['url']] = validators
+        for article in feed_articles:
+            articles.setdefault(article['url'], article)
+    return list(articles.values()), new_state
+
+def download_article(article):
     """
-    Summarizes the given text using Groq Cloud AI's LLaMA model.
+    Pipeline stage: downloads the article's HTML, at most MAX_DOWNLOADS_PER_HOST at a time per host.
 
     Args:
-        content (str): The text to summarize.
-        stream (bool): Whether to use streaming responses.
+        article (dict): Article metadata.
 
     Returns:
-        str or None: The summary text, or None if summarization fails.
+        dict or None: The article with its downloaded document attached, or None if the download failed.
     """
-    try:
-        # Make the API request
-        completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Please provide a concise summary of the following text:\n\n{content}\n\nKeep the summary brief and focused on the key points."
-                }
-            ],
-            model="llama3-8b-8192",  # Changed from llama-3.3-70b-versatile
-            stream=stream
-        )
-        
-        if stream:
-            summary = ""
-            for chunk in completion:
-                if chunk.choices[0].delta.content is not None:
-                    summary += chunk.choices[0].delta.content
-            return summary.strip() if summary else None
-        else:
-            return completion.choices[0].message.content.strip()
+    url = article['url']
+    article['content'] = None
+    article['summary'] = None
+    document = Article(url)
+    with download_limiter.limit(url):
+        document.download()
+    if not document.html:
+        logging.error(f"Error downloading {url}: {document.download_exception_msg or 'empty response'}")
+        return None
+    article['_document'] = document
+    return article
 
-    except Exception as e:
-        logging.error(f"Summarization failed: {e}")
+def extract_article(article):
+    """
+    Pipeline stage: extracts the full text from the downloaded HTML.
+
+    Returns:
+        dict or None: The article with `content` set, or None if no text could be extracted.
+    """
+    document = article.pop('_document')
+    document.parse()
+    if not document.text:
+        logging.warning(f"No content found for URL: {article['url']}")
         return None
+    article['content'] = document.text
+    return article
+
+def same_story(store, article, url, title):
+    """
+    Confirms a borderline SimHash match: the same title, or exactly the same text.
+    """
+    if normalized_words(article['title']) == normalized_words(title):
+        return True
+    content = store.get_content(url)
+    return content is not None and normalized_words(content) == normalized_words(article['content'])
+
+def check_near_duplicate(store, article):
+    """
+    Pipeline stage: fingerprints the extracted text and reuses the summary of a stored
+    near-duplicate (syndicated or updated copy) instead of calling Groq.
+
+    Returns:
+        dict or None: The article to summarize, or None if it reused an existing summary.
+    """
+    article['simhash'] = simhash(article['content'])
+    if len(shingles(article['content'])) < NEAR_DUPLICATE_MIN_SHINGLES:
+        logging.debug(f"Too little text to check for near-duplicates: {article['title']}")
+        return article
+    match = store.find_near_duplicate(article['simhash'], NEAR_DUPLICATE_MAX_DISTANCE, exclude_url=article['url'])
+    if match is None:
+        return article
+    url, title, summary, distance = match
+    if distance >= NEAR_DUPLICATE_VERIFY_DISTANCE and not same_story(store, article, url, title):
+        logging.info(f"{distance} bits from {url} but the titles and text differ; summarizing separately: {article['title']}")
+        return article
+    article['summary'] = summary
+    article['duplicate_of'] = url
+    logging.info(f"Near-duplicate of {url} ({distance} bits apart); reusing its summary: {article['title']}")
+    return None
 
-def load_existing_articles(filename=OUTPUT_FILE):
+def summarize_article(article):
     """
-    Loads existing articles from the JSON file to prevent duplicates.
+    Pipeline stage: summarizes the extracted text.
+
+    Returns:
+        dict: The article with `summary` set (None if summarization failed).
+    """
+    article['summary'] = summarize_text(article['content'], stream=False)  # Choose stream=True if needed
+    if article['summary']:
+        logging.info(f"Generated summary for article: {article['title']}")
+    else:
+        logging.warning(f"Summarization failed for article: {article['title']}")
+    return article
+
+def build_article_pipeline(store):
+    """
+    Download, extraction, near-duplicate check and summarization as separately sized stages.
+    """
+    return Pipeline([
+        Stage('download', download_article, MAX_DOWNLOAD_WORKERS),
+        Stage('extract', extract_article, MAX_EXTRACT_WORKERS),
+        Stage('dedupe', lambda article: check_near_duplicate(store, article), MAX_EXTRACT_WORKERS),
+        Stage('summarize', summarize_article, MAX_SUMMARY_WORKERS),
+    ])
+
+def estimate_tokens(text):
+    """
+    Cheap, slightly pessimistic token estimate for LLaMA's tokenizer (about 4 characters per token
+    in English prose; 3.5 leaves headroom for names, numbers and code). See CHARS_PER_TOKEN.
+    """
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+def split_into_sections(text, max_tokens=SUMMARY_SECTION_TOKENS):
+    """
+    Splits text into sections of at most `max_tokens` (estimated), breaking between paragraphs
+    where possible and between words otherwise.
 
     Args:
-        filename (str): The JSON file name.
+        text (str): The text to split.
+        max_tokens (int): Token budget per section.
 
     Returns:
-        list: A list of existing article dictionaries.
+        list: The sections, in order.
+    """
+    max_chars = int((max_tokens - 1) * CHARS_PER_TOKEN)
+    pieces = []
+    for paragraph in (p.strip() for p in text.split('\n')):
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            pieces.append(paragraph)
+
+    sections, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            sections.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        sections.append(current)
+    return sections
+
+def complete(prompt, stream=False, stage="summary"):
+    """
+    Sends one prompt to the summary model, once the rate limit allows. `stage` labels the call
+    in the usage ledger.
+
+    Returns:
+        str or None: The response text, or None if the request fails.
     """
-    if not os.path.exists(filename):
-        logging.info(f"No existing file found at {filename}. A new one will be created.")
-        return []
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            return data.get('articles', [])
+        messages = [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+        with usage_ledger.tag(stage=stage):
+            if stream:
+                completion = llm.stream(messages=messages, model=SUMMARY_MODEL)
+                summary = ""
+                for chunk in completion:
+                    if chunk.choices and chunk.choices[0].delta.content is not None:
+                        summary += chunk.choices[0].delta.content
+                return summary.strip() if summary else None
+            else:
+                completion = llm.chat(messages=messages, model=SUMMARY_MODEL)
+                return completion.choices[0].message.content.strip()
+
     except Exception as e:
-        logging.error(f"Failed to load existing articles from {filename}: {e}")
-        return []
+        logging.error(f"Summarization failed: {e}")
+        return None
 
-def save_articles(articles, filename=OUTPUT_FILE):
+def summarize_text(content, stream=False):
     """
-    Saves the articles to a JSON file.
+    Summarizes the given text using Groq Cloud AI's LLaMA model.
+
+    Summaries are cached by model, prompt version and a hash of the text, so unchanged text is
+    never sent to Groq twice. Text that fits SUMMARY_MAX_INPUT_TOKENS is summarized in a single
+    call. Longer text is split into token-bounded sections that are summarized in parallel (map),
+    and the section summaries are then combined into one summary (reduce).
 
     Args:
-        articles (list): A list of article dictionaries.
-        filename (str): The output JSON file name.
+        content (str): The text to summarize.
+        stream (bool): Whether to use streaming responses.
+
+    Returns:
+        str or None: The summary text, or None if summarization fails.
     """
-    data = {
-        'date': datetime.now().isoformat(),
-        'articles': articles
-    }
-    try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=4)
-        logging.info(f"Saved {len(articles)} articles to {filename}.")
-    except Exception as e:
-        logging.error(f"Failed to save articles to {filename}: {e}")
+    cached = summary_cache.get(SUMMARY_MODEL, SUMMARY_PROMPT_VERSION, content)
+    if cached is not None:
+        logging.info("Using cached summary.")
+        usage_ledger.record("groq", SUMMARY_MODEL, cache="summary_cache", stage="summary")
+        return cached
+    summary = map_reduce_summarize(content, stream=stream)
+    summary_cache.put(SUMMARY_MODEL, SUMMARY_PROMPT_VERSION, content, summary)
+    return summary
+
+def map_reduce_summarize(content, stream=False, depth=0):
+    """
+    Summarizes text in one call, or section by section and then combined when it is too long.
+    Section summaries that are still too long are summarized again, at most
+    SUMMARY_MAX_REDUCE_DEPTH times and only while they keep getting shorter.
+    """
+    if estimate_tokens(content) <= SUMMARY_MAX_INPUT_TOKENS:
+        return complete(SUMMARY_PROMPT.format(content=content), stream=stream)
+
+    sections = split_into_sections(content)
+    logging.info(f"Summarizing long text (~{estimate_tokens(content)} tokens) in {len(sections)} sections.")
+    with ThreadPoolExecutor(max_workers=min(MAX_SUMMARY_WORKERS, len(sections))) as executor:
+        section_summaries = list(executor.map(
+            lambda section: complete(SECTION_PROMPT.format(content=section), stream=stream, stage="section"),
+            sections
+        ))
+
+    # A failed section costs some detail, not the whole summary
+    section_summaries = [summary for summary in section_summaries if summary]
+    if len(section_summaries) < len(sections) / 2:
+        logging.error(f"Summarization failed for {len(sections) - len(section_summaries)} of {len(sections)} sections.")
+        return None
+
+    combined = "\n\n".join(section_summaries)
+    if estimate_tokens(combined) > SUMMARY_MAX_INPUT_TOKENS:
+        if depth + 1 < SUMMARY_MAX_REDUCE_DEPTH and len(combined) < len(content):
+            return map_reduce_summarize(combined, stream=stream, depth=depth + 1)
+        # The model keeps answering at length: cut rather than pay for more rounds
+        combined = split_into_sections(combined, SUMMARY_MAX_INPUT_TOKENS)[0]
+        logging.warning(
+            f"Section summaries still exceed {SUMMARY_MAX_INPUT_TOKENS} tokens after {depth + 1} map round(s); "
+            f"combining the first ~{estimate_tokens(combined)} tokens."
+        )
+    return complete(COMBINE_PROMPT.format(content=combined), stream=stream, stage="combine")
 
-def send_daily_summary_email(articles):
+def send_daily_summary_email(articles, recipients=None):
     """
-    Sends a single email containing summaries of all articles using Resend.
+    Sends the daily email containing summaries of all articles to every recipient using
+    Resend's batch endpoint (rate limited, with retries).
 
     Args:
         articles (list): List of article dictionaries containing title, published_at, and summary
+        recipients (list): Email addresses to send to. Defaults to NEWS_TO_EMAILS.
+
+    Returns:
+        list or None: One delivery result per recipient, or None if there was nothing to send.
     """
     try:
         # Build HTML content for all articles
@@ -212,7 +519,7 @@ def send_daily_summary_email(articles):
                 articles_html += f"""
                 <div style="margin-bottom: 30px;">
                     <h2>{article['title']}</h2>
-                    <p><strong>Published:</strong> {article['published_at']}</p>
+                    <p><strong>Published:</strong> {article['published_at']}{f" ({article['source']})" if article.get('source') else ''}</p>
                     <p><strong>Summary:</strong></p>
                     <p>{article['summary']}</p>
                     <p><a href="{article['url']}">Read full article</a></p>
@@ -230,35 +537,45 @@ def send_daily_summary_email(articles):
         {articles_html}
         """
 
-        params = {
-            "from": "AI News <onboarding@resend.dev>",
-            "to": ["vinoddevopscloud99@gmail.com"],
-            "subject": f"TechCrunch Daily News Summary - {datetime.now().strftime('%Y-%m-%d')}",
-            "html": html_content
-        }
-
-        response = resend.Emails.send(params)
-        logging.info("Daily summary email sent successfully")
-        return response
+        subject = f"TechCrunch Daily News Summary - {datetime.now().strftime('%Y-%m-%d')}"
+        results = EmailDispatcher().send([
+            {
+                "from": NEWS_FROM_EMAIL,
+                "to": [recipient],
+                "subject": subject,
+                "html": html_content
+            }
+            for recipient in (recipients or NEWS_TO_EMAILS)
+        ])
+        sent = sum(result['status'] == 'sent' for result in results)
+        logging.info(f"Daily summary email sent to {sent} of {len(results)} recipients")
+        unconfirmed = sum(result['status'] == 'unconfirmed' for result in results)
+        run_metrics.count("emails_sent", sent)
+        run_metrics.count("emails_failed", len(results) - sent - unconfirmed)
+        run_metrics.count("emails_unconfirmed", unconfirmed)
+        return results
     except Exception as e:
         logging.error(f"Failed to send daily summary email: {e}")
+        run_metrics.count("email_failures")
         return None
 
-def process_article(article, existing_urls, force_update=False):
+def process_article(article, existing_urls, force_update=False, store=None):
     """
-    Processes a single article: checks for duplicates, extracts content, and summarizes it.
+    Processes a single article through the same stages as a full run (download, extract,
+    near-duplicate check, summarize), one after another on the calling thread.
 
     Args:
         article (dict): Article metadata.
         existing_urls (set): Set of URLs already processed.
         force_update (bool): Whether to force reprocessing of existing articles.
+        store (ArticleStore): Store searched for near-duplicates (default: the configured database).
 
     Returns:
-        dict or None: Article dictionary with content and summary added, or None if duplicate/extraction failed.
+        dict or None: Article dictionary with content and summary added (no summary when extraction
+        or summarization failed, or a near-duplicate's when it was reused), or None if it is a duplicate.
     """
     title = article['title']
     url = article['url']
-    published_at = article['published_at']
 
     if url in existing_urls and not force_update:
         logging.info(f"Article already exists. Skipping: {title}")
@@ -266,109 +583,140 @@ def process_article(article, existing_urls, force_update=False):
 
     logging.info(f"Processing Article: {title}")
 
-    # Extract content
-    content = extract_article_content(url)
-    if not content:
-        logging.warning(f"Skipping article due to extraction failure: {title}")
-        article['content'] = None
-        article['summary'] = None
-        return article
-
-    # Summarize content
-    summary = summarize_text(content, stream=False)  # Choose stream=True if needed
-    if not summary:
-        logging.warning(f"Summarization failed for article: {title}")
-        article['summary'] = None
-    else:
-        article['summary'] = summary
-
-    # Add content to the article
-    article['content'] = content
-
-    # After successful summarization, send email
-    if article.get('summary'):
-        logging.info(f"Generated summary for article: {title}")
-
+    for stage in build_article_pipeline(store or ArticleStore()).stages:
+        article, passed = stage.process(article)
+        if not passed:
+            break
+    article.pop('_document', None)
     return article
 
-def summarize_stored_articles(filename=OUTPUT_FILE):
+def summarize_stored_article(store, item):
     """
-    Reads and summarizes articles from the stored JSON file that don't have summaries.
+    Backlog stage: loads one stored article's text and summarizes it.
 
     Args:
-        filename (str): The JSON file containing the articles.
+        store (ArticleStore): The article store.
+        item (dict): Backlog entry with url and title.
+
+    Returns:
+        dict: The entry with `summary` set (None if summarization failed).
     """
-    try:
-        # Load the articles
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            articles = data.get('articles', [])
+    item['summary'] = summarize_text(store.get_content(item['url']))
+    return item
 
-        updated = False
-        for article in articles:
-            # Skip if article already has a summary or no content
-            if article.get('summary') or not article.get('content'):
-                continue
-
-            # Generate summary using Groq
-            summary = summarize_text(article['content'])
-            if summary:
-                article['summary'] = summary
-                updated = True
-                logging.info(f"Generated summary for article: {article['title']}")
-
-        # Save updated articles if any changes were made
-        if updated:
-            save_articles(articles)
-            logging.info("Saved updated articles with new summaries")
+def summarize_stored_articles(store):
+    """
+    Drains the summarization backlog: stored articles with content but no summary.
 
-    except Exception as e:
-        logging.error(f"Error processing stored articles: {e}")
+    Articles are summarized concurrently (MAX_SUMMARY_WORKERS, under the Groq rate limit) and each
+    result is checkpointed as soon as it completes, so an interrupted run resumes where it left off.
 
-def main():
-    # Step 1: Load existing articles to prevent duplicates
-    existing_articles = load_existing_articles()
-    existing_urls = {article['url'] for article in existing_articles}
-    logging.info(f"Loaded {len(existing_articles)} existing articles.")
+    Args:
+        store (ArticleStore): The article store.
+    """
+    backlog = [
+        {'url': url, 'title': title, 'summary': None}
+        for url, title in store.pending_summaries(max_attempts=SUMMARY_MAX_ATTEMPTS)
+    ]
+    if not backlog:
+        return
+    logging.info(f"Summarizing {len(backlog)} stored articles without a summary.")
+
+    pipeline = Pipeline([
+        Stage('backlog', lambda item: summarize_stored_article(store, item), MAX_SUMMARY_WORKERS),
+    ])
+    completed = 0
+    with run_metrics.stage('backlog'):
+        for item in pipeline.run(backlog):
+            store.set_summary(item['url'], item['summary'])
+            if item['summary']:
+                completed += 1
+                logging.info(f"Generated summary for article: {item['title']}")
+    pipeline.log_stats()
+    logging.info(f"Summarized {completed} of {len(backlog)} backlog articles.")
+    run_metrics.count("backlog_summaries", completed)
+    run_metrics.count("backlog_failures", len(backlog) - completed)
+    run_metrics.set("backlog_pipeline", pipeline.summaries())
 
-    # Step 2: Fetch latest TechCrunch articles
-    fetched_articles = fetch_techcrunch_articles()
+def main():
+    # Step 1: Open the article store (importing the legacy JSON file on first run)
+    store = ArticleStore()
+    store.migrate_json(OUTPUT_FILE)
+    store.backfill_fingerprints()
+
+    # Step 2: Fetch latest articles from every feed (unchanged feeds return nothing)
+    with run_metrics.stage('fetch'):
+        feeds = load_feeds()
+        fetched_articles, feed_state = fetch_articles(feeds, load_feed_state())
+    run_metrics.count("feeds", len(feeds))
+    run_metrics.count("articles_fetched", len(fetched_articles))
     if not fetched_articles:
-        logging.error("No articles fetched. Exiting.")
+        logging.info("No new feed entries. Exiting.")
+        save_feed_state(feed_state)
         return
 
-    # Step 3: Process articles in parallel to extract content and summarize
+    # Look up only the fetched URLs to prevent duplicates
+    existing_urls = store.known_urls(article['url'] for article in fetched_articles)
+    logging.info(f"{len(existing_urls)} of {len(fetched_articles)} fetched articles are already stored.")
+
+    new_articles = [article for article in fetched_articles if article['url'] not in existing_urls]
+    run_metrics.count("articles_new", len(new_articles))
+
+    # Step 3: Download, extract, skip near-duplicates and summarize in separate stages,
+    # storing each article as it finishes
+    pipeline = build_article_pipeline(store)
     processed_articles = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_article = {
-            executor.submit(process_article, article, existing_urls): article for article in fetched_articles
-        }
-        for future in as_completed(future_to_article):
-            result = future.result()
-            if result:
-                processed_articles.append(result)
-                # Display the summary for each processed article
-                if result.get('summary'):
-                    logging.info(f"\nArticle: {result['title']}")
-                    logging.info(f"Summary: {result['summary']}\n")
+    with run_metrics.stage('pipeline'):
+        for article in pipeline.run(new_articles):
+            article.pop('_document', None)
+            store.add([article])
+            processed_articles.append(article)
+            # Full summaries only at (sampled) DEBUG level; the pipeline already logs each title
+            if article.get('summary'):
+                logging.debug(f"Summary of {article['title']}: {article['summary']}")
+    pipeline.log_stats()
+    logging.info(f"Summary cache: {summary_cache.stats()}")
+    duplicates = sum(1 for article in processed_articles if article.get('duplicate_of'))
+    summarized = sum(1 for article in processed_articles if article.get('summary'))
+    run_metrics.count("articles_processed", len(processed_articles))
+    run_metrics.count("summaries", summarized - duplicates)
+    run_metrics.count("duplicates", duplicates)
+    run_metrics.count("summary_failures", len(processed_articles) - summarized)
+    run_metrics.set("pipeline", pipeline.summaries())
+    run_metrics.set("summary_cache", summary_cache.stats())
+    logging.info(
+        f"Near-duplicates (within {NEAR_DUPLICATE_MAX_DISTANCE} of 64 SimHash bits): "
+        f"{duplicates} articles reused a stored summary, saving {duplicates} Groq calls."
+    )
 
     if not processed_articles:
         logging.info("No new articles were processed.")
+        save_feed_state(feed_state)
         return
 
-    # Step 4: Combine existing and new articles
-    combined_articles = existing_articles + processed_articles
-    logging.info(f"Total articles after combining: {len(combined_articles)}.")
+    # Step 4: Remember the feed validators now that the new articles are stored
+    save_feed_state(feed_state)
+    logging.info(f"Total articles stored: {store.count()}.")
 
-    # Step 5: Save combined articles to JSON
-    save_articles(combined_articles)
-    
-    # Step 6: Generate summaries for any articles missing them
-    summarize_stored_articles()
+    # Step 5: Generate summaries for any articles missing them
+    summarize_stored_articles(store)
 
-    # Step 7: Send single email with all new article summaries
+    # Step 6: Send single email with all new article summaries
     if processed_articles:
-        send_daily_summary_email(processed_articles)
+        with run_metrics.stage('email'):
+            send_daily_summary_email(processed_articles)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch, summarize and email the latest tech news.")
+    parser.add_argument('--backlog-only', action='store_true',
+                        help="Only summarize stored articles that are missing a summary")
+    args = parser.parse_args()
+    with run_metrics:
+        try:
+            if args.backlog_only:
+                summarize_stored_articles(ArticleStore())
+            else:
+                main()
+        finally:
+            # Also on failure, which is when the LLM counts matter most
+            run_metrics.set("llm", dict(llm.stats))
@@ -0,0 +1,265 @@
+# article_store.py
+
+"""
+Indexed SQLite store for processed news articles.
+
+Article metadata (title, URL, source, publish date, summary) lives in the
+`articles` table, keyed by URL, so duplicate checks are point lookups. The full
+extracted text is kept zlib-compressed in a separate `contents` table and is
+only read when a caller asks for it. New articles are inserted; nothing is ever
+rewritten wholesale, so run time and memory stay flat as the history grows.
+
+Each article with content also gets a SimHash fingerprint (see
+`fingerprints`), indexed by band, so near-duplicates of stored articles are
+found without scanning the table.
+
+`migrate_json` imports the legacy `techcrunch_articles.json` file once.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import datetime
+
+import fingerprints
+
+ARTICLES_DB = os.getenv('ARTICLES_DB', 'articles.db')
+
+
+def _pack(text):
+    return zlib.compress(text.encode('utf-8')) if text else None
+
+
+def _unpack(blob):
+    return zlib.decompress(blob).decode('utf-8') if blob else None
+
+
+class ArticleStore:
+    def __init__(self, path=ARTICLES_DB):
+        self.path = path
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    published_at TEXT,
+                    source TEXT,
+                    summary TEXT,
+                    has_content INTEGER NOT NULL DEFAULT 0,
+                    stored_at TEXT NOT NULL,
+                    summary_attempts INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS contents (
+                    url TEXT PRIMARY KEY REFERENCES articles(url) ON DELETE CASCADE,
+                    content BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS articles_pending_summary
+                    ON articles (stored_at) WHERE summary IS NULL AND has_content = 1;
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    url TEXT PRIMARY KEY REFERENCES articles(url) ON DELETE CASCADE,
+                    simhash INTEGER NOT NULL,
+                    band0 INTEGER NOT NULL,
+                    band1 INTEGER NOT NULL,
+                    band2 INTEGER NOT NULL,
+                    band3 INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS fingerprints_band0 ON fingerprints (band0);
+                CREATE INDEX IF NOT EXISTS fingerprints_band1 ON fingerprints (band1);
+                CREATE INDEX IF NOT EXISTS fingerprints_band2 ON fingerprints (band2);
+                CREATE INDEX IF NOT EXISTS fingerprints_band3 ON fingerprints (band3);
+            """)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(articles)")}
+            if 'summary_attempts' not in columns:
+                db.execute("ALTER TABLE articles ADD COLUMN summary_attempts INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    def count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def known_urls(self, urls):
+        """
+        Returns the subset of `urls` that are already stored.
+
+        Args:
+            urls (iterable): Candidate article URLs.
+
+        Returns:
+            set: URLs already in the store.
+        """
+        urls = list(urls)
+        known = set()
+        with self._connect() as db:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                known.update(
+                    row[0] for row in db.execute(f"SELECT url FROM articles WHERE url IN ({placeholders})", chunk)
+                )
+        return known
+
+    def add(self, articles):
+        """
+        Inserts (or replaces) articles; each article's `content`, if any, goes to the contents table.
+
+        Args:
+            articles (list): Article dictionaries with title, url, published_at and optionally
+                source, summary and content.
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as db:
+            for article in articles:
+                content = article.get('content')
+                db.execute(
+                    "INSERT OR REPLACE INTO articles "
+                    "(url, title, published_at, source, summary, has_content, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (article['url'], article['title'], article.get('published_at'), article.get('source'),
+                     article.get('summary'), int(bool(content)), article.get('stored_at') or now),
+                )
+                if content:
+                    db.execute("INSERT OR REPLACE INTO contents VALUES (?, ?)", (article['url'], _pack(content)))
+                    fingerprint = article.get('simhash')
+                    self._put_fingerprint(db, article['url'], fingerprint if fingerprint is not None else fingerprints.simhash(content))
+                else:
+                    db.execute("DELETE FROM contents WHERE url = ?", (article['url'],))
+                    db.execute("DELETE FROM fingerprints WHERE url = ?", (article['url'],))
+        logging.info(f"Stored {len(articles)} articles in {self.path}.")
+
+    def get(self, url, with_content=False):
+        """
+        Returns the article stored under `url` (with its full text if `with_content`), or None.
+        """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM articles WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            article = dict(row)
+            if with_content:
+                article['content'] = self._content(db, url)
+        return article
+
+    def get_content(self, url):
+        """
+        Loads an article's full text on demand.
+        """
+        with self._connect() as db:
+            return self._content(db, url)
+
+    def _content(self, db, url):
+        row = db.execute("SELECT content FROM contents WHERE url = ?", (url,)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def pending_summaries(self, max_attempts=None, limit=None):
+        """
+        The summarization backlog: (url, title) for articles that have content but no summary, oldest first.
+
+        Args:
+            max_attempts (int): Skip articles whose summarization already failed this many times.
+            limit (int): Return at most this many articles.
+        """
+        query = "SELECT url, title FROM articles WHERE summary IS NULL AND has_content = 1"
+        params = []
+        if max_attempts is not None:
+            query += " AND summary_attempts < ?"
+            params.append(max_attempts)
+        query += " ORDER BY stored_at"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as db:
+            return db.execute(query, params).fetchall()
+
+    def set_summary(self, url, summary):
+        """
+        Checkpoints a summary; a None summary records a failed attempt instead.
+        """
+        with self._connect() as db:
+            if summary:
+                db.execute("UPDATE articles SET summary = ? WHERE url = ?", (summary, url))
+            else:
+                db.execute("UPDATE articles SET summary_attempts = summary_attempts + 1 WHERE url = ?", (url,))
+
+    def _put_fingerprint(self, db, url, fingerprint):
+        db.execute(
+            "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?)",
+            (url, fingerprints.to_signed(fingerprint), *fingerprints.bands(fingerprint)),
+        )
+
+    def find_near_duplicate(self, fingerprint, max_distance=fingerprints.BANDS - 1, exclude_url=None):
+        """
+        Finds the closest already-summarized article whose fingerprint is within `max_distance` bits.
+
+        Candidates come from band lookups, which find every match up to BANDS - 1 bits; larger
+        distances are best effort.
+
+        Args:
+            fingerprint (int): SimHash of the article being checked.
+            max_distance (int): Largest Hamming distance that counts as a near-duplicate.
+            exclude_url (str): Don't match this URL (the article itself).
+
+        Returns:
+            tuple or None: (url, title, summary, distance) of the closest match, or None.
+        """
+        band_values = fingerprints.bands(fingerprint)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT f.url, f.simhash, a.title, a.summary FROM fingerprints f JOIN articles a ON a.url = f.url "
+                "WHERE (f.band0 = ? OR f.band1 = ? OR f.band2 = ? OR f.band3 = ?) AND a.summary IS NOT NULL",
+                band_values,
+            ).fetchall()
+        matches = [
+            (url, title, summary, fingerprints.hamming_distance(fingerprint, fingerprints.from_signed(value)))
+            for url, value, title, summary in rows
+            if url != exclude_url
+        ]
+        matches = [match for match in matches if match[3] <= max_distance]
+        return min(matches, key=lambda match: match[3]) if matches else None
+
+    def backfill_fingerprints(self, batch_size=200):
+        """
+        Fingerprints stored articles that predate the fingerprint index; returns how many were added.
+        """
+        added = 0
+        while True:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT c.url, c.content FROM contents c LEFT JOIN fingerprints f ON f.url = c.url "
+                    "WHERE f.url IS NULL LIMIT ?",
+                    (batch_size,),
+                ).fetchall()
+                for url, blob in rows:
+                    self._put_fingerprint(db, url, fingerprints.simhash(_unpack(blob)))
+            added += len(rows)
+            if len(rows) < batch_size:
+                break
+        if added:
+            logging.info(f"Fingerprinted {added} previously stored articles.")
+        return added
+
+    def migrate_json(self, filename):
+        """
+        Imports articles from the legacy JSON file, then renames it so the import runs only once.
+
+        Args:
+            filename (str): Path of the legacy `{"articles": [...]}` file.
+
+        Returns:
+            int: Number of articles imported.
+        """
+        if not os.path.exists(filename):
+            return 0
+        with open(filename, 'r') as f:
+            articles = [a for a in json.load(f).get('articles', []) if a.get('url') and a.get('title')]
+        self.add(articles)
+        os.replace(filename, f"{filename}.migrated")
+        logging.info(f"Migrated {len(articles)} articles from {filename} to {self.path}.")
+        return len(articles)
@@ -0,0 +1,81 @@
+# fingerprints.py
+
+"""
+SimHash fingerprints for near-duplicate article detection.
+
+A 64-bit SimHash of an article's word shingles changes by only a few bits when
+the text is lightly edited (syndicated copies, updated stories), so near
+duplicates are fingerprints within a small Hamming distance. For fast lookups
+the fingerprint is also split into `BANDS` 16-bit bands: two fingerprints that
+differ in at most `BANDS - 1` bits must agree on at least one band, so
+candidates are found with indexed equality lookups on the bands.
+"""
+
+import hashlib
+import re
+
+BITS = 64
+BANDS = 4
+BAND_BITS = BITS // BANDS
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(text):
+    """
+    The distinct word 3-shingles of the text (one shingle for texts shorter than three words).
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def simhash(text):
+    """
+    Returns the 64-bit SimHash of the text's word 3-shingles (0 for empty text).
+
+    Short texts have too few shingles for the fingerprint to say much: unrelated
+    stubs ("Sign up for our newsletter") can land within a few bits of each other.
+    """
+    weights = [0] * BITS
+    for shingle in shingles(text):
+        value = _hash(shingle)
+        for bit in range(BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(BITS) if weights[bit] > 0)
+
+
+def normalized_words(text):
+    """
+    Lowercased words joined by single spaces, for comparing titles and texts loosely.
+    """
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def bands(fingerprint):
+    """
+    The fingerprint's `BANDS` 16-bit bands, lowest first.
+    """
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (BAND_BITS * i) & mask for i in range(BANDS)]
+
+
+def to_signed(fingerprint):
+    """
+    SQLite integers are signed 64-bit.
+    """
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def from_signed(value):
+    return value + (1 << BITS) if value < 0 else value
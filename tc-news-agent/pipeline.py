@@ -0,0 +1,156 @@
+# pipeline.py
+
+"""
+A small multi-stage worker pipeline.
+
+Each stage has its own pool of worker threads and its own input queue, so a
+slow stage (e.g. downloads) never takes workers away from another (e.g. LLM
+calls). Items flow through the stages in order and are yielded as soon as they
+leave the pipeline, in completion order:
+
+    pipeline = Pipeline([
+        Stage("download", download, workers=8),
+        Stage("extract", extract, workers=2),
+        Stage("summarize", summarize, workers=4),
+    ])
+    for item in pipeline.run(items):
+        store(item)
+    pipeline.log_stats()
+
+A stage function receives an item and returns the item to pass on. Returning
+None, or raising, ends that item's journey early: it is yielded as it was.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'items': 0, 'passed': 0, 'dropped': 0, 'failed': 0, 'busy_s': 0.0,
+                      'first_start': None, 'last_end': None}
+
+    def process(self, item):
+        """
+        Runs the stage function on one item; returns (item, passed).
+        """
+        start = time.perf_counter()
+        try:
+            result = self.fn(item)
+            outcome = 'passed' if result is not None else 'dropped'
+        except Exception as e:
+            logging.error(f"Stage '{self.name}' failed: {e}")
+            result, outcome = None, 'failed'
+        end = time.perf_counter()
+        with self.lock:
+            stats = self.stats
+            stats['items'] += 1
+            stats[outcome] += 1
+            stats['busy_s'] += end - start
+            stats['first_start'] = start if stats['first_start'] is None else min(stats['first_start'], start)
+            stats['last_end'] = end if stats['last_end'] is None else max(stats['last_end'], end)
+        return (result, True) if result is not None else (item, False)
+
+    def summary(self):
+        """
+        Item counts, throughput over the stage's active window and mean time per item.
+        """
+        with self.lock:
+            stats = dict(self.stats)
+        window = (stats['last_end'] - stats['first_start']) if stats['items'] else 0.0
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'items': stats['items'],
+            'passed': stats['passed'],
+            'dropped': stats['dropped'],
+            'failed': stats['failed'],
+            'items_per_s': stats['items'] / window if window > 0 else 0.0,
+            'mean_s': stats['busy_s'] / stats['items'] if stats['items'] else 0.0,
+        }
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self.stages = stages
+
+    def run(self, items):
+        """
+        Feeds `items` through every stage; yields each item once, in completion order.
+        """
+        items = list(items)
+        if not items:
+            return
+        queues = [queue.Queue() for _ in self.stages]
+        results = queue.Queue()
+
+        def work(index):
+            stage = self.stages[index]
+            while (item := queues[index].get()) is not _DONE:
+                item, passed = stage.process(item)
+                if passed and index + 1 < len(self.stages):
+                    queues[index + 1].put(item)
+                else:
+                    results.put(item)
+
+        threads = [
+            threading.Thread(target=work, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for stage in self.stages:
+            stage.reset_stats()
+        for thread in threads:
+            thread.start()
+        for item in items:
+            queues[0].put(item)
+        try:
+            for _ in items:
+                yield results.get()
+        finally:
+            for stage_queue, stage in zip(queues, self.stages):
+                for _ in range(stage.workers):
+                    stage_queue.put(_DONE)
+
+    def summaries(self):
+        return [stage.summary() for stage in self.stages]
+
+    def log_stats(self):
+        for summary in self.summaries():
+            logging.info(
+                f"Stage {summary['stage']} ({summary['workers']} workers): {summary['items']} items, "
+                f"{summary['passed']} passed, {summary['dropped']} dropped, {summary['failed']} failed, "
+                f"{summary['items_per_s']:.2f} items/s, {summary['mean_s']:.2f}s per item"
+            )
+
+
+class PerHostLimiter:
+    """
+    Caps concurrent requests to any single host.
+
+        with limiter.limit(url):
+            download(url)
+    """
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.per_host))
+        self._lock = threading.Lock()
+
+    def limit(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            return self._semaphores[host]
@@ -0,0 +1,113 @@
+# summary_cache.py
+
+"""
+On-disk cache of article summaries keyed by what produced them.
+
+The key is a SHA-256 over the model name, the prompt version and the article
+text, so re-processing unchanged text never reaches the LLM, while switching
+model or editing a prompt (which changes the prompt version) misses
+automatically. Summaries are stored zlib-compressed in a small SQLite file.
+When the file grows past `max_bytes`, the least recently used entries go first.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+SUMMARY_CACHE_DB = os.getenv('SUMMARY_CACHE_DB', 'summary_cache.db')
+SUMMARY_CACHE_MAX_MB = float(os.getenv('SUMMARY_CACHE_MAX_MB', '50'))  # 0 disables the cache
+
+
+def prompt_version(*parts):
+    """
+    A short fingerprint of everything that shapes a summary besides the model (prompt templates,
+    chunking limits), for use as the cache's prompt version.
+    """
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()[:16]
+
+
+class SummaryCache:
+    def __init__(self, path=SUMMARY_CACHE_DB, max_bytes=int(SUMMARY_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            with self._connect() as db:
+                db.executescript("""
+                    CREATE TABLE IF NOT EXISTS summaries (
+                        key BLOB PRIMARY KEY,
+                        summary BLOB NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL
+                    ) WITHOUT ROWID;
+                    CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used);
+                """)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @staticmethod
+    def key(model, version, content):
+        digest = hashlib.sha256()
+        for part in (model, version, content):
+            digest.update(part.encode('utf-8'))
+            digest.update(b"\x1f")
+        return digest.digest()
+
+    def get(self, model, version, content):
+        """
+        Returns the cached summary for this model, prompt version and text, or None.
+        """
+        if not self.enabled:
+            return None
+        key = self.key(model, version, content)
+        with self._connect() as db:
+            row = db.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row:
+                db.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def put(self, model, version, content, summary):
+        """
+        Stores a summary, then evicts least recently used entries beyond `max_bytes`.
+        """
+        if not self.enabled or not summary:
+            return
+        blob = zlib.compress(summary.encode('utf-8'))
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                (self.key(model, version, content), blob, len(blob), time.time()),
+            )
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+            if total > self.max_bytes:
+                evicted = 0
+                for key, size in db.execute("SELECT key, size FROM summaries ORDER BY last_used").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    db.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    total -= size
+                    evicted += 1
+                logging.debug(f"Evicted {evicted} cached summaries to stay under {self.max_bytes} bytes.")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -1,24 +1,30 @@
 import os
+import sys
 import resend
 import http.client
 import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote  # Import for URL encoding
-from resend.exceptions import ResendError
 from dotenv import load_dotenv
 import logging
-from groq import Groq
+from weather_cache import ForecastCache, SuggestionCache, normalize_location
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.email_dispatch import EmailDispatcher
+from common import usage_ledger
+from common.llm_gateway import gateway
+from common.log_setup import setup_logging
+from common.run_metrics import RunMetrics
 
 # -------------------------------------------------------------
 # 1. Configure Logging
 # -------------------------------------------------------------
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("email_sender.log"),
-        logging.StreamHandler()
-    ]
-)
+# Written by a background thread to a size-rotated file; DEBUG records are sampled
+setup_logging("email_sender.log", level=logging.DEBUG)
+
+# Stage durations and counts of this run, emitted as one record when it ends
+run_metrics = RunMetrics("weather")
 
 # -------------------------------------------------------------
 # 2. Load Environment Variables from .env
@@ -32,11 +38,20 @@ RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
 LOCATION = os.getenv("LOCATION", "London")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# Recipients and their locations; when the file is absent, TO_EMAIL gets LOCATION
+SUBSCRIPTIONS_FILE = os.getenv("SUBSCRIPTIONS_FILE", "subscriptions.json")
+# Locations fetched (and summarized) in parallel, and kept-alive API connections
+MAX_CONCURRENT_LOCATIONS = int(os.getenv("MAX_CONCURRENT_LOCATIONS", "8"))
+
+WEATHER_API_HOST = "weatherapi-com.p.rapidapi.com"
+
 # Validate essential environment variables
 missing_vars = []
-for var_name, var_value in [("RESEND_API_KEY", RESEND_API_KEY), ("FROM_EMAIL", FROM_EMAIL), ("TO_EMAIL", TO_EMAIL), ("RAPIDAPI_KEY", RAPIDAPI_KEY), ("GROQ_API_KEY", GROQ_API_KEY)]:
+for var_name, var_value in [("RESEND_API_KEY", RESEND_API_KEY), ("FROM_EMAIL", FROM_EMAIL), ("RAPIDAPI_KEY", RAPIDAPI_KEY), ("GROQ_API_KEY", GROQ_API_KEY)]:
     if not var_value:
         missing_vars.append(var_name)
+if not TO_EMAIL and not os.path.exists(SUBSCRIPTIONS_FILE):
+    missing_vars.append(f"TO_EMAIL (or a {SUBSCRIPTIONS_FILE} file)")
 
 if missing_vars:
     logging.critical(f"Missing environment variables: {', '.join(missing_vars)}. Please check your .env file.")
@@ -47,31 +62,134 @@ resend.api_key = RESEND_API_KEY
 # -------------------------------------------------------------
 # 3. Groq Client Initialization
 # -------------------------------------------------------------
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Pooled, limited to GROQ_REQUESTS_PER_MINUTE, and identical in-flight prompts share one call
+llm = gateway("groq")
+usage_ledger.set_agent("weather")
+SUGGESTION_MODEL = "llama-3.3-70b-versatile"
 
 # -------------------------------------------------------------
-# 4. Get Weather Information
+# 4. Subscriptions
 # -------------------------------------------------------------
-def get_tomorrow_weather():
+def load_subscriptions():
+    """
+    Loads the recipient -> locations mapping from SUBSCRIPTIONS_FILE:
+
+        {"subscribers": [{"email": "a@example.com", "locations": ["London", "Paris"]}]}
+
+    Falls back to a single TO_EMAIL subscriber for LOCATION when the file does not exist.
+    """
+    if not os.path.exists(SUBSCRIPTIONS_FILE):
+        return [{"email": TO_EMAIL, "locations": [LOCATION]}]
+    with open(SUBSCRIPTIONS_FILE, "r") as f:
+        subscribers = json.load(f).get("subscribers", [])
+    return [s for s in subscribers if s.get("email") and s.get("locations")]
+
+# -------------------------------------------------------------
+# 5. Get Weather Information
+# -------------------------------------------------------------
+# What a request on a keep-alive connection the server has already closed fails with
+STALE_CONNECTION_ERRORS = (http.client.BadStatusLine, ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+class HTTPSConnectionPool:
+    """
+    A small thread-safe pool of keep-alive connections to one host.
+    """
+    def __init__(self, host, size):
+        self.host = host
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def request(self, method, url, headers=None):
+        """
+        Sends a request on a pooled connection and returns (status, body).
+
+        A kept-alive connection may have been closed by the server since its last use; if a
+        reused connection fails that way, the request is sent once more on a new connection.
+        Only use this for idempotent requests.
+        """
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+        try:
+            status, body = self._exchange(conn, method, url, headers)
+        except STALE_CONNECTION_ERRORS as e:
+            conn.close()
+            if not reused:
+                raise
+            logging.debug(f"Pooled connection to {self.host} was closed ({e!r}); retrying on a new one")
+            conn = self._connect()
+            try:
+                status, body = self._exchange(conn, method, url, headers)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return status, body
+
+    def _connect(self):
+        return http.client.HTTPSConnection(self.host, timeout=30)
+
+    @staticmethod
+    def _exchange(conn, method, url, headers):
+        conn.request(method, url, headers=headers or {})
+        res = conn.getresponse()
+        return res.status, res.read()  # the body must be drained before the connection is reused
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+weather_pool = HTTPSConnectionPool(WEATHER_API_HOST, MAX_CONCURRENT_LOCATIONS)
+
+forecast_cache = ForecastCache()
+
+def fetch_tomorrow_forecastday(location):
+    """
+    Calls RapidAPI's WeatherAPI and returns tomorrow's raw `forecastday` payload and the location's time zone.
+    """
+    headers = {
+        'x-rapidapi-key': RAPIDAPI_KEY,
+        'x-rapidapi-host': WEATHER_API_HOST
+    }
+    
+    encoded_location = quote(location)
+    endpoint = f"/forecast.json?q={encoded_location}&days=2"
+    status, data = weather_pool.request("GET", endpoint, headers=headers)
+    if status != 200:
+        raise RuntimeError(f"WeatherAPI returned HTTP {status}: {data[:200]!r}")
+    weather_data = json.loads(data.decode("utf-8"))
+    return weather_data["forecast"]["forecastday"][1], weather_data.get("location", {}).get("tz_id")
+
+def get_tomorrow_weather(location=LOCATION):
     """
     Fetches the weather forecast for tomorrow using RapidAPI's WeatherAPI.
+
+    Serves from the forecast cache until the provider's next update, and falls back to
+    stale cached data if the API call fails.
     """
     try:
-        conn = http.client.HTTPSConnection("weatherapi-com.p.rapidapi.com")
-        headers = {
-            'x-rapidapi-key': RAPIDAPI_KEY,
-            'x-rapidapi-host': "weatherapi-com.p.rapidapi.com"
-        }
-        
-        encoded_location = quote(LOCATION)
-        endpoint = f"/forecast.json?q={encoded_location}&days=2"
-        conn.request("GET", endpoint, headers=headers)
-        
-        res = conn.getresponse()
-        data = res.read()
-        weather_data = json.loads(data.decode("utf-8"))
+        tomorrow_forecast = forecast_cache.get(location)
+        if tomorrow_forecast is not None:
+            logging.info(f"Using cached forecast for {location}")
+            run_metrics.count("forecast_cache_hits")
+        else:
+            try:
+                run_metrics.count("weather_api_calls")
+                tomorrow_forecast, tz_id = fetch_tomorrow_forecastday(location)
+                forecast_cache.put(location, tomorrow_forecast, tz_id)
+            except Exception as e:
+                tomorrow_forecast = forecast_cache.get(location, allow_stale=True)
+                if tomorrow_forecast is None:
+                    raise
+                run_metrics.count("stale_forecasts")
+                logging.warning(f"WeatherAPI failed for {location} ({e}); using stale cached forecast")
 
-        tomorrow_forecast = weather_data["forecast"]["forecastday"][1]
         date = tomorrow_forecast["date"]
         condition = tomorrow_forecast["day"]["condition"]["text"]
         avg_temp_c = tomorrow_forecast["day"]["avgtemp_c"]
@@ -89,102 +207,167 @@ def get_tomorrow_weather():
         }
 
     except Exception as e:
-        logging.error(f"Failed to fetch weather data: {e}")
+        logging.error(f"Failed to fetch weather data for {location}: {e}")
+        run_metrics.count("forecast_failures")
         return None
 
 # -------------------------------------------------------------
-# 5. Get Outdoor Activity Suggestions using Groq
+# 6. Get Outdoor Activity Suggestions using Groq
 # -------------------------------------------------------------
-def get_activity_suggestions(weather_info):
+suggestion_cache = SuggestionCache()
+
+def get_activity_suggestions(weather_info, location=LOCATION):
     """
     Generates outdoor activity suggestions based on weather conditions using Groq Cloud's LLM.
+
+    Suggestions are reused for the same location and weather situation (condition plus
+    temperature, wind and humidity bands), so similar days don't trigger a new LLM call.
     """
+    cached = suggestion_cache.get(location, weather_info)
+    if cached is not None:
+        logging.info(f"Using cached activity suggestions for {location}")
+        run_metrics.count("suggestion_cache_hits")
+        usage_ledger.record("groq", SUGGESTION_MODEL, cache="suggestion_cache", stage="activity_suggestions")
+        return cached
+
     try:
-        chat_completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an assistant that suggests outdoor activities based on the weather conditions."
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Based on the following weather forecast, suggest 3 suitable outdoor activities:\n\n"
-                        f"- Location: {LOCATION}\n"
-                        f"- Date: {weather_info['date']}\n"
-                        f"- Weather Condition: {weather_info['condition']}\n"
-                        f"- Average Temperature: {weather_info['avg_temp_c']}°C / {weather_info['avg_temp_f']}°F\n"
-                        f"- Humidity: {weather_info['humidity']}%\n"
-                        f"- Max Wind Speed: {weather_info['max_wind_kph']} kph\n\n"
-                        "Provide the suggestions as a list."
-                    )
-                }
-            ],
-            temperature=0.5,
-            max_tokens=1024,
-            top_p=1,
-            stop=None,
-            stream=False
-        )
+        with usage_ledger.tag(stage="activity_suggestions"):
+            chat_completion = llm.chat(
+                model=SUGGESTION_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an assistant that suggests outdoor activities based on the weather conditions."
+                    },
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Based on the following weather forecast, suggest 3 suitable outdoor activities:\n\n"
+                            f"- Location: {location}\n"
+                            f"- Weather Condition: {weather_info['condition']}\n"
+                            f"- Average Temperature: {weather_info['avg_temp_c']}°C / {weather_info['avg_temp_f']}°F\n"
+                            f"- Humidity: {weather_info['humidity']}%\n"
+                            f"- Max Wind Speed: {weather_info['max_wind_kph']} kph\n\n"
+                            "Provide the suggestions as a list."
+                        )
+                    }
+                ],
+                temperature=0.5,
+                max_tokens=1024,
+                top_p=1,
+                stop=None
+            )
 
         activities = chat_completion.choices[0].message.content.strip()
+        suggestion_cache.put(location, weather_info, activities)
         return activities
 
     except Exception as e:
         logging.error(f"Groq Cloud API Error: {e}")
+        run_metrics.count("suggestion_failures")
         return "Unable to provide activity suggestions at this time."
 
 # -------------------------------------------------------------
-# 6. Send Email
+# 7. Build Per-Location Reports
 # -------------------------------------------------------------
-def send_email():
+def build_location_report(location):
     """
-    Sends an email using the Resend service with an HTML body containing weather info and activity suggestions.
+    Fetches the forecast and activity suggestions for one location and renders its HTML section.
     """
-    weather_info = get_tomorrow_weather()
+    weather_info = get_tomorrow_weather(location)
     if not weather_info:
-        weather_info_html = "<p>Unable to fetch weather data at this time.</p>"
-        activity_suggestions_html = ""
-    else:
-        weather_info_html = f"""
-        <h2>Tomorrow's Weather in {LOCATION} ({weather_info['date']})</h2>
+        return f"<p>Unable to fetch weather data for {location} at this time.</p>"
+
+    weather_info_html = f"""
+        <h2>Tomorrow's Weather in {location} ({weather_info['date']})</h2>
         <p><strong>Condition:</strong> {weather_info['condition']}</p>
         <p><strong>Average Temperature:</strong> {weather_info['avg_temp_c']}°C / {weather_info['avg_temp_f']}°F</p>
         <p><strong>Max Wind Speed:</strong> {weather_info['max_wind_kph']} kph</p>
         <p><strong>Humidity:</strong> {weather_info['humidity']}%</p>
         """
-        activity_suggestions = get_activity_suggestions(weather_info)
-        activity_suggestions_html = f"""
+    activity_suggestions = get_activity_suggestions(weather_info, location)
+    activity_suggestions_html = f"""
         <h3>Suggested Outdoor Activities</h3>
         <p>{activity_suggestions}</p>
         """
+    return weather_info_html + activity_suggestions_html
+
+def build_location_reports(locations):
+    """
+    Builds one report per distinct location, concurrently.
+
+    Returns a dict keyed by normalized location, so every subscriber of a location shares one fetch.
+    """
+    distinct = {}
+    for location in locations:
+        distinct.setdefault(normalize_location(location), location.strip())
 
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LOCATIONS) as executor:
+        reports = dict(zip(distinct, executor.map(build_location_report, distinct.values())))
+    logging.info(f"Built reports for {len(reports)} distinct location(s)")
+    return reports
+
+# -------------------------------------------------------------
+# 8. Send Email
+# -------------------------------------------------------------
+def build_email(to_email, locations, reports):
+    """
+    Renders one email for `to_email` with the reports for each of their locations.
+    """
+    sections = "<hr>".join(reports[normalize_location(location)] for location in locations)
     email_body = f"""
     <html>
         <body>
-            {weather_info_html}
-            {activity_suggestions_html}
+            {sections}
         </body>
     </html>
     """
+    return {
+        "from": FROM_EMAIL,
+        "to": to_email,
+        "subject": f"Tomorrow's Weather & Outdoor Activities 🌤️ - {', '.join(location.strip() for location in locations)}",
+        "html": email_body
+    }
 
-    try:
-        response = resend.Emails.send({
-            "from": FROM_EMAIL,
-            "to": TO_EMAIL,
-            "subject": f"Tomorrow's Weather & Outdoor Activities 🌤️ - {LOCATION}",
-            "html": email_body
-        })
-        logging.info("Email sent successfully via Resend!")
-        logging.debug(f"Resend Response: {response}")
-        return response
-    except ResendError as e:
-        logging.error(f"Resend API Error: {e}")
-        return {}
-    except Exception as e:
-        logging.error(f"Unexpected error sending email with Resend: {e}")
-        return {}
+def send_emails(messages):
+    """
+    Sends the rendered emails through Resend's batch endpoint, rate limited and retried.
+
+    Returns one delivery result per recipient.
+    """
+    results = EmailDispatcher().send(messages)
+    for result in results:
+        if result["status"] == "sent":
+            logging.debug(f"Email sent successfully to {result['to']}")
+    sent = sum(result["status"] == "sent" for result in results)
+    unconfirmed = sum(result["status"] == "unconfirmed" for result in results)
+    run_metrics.count("emails_sent", sent)
+    run_metrics.count("emails_failed", len(results) - sent - unconfirmed)
+    run_metrics.count("emails_unconfirmed", unconfirmed)
+    return results
+
+def run():
+    """
+    Fetches every distinct subscribed location once, then fans the reports out to all subscribers.
+    """
+    with run_metrics:
+        try:
+            subscribers = load_subscriptions()
+            run_metrics.count("subscribers", len(subscribers))
+            with run_metrics.stage("reports"):
+                reports = build_location_reports(
+                    location for subscriber in subscribers for location in subscriber["locations"]
+                )
+            run_metrics.count("locations", len(reports))
+            weather_pool.close()
+            with run_metrics.stage("emails"):
+                send_emails([
+                    build_email(subscriber["email"], subscriber["locations"], reports)
+                    for subscriber in subscribers
+                ])
+        finally:
+            # Also on failure, which is when the LLM counts matter most
+            run_metrics.set("llm", dict(llm.stats))
 
 if __name__ == "__main__":
-    send_email()
+    run()
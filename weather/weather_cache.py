@@ -0,0 +1,223 @@
+"""Persistent caches for the weather agent.
+
+`ForecastCache` keeps tomorrow's raw WeatherAPI `forecastday` payload per
+location in a small SQLite file, zlib-compressed. Entries expire at the next
+provider update boundary (WeatherAPI refreshes forecasts hourly), so reruns
+and overlapping schedules within the same hour reuse one API call. Expired
+entries are kept for a while so a failing API can fall back to stale data.
+
+`SuggestionCache` keeps Groq activity suggestions per location and weather
+situation: the condition text plus temperature, wind and humidity bands. Days
+with effectively the same weather reuse one LLM answer. Entries are evicted
+after `SUGGESTION_CACHE_TTL` seconds or, least recently used first, beyond
+`SUGGESTION_CACHE_MAX_ENTRIES`.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DB = os.getenv("WEATHER_CACHE_DB", "weather_cache.db")
+# Seconds between provider forecast updates, plus time for the update to publish
+FORECAST_UPDATE_INTERVAL = int(os.getenv("FORECAST_UPDATE_INTERVAL", "3600"))
+FORECAST_UPDATE_GRACE = int(os.getenv("FORECAST_UPDATE_GRACE", "300"))
+# How old a stale forecast may be and still be used when the API fails
+FORECAST_MAX_STALE = int(os.getenv("FORECAST_MAX_STALE", str(24 * 3600)))
+
+# Band widths used to decide when two forecasts count as the same weather
+SUGGESTION_TEMP_BAND_C = float(os.getenv("SUGGESTION_TEMP_BAND_C", "3"))
+SUGGESTION_WIND_BAND_KPH = float(os.getenv("SUGGESTION_WIND_BAND_KPH", "10"))
+SUGGESTION_HUMIDITY_BAND = float(os.getenv("SUGGESTION_HUMIDITY_BAND", "20"))
+# Eviction: age in seconds (0 keeps entries forever) and table size (0 disables the cache)
+SUGGESTION_CACHE_TTL = int(os.getenv("SUGGESTION_CACHE_TTL", str(30 * 24 * 3600)))
+SUGGESTION_CACHE_MAX_ENTRIES = int(os.getenv("SUGGESTION_CACHE_MAX_ENTRIES", "1000"))
+
+
+def normalize_location(location):
+    """
+    Canonical form used as the cache key and to de-duplicate locations.
+    """
+    return " ".join(location.split()).casefold()
+
+
+def _connect(path):
+    db = sqlite3.connect(path, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+def _pack(payload):
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class ForecastCache:
+    def __init__(self, path=CACHE_DB, update_interval=FORECAST_UPDATE_INTERVAL,
+                 grace=FORECAST_UPDATE_GRACE, max_stale=FORECAST_MAX_STALE):
+        self.path = path
+        self.update_interval = update_interval
+        self.grace = grace
+        self.max_stale = max_stale
+        with _connect(self.path) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS forecasts ("
+                " location TEXT NOT NULL,"
+                " forecast_date TEXT NOT NULL,"
+                " tz_id TEXT,"
+                " payload BLOB NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " PRIMARY KEY (location, forecast_date))"
+            )
+
+    def expiry_for(self, fetched_at):
+        """
+        The first provider update boundary after `fetched_at`, plus the grace period.
+        """
+        boundary = (int(fetched_at) // self.update_interval + 1) * self.update_interval
+        return boundary + self.grace
+
+    def _tomorrow(self, db, location):
+        """
+        Tomorrow's date in the location's own time zone, if we have seen the location before.
+        """
+        row = db.execute(
+            "SELECT tz_id FROM forecasts WHERE location = ? AND tz_id IS NOT NULL "
+            "ORDER BY fetched_at DESC LIMIT 1",
+            (location,),
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return (datetime.now(ZoneInfo(row[0])) + timedelta(days=1)).date().isoformat()
+        except Exception:
+            return None
+
+    def get(self, location, allow_stale=False):
+        """
+        Returns tomorrow's cached `forecastday` payload for `location`, or None.
+
+        With `allow_stale`, expired entries up to `max_stale` seconds old are returned too.
+        """
+        key = normalize_location(location)
+        now = time.time()
+        with _connect(self.path) as db:
+            tomorrow = self._tomorrow(db, key)
+            if tomorrow is None:
+                return None
+            row = db.execute(
+                "SELECT payload, fetched_at, expires_at FROM forecasts WHERE location = ? AND forecast_date = ?",
+                (key, tomorrow),
+            ).fetchone()
+        if not row:
+            return None
+        payload, fetched_at, expires_at = row
+        if now < expires_at or (allow_stale and now - fetched_at <= self.max_stale):
+            return _unpack(payload)
+        return None
+
+    def put(self, location, forecastday, tz_id=None):
+        """
+        Stores a raw `forecastday` payload and prunes entries too old to serve even as stale data.
+        """
+        now = time.time()
+        with _connect(self.path) as db:
+            db.execute(
+                "INSERT OR REPLACE INTO forecasts VALUES (?, ?, ?, ?, ?, ?)",
+                (normalize_location(location), forecastday["date"], tz_id,
+                 _pack(forecastday), now, self.expiry_for(now)),
+            )
+            db.execute("DELETE FROM forecasts WHERE fetched_at < ?", (now - self.max_stale,))
+        logging.debug(f"Cached forecast for {location} ({forecastday['date']})")
+
+
+def _band(value, width):
+    return int(float(value) // width)
+
+
+class SuggestionCache:
+    def __init__(self, path=CACHE_DB, ttl=SUGGESTION_CACHE_TTL, max_entries=SUGGESTION_CACHE_MAX_ENTRIES,
+                 temp_band=SUGGESTION_TEMP_BAND_C, wind_band=SUGGESTION_WIND_BAND_KPH,
+                 humidity_band=SUGGESTION_HUMIDITY_BAND):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.temp_band = temp_band
+        self.wind_band = wind_band
+        self.humidity_band = humidity_band
+        with _connect(self.path) as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS suggestions ("
+                " key TEXT PRIMARY KEY,"
+                " suggestions TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL)"
+            )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key_for(self, location, weather_info):
+        """
+        Location plus bucketed weather features, e.g. "london|partly cloudy|t6|w1|h3".
+        """
+        condition = " ".join(weather_info["condition"].split()).casefold()
+        return "|".join([
+            normalize_location(location),
+            condition,
+            f"t{_band(weather_info['avg_temp_c'], self.temp_band)}",
+            f"w{_band(weather_info['max_wind_kph'], self.wind_band)}",
+            f"h{_band(weather_info['humidity'], self.humidity_band)}",
+        ])
+
+    def get(self, location, weather_info):
+        """
+        Returns cached suggestions for this location and weather situation, or None.
+        """
+        if not self.enabled:
+            return None
+        key = self.key_for(location, weather_info)
+        now = time.time()
+        with _connect(self.path) as db:
+            row = db.execute(
+                "SELECT suggestions, created_at FROM suggestions WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                db.execute("DELETE FROM suggestions WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE suggestions SET last_used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, location, weather_info, suggestions):
+        """
+        Stores suggestions and evicts expired entries, then the least recently used beyond `max_entries`.
+        """
+        if not self.enabled:
+            return
+        key = self.key_for(location, weather_info)
+        now = time.time()
+        with _connect(self.path) as db:
+            db.execute("INSERT OR REPLACE INTO suggestions VALUES (?, ?, ?, ?)", (key, suggestions, now, now))
+            if self.ttl:
+                db.execute("DELETE FROM suggestions WHERE created_at < ?", (now - self.ttl,))
+            db.execute(
+                "DELETE FROM suggestions WHERE key NOT IN "
+                "(SELECT key FROM suggestions ORDER BY last_used_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+        logging.debug(f"Cached activity suggestions under {key}")